@@ -3,39 +3,106 @@ CrewAI Trivia Generator
 Searches for news articles on a specific date and topic, then generates interesting trivia.
 """
 
+import asyncio
+import contextvars
 import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
 from crewai import LLM, Agent, Task, Crew, Process
 from crewai_tools import SerperDevTool
 from dotenv import load_dotenv
 from gradient_adk import entrypoint
 from typing import Dict
 
+import httpx
+
+from research_cache import ResearchCache
+from scheduler import ScheduledTransport, scheduler
+from search_cache import CachedSearch, SearchCache, http_backend
+from tracing import annotate, tracer
+
 # Load environment variables
 load_dotenv()
 
+
+def serper_search(query: str):
+    """The uncached Serper search behind `search_tool`."""
+    return SerperDevTool._run(search_tool, search_query=query)
+
+
+# SEARCH_BACKEND_URL points the search tool at a local stub search server
+# instead of Serper, for offline testing
+SEARCH_BACKEND_URL = os.getenv("SEARCH_BACKEND_URL")
+
+# Repeated queries are served from disk, and at most SEARCH_MAX_CONCURRENCY
+# searches run at once across all crews
+search = CachedSearch(
+    http_backend(SEARCH_BACKEND_URL) if SEARCH_BACKEND_URL else serper_search,
+    SearchCache(
+        cache_dir=os.getenv("SEARCH_CACHE_DIR", "./.search_cache"),
+        ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "3600")),
+        max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "10000")),
+    ),
+    max_concurrency=int(os.getenv("SEARCH_MAX_CONCURRENCY", "4")),
+    name="stub" if SEARCH_BACKEND_URL else "serper",
+)
+
+
+class CachedSerperDevTool(SerperDevTool):
+    """SerperDevTool whose searches go through the cached search layer."""
+
+    def _run(self, **kwargs):
+        with tracer.span("search", "tool"):
+            return search.run(kwargs.get("search_query", ""))
+
+
 # Initialize the search tool
-search_tool = SerperDevTool()
+search_tool = CachedSerperDevTool()
 
 
-def create_trivia_crew(date: str, topic: str):
-    """
-    Creates a crew with two agents:
-    - Research Agent: Finds news articles
-    - Trivia Agent: Generates interesting facts
-    """
+# Number of crews that can run at once; each runs on its own worker thread
+CREW_WORKERS = int(os.getenv("CREW_WORKERS", "4"))
+
+# Research for past dates is kept on disk indefinitely; research for today or
+# later is reused for RESEARCH_CACHE_RECENT_TTL_SECONDS
+research_cache = ResearchCache(
+    cache_dir=os.getenv("RESEARCH_CACHE_DIR", "./.research_cache"),
+    recent_ttl_seconds=float(os.getenv("RESEARCH_CACHE_RECENT_TTL_SECONDS", "3600")),
+)
+
+# Create the base LLM that will be used by the agents, once per process
+llm = LLM(
+    model="openai-gpt-4.1",
+    base_url=os.getenv("INFERENCE_BASE_URL", "https://inference.do-ai.run/v1"),
+    api_key=os.getenv("DIGITALOCEAN_INFERENCE_KEY"),
+    temperature=0.5
+)
+
+# Crews call the model through LiteLLM from worker threads; its shared HTTP
+# client goes through the process-wide scheduler, which rate limits, queues
+# and retries the calls (see scheduler.py)
+try:
+    import litellm
 
-    # Create the base LLM that will be used by the agents
-    llm = LLM(
-        model="openai-gpt-4.1",
-        base_url="https://inference.do-ai.run/v1",
-        api_key=os.getenv("DIGITALOCEAN_INFERENCE_KEY"),
-        temperature=0.5
+    litellm.client_session = httpx.Client(
+        transport=ScheduledTransport(httpx.HTTPTransport()),
+        timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "60")),
     )
+except ImportError:
+    pass
+
+
+def create_research_crew():
+    """
+    Creates a crew with the Research Agent, which finds news articles.
+    `{topic}` and `{date}` are filled in by `kickoff(inputs=...)`.
+    """
 
     # Agent 1: News Researcher
     researcher = Agent(
         role="News Research Specialist",
-        goal=f"Find the most interesting and relevant news articles about {topic} on {date}",
+        goal="Find the most interesting and relevant news articles about {topic} on {date}",
         backstory="""You are an expert news researcher with a keen eye for 
         identifying significant and interesting articles. You excel at finding 
         newsworthy content from reliable sources.""",
@@ -45,21 +112,9 @@ def create_trivia_crew(date: str, topic: str):
         llm=llm,
     )
 
-    # Agent 2: Trivia Generator
-    trivia_generator = Agent(
-        role="Trivia Content Creator",
-        goal="Generate fascinating and educational trivia facts from news articles",
-        backstory="""You are a creative trivia writer who excels at extracting 
-        the most interesting, surprising, and educational facts from articles. 
-        You have a talent for making information engaging and memorable.""",
-        verbose=True,
-        allow_delegation=False,
-        llm=llm,
-    )
-
     # Task 1: Research news articles
     research_task = Task(
-        description=f"""Search for news articles about {topic} from {date}.
+        description="""Search for news articles about {topic} from {date}.
         Find 2-3 interesting articles with diverse perspectives.
         Focus on articles with unique information, surprising facts, or 
         significant developments.
@@ -74,9 +129,35 @@ def create_trivia_crew(date: str, topic: str):
         key facts, sources, and interesting points.""",
     )
 
+    return Crew(
+        agents=[researcher],
+        tasks=[research_task],
+        process=Process.sequential,
+        verbose=True,
+    )
+
+
+def create_trivia_crew():
+    """
+    Creates a crew with the Trivia Agent, which generates interesting facts
+    from the research summary passed in as `{research}`.
+    """
+
+    # Agent 2: Trivia Generator
+    trivia_generator = Agent(
+        role="Trivia Content Creator",
+        goal="Generate fascinating and educational trivia facts from news articles",
+        backstory="""You are a creative trivia writer who excels at extracting 
+        the most interesting, surprising, and educational facts from articles. 
+        You have a talent for making information engaging and memorable.""",
+        verbose=True,
+        allow_delegation=False,
+        llm=llm,
+    )
+
     # Task 2: Generate trivia
     trivia_task = Task(
-        description=f"""Based on the news articles found, generate 5 
+        description="""Based on the news articles found, generate 5 
         interesting trivia facts about {topic} from {date}.
         
         Each trivia fact should:
@@ -87,30 +168,92 @@ def create_trivia_crew(date: str, topic: str):
         - Cite the source when possible
         
         Format the output as a numbered list with clear, engaging trivia facts.
+
+        News articles:
+        {research}
         """,
         agent=trivia_generator,
         expected_output="""A numbered list of 5 fascinating trivia facts 
         derived from the news articles, each fact being concise and engaging.""",
-        context=[research_task],  # This task depends on the research task
     )
 
-    # Create the crew
-    crew = Crew(
-        agents=[researcher, trivia_generator],
-        tasks=[research_task, trivia_task],
-        process=Process.sequential,  # Tasks execute in order
+    return Crew(
+        agents=[trivia_generator],
+        tasks=[trivia_task],
+        process=Process.sequential,
         verbose=True,
     )
 
-    return crew
+
+# A crew is not safe to kick off from two threads at once, so each worker
+# checks out its own pair of crews, built once at startup and reused
+crew_pool = queue.Queue()
+for _ in range(CREW_WORKERS):
+    crew_pool.put((create_research_crew(), create_trivia_crew()))
+
+executor = ThreadPoolExecutor(max_workers=CREW_WORKERS, thread_name_prefix="crew")
+
+
+def kickoff(name: str, crew: Crew, inputs: Dict):
+    """Run a crew inside a tracing span that records its token usage."""
+    with tracer.span(name, "crew") as span:
+        output = crew.kickoff(inputs=inputs)
+        usage = getattr(output, "token_usage", None)
+        if usage is not None:
+            span.set(
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.completion_tokens,
+                llm_requests=usage.successful_requests,
+            )
+        return output
+
+
+def generate_trivia(date: str, topic: str):
+    """Blocking: research the news (unless cached), then write the trivia."""
+    research_crew, trivia_crew = crew_pool.get()
+    try:
+        research = research_cache.get(topic, date)
+        annotate(cache="miss" if research is None else "hit")
+        if research is None:
+            research = kickoff("research", research_crew, {"topic": topic, "date": date}).raw
+            if research:
+                research_cache.put(topic, date, research)
+        return kickoff(
+            "trivia", trivia_crew, {"topic": topic, "date": date, "research": research}
+        )
+    finally:
+        crew_pool.put((research_crew, trivia_crew))
 
 
 @entrypoint
 async def main(input: Dict, context: Dict):
+    if input.get("action") == "stats":
+        return {
+            "research_cache": research_cache.stats(),
+            "search": search.stats(),
+            "upstream": scheduler.stats(),
+            "tracing": tracer.summary(),
+        }
+
+    if scheduler.overloaded():
+        # Backpressure: the upstream queue is full, so don't start more crews
+        return {"error": "upstream overloaded, retry later"}
+
     date = input.get("date")
     topic = input.get("topic")
 
-    crew = create_trivia_crew(date, topic)
-    result = crew.kickoff()
+    with tracer.span("generate_trivia", "request"):
+        submitted = time.perf_counter()
+
+        def run_crews():
+            # Time spent waiting for a free worker
+            annotate(queue_ms=round((time.perf_counter() - submitted) * 1000, 3))
+            return generate_trivia(date, topic)
+
+        # Crews block while they run, so keep them off the event loop; the
+        # worker runs in this context so its spans nest under this request
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        result = await loop.run_in_executor(executor, context.run, run_crews)
 
     return {"result": result}
@@ -0,0 +1,87 @@
+"""
+Persistent cache of research summaries, keyed by (topic, date).
+
+News about a day that is already over doesn't change, so its research is
+kept indefinitely. Research for today, a future date, or a date that can't be
+parsed is only reused for ``recent_ttl_seconds``. Each entry is a small JSON
+file, written atomically, so the cache survives restarts and can be shared by
+workers on the same disk.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, Optional
+
+DATE_FORMATS = ("%d %B %Y", "%B %d %Y", "%Y-%m-%d", "%d %b %Y", "%b %d %Y", "%m/%d/%Y")
+
+
+def normalize(text: str) -> str:
+    return " ".join(str(text or "").lower().split())
+
+
+def parse_date(text: str) -> Optional[date]:
+    """Parse dates like "16th November 2025", "Nov 16, 2025" or "2025-11-16"."""
+    cleaned = re.sub(r"(\d+)(st|nd|rd|th)\b", r"\1", str(text or ""), flags=re.I)
+    cleaned = " ".join(cleaned.replace(",", " ").split())
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(cleaned, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+class ResearchCache:
+    def __init__(self, cache_dir: str = "./.research_cache", recent_ttl_seconds: float = 3600):
+        self.cache_dir = cache_dir
+        self.recent_ttl_seconds = recent_ttl_seconds
+        self._counters = {"hits": 0, "misses": 0, "expired": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, topic: str, date_text: str) -> str:
+        parsed = parse_date(date_text)
+        key = json.dumps([normalize(topic), parsed.isoformat() if parsed else normalize(date_text)])
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def get(self, topic: str, date_text: str) -> Optional[str]:
+        try:
+            with open(self._path(topic, date_text), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._counters["misses"] += 1
+            return None
+
+        if not entry["final"] and time.time() - entry["created"] > self.recent_ttl_seconds:
+            self._counters["expired"] += 1
+            self._counters["misses"] += 1
+            return None
+        self._counters["hits"] += 1
+        return entry["research"]
+
+    def put(self, topic: str, date_text: str, research: str):
+        parsed = parse_date(date_text)
+        entry = {
+            "topic": topic,
+            "date": date_text,
+            "research": research,
+            "created": time.time(),
+            # Only a day that has already ended is safe to keep forever
+            "final": parsed is not None and parsed < date.today(),
+        }
+        path = self._path(topic, date_text)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> Dict:
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,224 @@
+"""
+Caching, bounded search layer in front of a web search backend.
+
+Queries are normalized (case, whitespace and trailing punctuation) before
+lookup, so "Latest  Python release?" and "latest python release" share one
+result. Results are kept on disk for ``ttl_seconds``, one JSON file per
+query, and survive restarts. Every ``sweep_every`` writes, expired files are
+deleted and the oldest are evicted beyond ``max_entries``. Concurrent calls
+for the same query share one backend call, and at most ``max_concurrency``
+backend calls run at once.
+Each lookup marks the current tracing span as a cache hit or miss and adds
+the time it waited for a backend slot.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+from typing import Any, Callable, Dict, Optional
+
+from tracing import annotate, increment
+
+
+def normalize_query(query: str) -> str:
+    query = " ".join(str(query or "").lower().split())
+    return re.sub(r"[\s?.!,;:]+$", "", query)
+
+
+def http_backend(url: str, timeout: float = 10) -> Callable[[str], str]:
+    """A backend that GETs ``url?q=<query>`` and returns the response text.
+
+    Point it at a local stub (e.g. ``benchmarks/fake_openai_server.py``'s
+    ``/search``) to run the crew without a Serper API key.
+    """
+
+    def search(query: str) -> str:
+        full_url = f"{url}?{urllib.parse.urlencode({'q': query})}"
+        with urllib.request.urlopen(full_url, timeout=timeout) as response:
+            return response.read().decode("utf-8")
+
+    return search
+
+
+class SearchCache:
+    def __init__(
+        self,
+        cache_dir: str = "./.search_cache",
+        ttl_seconds: float = 3600,
+        max_entries: int = 10000,
+        sweep_every: int = 100,
+    ):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.sweep_every = sweep_every
+        self.evictions = 0
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.sweep()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def get(self, key: str) -> Optional[Dict]:
+        """The cached entry for ``key``, or ``None`` if missing or expired."""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry["created"] > self.ttl_seconds:
+            self._remove(path)
+            return None
+        return entry
+
+    def put(self, key: str, value: Any):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "value": value, "created": time.time()}, f)
+        os.replace(tmp_path, path)
+
+        with self._writes_lock:
+            self._writes += 1
+            due = self._writes % self.sweep_every == 0
+        if due:
+            self.sweep()
+
+    def sweep(self):
+        """Delete expired entries, then the oldest ones beyond ``max_entries``.
+
+        Entries are aged by file mtime, which is when they were written.
+        """
+        if not self._sweep_lock.acquire(blocking=False):
+            return  # another thread is already sweeping
+        try:
+            now = time.time()
+            live = []
+            with os.scandir(self.cache_dir) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    try:
+                        mtime = entry.stat().st_mtime
+                    except OSError:
+                        continue
+                    if now - mtime > self.ttl_seconds:
+                        self.evictions += self._remove(entry.path)
+                    else:
+                        live.append((mtime, entry.path))
+            if len(live) > self.max_entries:
+                live.sort()
+                for _, path in live[: len(live) - self.max_entries]:
+                    self.evictions += self._remove(path)
+        finally:
+            self._sweep_lock.release()
+
+
+class CachedSearch:
+    """Wraps a blocking ``backend(query)`` with the cache and a concurrency cap."""
+
+    def __init__(
+        self,
+        backend: Callable[[str], Any],
+        cache: SearchCache,
+        max_concurrency: int = 4,
+        name: str = "search",
+    ):
+        self.backend = backend
+        self.cache = cache
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots = asyncio.Semaphore(max_concurrency)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "backend_calls": 0}
+
+    def _key(self, query: str) -> str:
+        return json.dumps([self.name, normalize_query(query)])
+
+    def _call_backend(self, query: str) -> Any:
+        queued = time.perf_counter()
+        with self._slots:
+            increment("queue_ms", round((time.perf_counter() - queued) * 1000, 3))
+            self._counters["backend_calls"] += 1
+            return self.backend(" ".join(query.split()))
+
+    async def _acall_backend(self, query: str) -> Any:
+        # Wait here rather than in a worker thread, so queued searches don't
+        # tie up the default executor
+        queued = time.perf_counter()
+        async with self._async_slots:
+            increment("queue_ms", round((time.perf_counter() - queued) * 1000, 3))
+            return await asyncio.to_thread(self._call_backend, query)
+
+    def run(self, query: str) -> Any:
+        """Search from a worker thread."""
+        key = self._key(query)
+        entry = self.cache.get(key)
+        if entry is not None:
+            self._counters["hits"] += 1
+            annotate(cache="hit")
+            return entry["value"]
+        self._counters["misses"] += 1
+        annotate(cache="miss")
+        value = self._call_backend(query)
+        self.cache.put(key, value)
+        return value
+
+    async def arun(self, query: str) -> Any:
+        """Search from the event loop; the backend and cache files run in worker threads."""
+        key = self._key(query)
+        entry = await asyncio.to_thread(self.cache.get, key)
+        if entry is not None:
+            self._counters["hits"] += 1
+            annotate(cache="hit")
+            return entry["value"]
+
+        future = self._in_flight.get(key)
+        if future is not None:
+            self._counters["coalesced"] += 1
+            annotate(cache="coalesced")
+            return await asyncio.shield(future)
+
+        self._counters["misses"] += 1
+        annotate(cache="miss")
+        future = asyncio.ensure_future(self._afetch(key, query))
+        self._in_flight[key] = future
+        # Shielded, so one cancelled caller does not cancel the shared search
+        return await asyncio.shield(future)
+
+    async def _afetch(self, key: str, query: str) -> Any:
+        try:
+            value = await self._acall_backend(query)
+            await asyncio.to_thread(self.cache.put, key, value)
+            return value
+        finally:
+            # Only after the result is on disk, so later callers find it there
+            self._in_flight.pop(key, None)
+
+    def stats(self) -> Dict:
+        lookups = self._counters["hits"] + self._counters["misses"] + self._counters["coalesced"]
+        served = self._counters["hits"] + self._counters["coalesced"]
+        return {
+            **self._counters,
+            "evictions": self.cache.evictions,
+            "max_concurrency": self.max_concurrency,
+            "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,254 @@
+"""
+Lightweight spans for graph nodes, model calls, tool calls and tasks.
+
+A span records its wall time plus whatever the traced code reports about
+itself: time spent queued behind a concurrency limit (``queue_ms``), prompt
+and completion tokens, cache hits (``cache``) and retries. Finished spans
+feed an in-process summary, served by the templates' ``stats`` action, and,
+when ``TRACE_EXPORT_PATH`` is set, are appended to that file as JSON lines by
+a background thread, so exporting never blocks a request.
+
+Spans nest through a context variable: a span started while another is
+current becomes its child, across ``await`` and ``asyncio.to_thread``. Code
+that doesn't own the current span adds to it with ``annotate`` and
+``increment``. Set ``TRACING_ENABLED=0`` to turn tracing off.
+"""
+
+import atexit
+import contextlib
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, Optional
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+# Attributes summed per span name in the summary
+SUMMED = (
+    "queue_ms", "prompt_tokens", "completion_tokens", "retries", "history_tokens_saved",
+)
+
+
+class Span:
+    __slots__ = (
+        "name", "kind", "trace_id", "span_id", "parent", "start", "duration_ms",
+        "attributes", "error", "_started",
+    )
+
+    def __init__(self, name: str, kind: str, parent: Optional["Span"], attributes: Dict):
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(8).hex()
+        self.span_id = os.urandom(4).hex()
+        self.start = time.time()
+        self.duration_ms: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self._started = time.perf_counter()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def increment(self, key: str, amount: float = 1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    @property
+    def key(self) -> str:
+        """Summary key: kind, name and, for model and tool calls, the node."""
+        node = self.attributes.get("node")
+        suffix = f"@{node}" if node and self.kind != "node" else ""
+        return f"{self.kind}:{self.name}{suffix}"
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent is not None else None,
+            "name": self.name,
+            "kind": self.kind,
+            "start": round(self.start, 6),
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Returned while tracing is off, so callers needn't check."""
+
+    def set(self, **attributes):
+        pass
+
+    def increment(self, key: str, amount: float = 1):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Aggregate:
+    def __init__(self, window: int):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recent = deque(maxlen=window)
+        self.sums = defaultdict(float)
+        self.cache = defaultdict(int)
+
+    def add(self, span: Span):
+        self.count += 1
+        self.errors += span.error is not None
+        self.total_ms += span.duration_ms
+        self.max_ms = max(self.max_ms, span.duration_ms)
+        self.recent.append(span.duration_ms)
+        for key in SUMMED:
+            if key in span.attributes:
+                self.sums[key] += span.attributes[key]
+        if "cache" in span.attributes:
+            self.cache[span.attributes["cache"]] += 1
+
+    def snapshot(self) -> Dict:
+        recent = sorted(self.recent)
+
+        def quantile(q):
+            return round(recent[max(0, int(q * len(recent) + 0.5) - 1)], 2) if recent else 0.0
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "p50_ms": quantile(0.5),
+            "p95_ms": quantile(0.95),
+            "max_ms": round(self.max_ms, 2),
+            **{key: round(value, 2) for key, value in self.sums.items()},
+            **({"cache": dict(self.cache)} if self.cache else {}),
+        }
+
+
+class JsonlExporter:
+    """Appends span records to a file from a background thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def export(self, record: Dict):
+        self._queue.put(record)
+
+    def _run(self):
+        while True:
+            # Write whatever has queued up since the last write in one go
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [record for record in batch if record is not None]
+            if records:
+                with open(self.path, "a") as f:
+                    f.write("".join(json.dumps(r, default=str) + "\n" for r in records))
+            if len(records) < len(batch):
+                return
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+
+class Tracer:
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self.enabled: Optional[bool] = None
+        self.exporter: Optional[JsonlExporter] = None
+        self._aggregates: Dict[str, _Aggregate] = {}
+        self._lock = threading.Lock()
+
+    def _configure(self):
+        # Read on first use, so a .env loaded after import applies
+        self.enabled = os.getenv("TRACING_ENABLED", "1").lower() not in ("0", "false", "no")
+        path = os.getenv("TRACE_EXPORT_PATH")
+        if self.enabled and path:
+            self.exporter = JsonlExporter(path)
+
+    def current(self) -> Optional[Span]:
+        return _current.get()
+
+    def start(self, name: str, kind: str, parent: Optional[Span] = None, **attributes):
+        """Start a span and make it current; ``parent`` defaults to the current span."""
+        if self.enabled is None:
+            self._configure()
+        if not self.enabled:
+            return NOOP_SPAN
+        span = Span(name, kind, parent if parent is not None else _current.get(), attributes)
+        _current.set(span)
+        return span
+
+    def end(self, span, error: Optional[BaseException] = None, **attributes):
+        if not isinstance(span, Span):
+            return
+        span.duration_ms = round((time.perf_counter() - span._started) * 1000, 3)
+        span.attributes.update(attributes)
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        if _current.get() is span:
+            _current.set(span.parent)
+        with self._lock:
+            aggregate = self._aggregates.get(span.key)
+            if aggregate is None:
+                aggregate = self._aggregates[span.key] = _Aggregate(self.window)
+            aggregate.add(span)
+        if self.exporter is not None:
+            self.exporter.export(span.to_dict())
+
+    @contextlib.contextmanager
+    def span(self, name: str, kind: str, parent: Optional[Span] = None, **attributes):
+        """``with tracer.span(...) as span:`` around a block of work."""
+        span = self.start(name, kind, parent, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            self.end(span, e)
+            raise
+        self.end(span)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            spans = {key: a.snapshot() for key, a in sorted(self._aggregates.items())}
+        return {
+            "enabled": bool(self.enabled),
+            "export_path": self.exporter.path if self.exporter is not None else None,
+            "spans": spans,
+        }
+
+
+tracer = Tracer()
+
+
+def annotate(**attributes):
+    """Set attributes on the current span, if any."""
+    span = _current.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+def increment(key: str, amount: float = 1):
+    """Add to a counter on the current span, if any."""
+    span = _current.get()
+    if span is not None:
+        span.increment(key, amount)
@@ -0,0 +1,108 @@
+"""
+Bounded LRU/TTL cache for knowledge base retrievals.
+
+Results are keyed by (kb_id, query, num_results), with the query normalized
+for case and whitespace. A lookup for fewer results than an earlier one is
+served from the top of the larger cached result, since retrieval returns the
+best matches first. Concurrent identical lookups, including smaller ones
+waiting on a larger call in flight, share one upstream call. Each lookup
+marks the current tracing span as a cache hit or miss.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from tracing import annotate
+
+Fetch = Callable[[str, int], Awaitable[List[Any]]]
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(str(query or "").lower().split())
+
+
+class KBResultCache:
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # (kb_id, query) -> (created, num_results, results); only the largest
+        # num_results fetched for a query is kept, since it answers the rest
+        self._entries: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, str], Tuple[int, asyncio.Task]] = {}
+        self._counters = {
+            "hits": 0,
+            "subset_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    def _get(self, key, num_results: int):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created, cached_num, results = entry
+        if time.monotonic() - created > self.ttl_seconds:
+            del self._entries[key]
+            self._counters["expirations"] += 1
+            return None
+        # A short result means the KB has no more matches, so it answers any size
+        if cached_num < num_results and len(results) >= cached_num:
+            return None
+        self._entries.move_to_end(key)
+        outcome = "hit" if cached_num == num_results else "subset_hit"
+        self._counters[outcome + "s"] += 1
+        annotate(cache=outcome)
+        return results[:num_results]
+
+    def _put(self, key, num_results: int, results: List[Any]):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > num_results and len(entry[2]) >= entry[1]:
+            return
+        self._entries[key] = (time.monotonic(), num_results, results)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    async def lookup(self, kb_id: str, query: str, num_results: int, fetch: Fetch) -> List[Any]:
+        """Return ``fetch(query, num_results)``, from the cache when possible."""
+        key = (kb_id, normalize_query(query))
+        results = self._get(key, num_results)
+        if results is not None:
+            return results
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None and in_flight[0] >= num_results:
+            self._counters["coalesced"] += 1
+            annotate(cache="coalesced")
+            results = await asyncio.shield(in_flight[1])
+            return results[:num_results]
+
+        self._counters["misses"] += 1
+        annotate(cache="miss")
+        task = asyncio.ensure_future(fetch(query, num_results))
+        self._in_flight[key] = (num_results, task)
+
+        def _done(task: asyncio.Task, key=key):
+            if self._in_flight.get(key, (None, None))[1] is task:
+                del self._in_flight[key]
+            if not task.cancelled() and task.exception() is None:
+                self._put(key, num_results, task.result())
+
+        task.add_done_callback(_done)
+        # Shielded, so one cancelled caller does not cancel the shared call
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict:
+        served = self._counters["hits"] + self._counters["subset_hits"] + self._counters["coalesced"]
+        lookups = served + self._counters["misses"]
+        return {
+            **self._counters,
+            "size": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,120 @@
+"""
+Shared, pooled HTTP clients for every chat model in the process.
+
+Each ``ChatOpenAI`` otherwise opens its own connection pool, so one question
+pays for several TLS handshakes to the same endpoint. Models created with
+``get_chat_model`` share one keep-alive pool (sync and async), sized and timed
+out through environment variables, and count how often a request reused an
+existing connection. Each HTTP request is also counted on the current
+tracing span.
+
+Requests go through the process-wide scheduler in ``scheduler.py``, which
+rate limits, queues and retries them, so the clients' own retries are off.
+The scheduler counts its retries on the span and in its ``upstream`` stats.
+"""
+
+import os
+from typing import Dict, Optional
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from scheduler import ScheduledAsyncTransport, ScheduledTransport
+from tracing import increment
+
+DEFAULT_BASE_URL = "https://inference.do-ai.run/v1"
+API_KEY_ENV = "GRADIENT_MODEL_ACCESS_KEY"
+
+POOL_STATS = {"requests": 0, "connections_opened": 0}
+
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+
+
+def _count_connection(event_name: str, info: Dict):
+    if event_name == "connection.connect_tcp.complete":
+        POOL_STATS["connections_opened"] += 1
+
+
+async def _acount_connection(event_name: str, info: Dict):
+    _count_connection(event_name, info)
+
+
+def _count_request(request: httpx.Request):
+    POOL_STATS["requests"] += 1
+    increment("http_requests")
+
+
+def _on_request(request: httpx.Request):
+    _count_request(request)
+    request.extensions["trace"] = _count_connection
+
+
+async def _aon_request(request: httpx.Request):
+    _count_request(request)
+    request.extensions["trace"] = _acount_connection
+
+
+def _pool_limits() -> httpx.Limits:
+    # Read when the pool is first built, so a .env loaded after import applies
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY_SECONDS", "30")),
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        float(os.getenv("LLM_TIMEOUT_SECONDS", "60")),
+        connect=float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "10")),
+    )
+
+
+def get_http_client() -> httpx.Client:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.Client(
+            transport=ScheduledTransport(httpx.HTTPTransport(limits=_pool_limits())),
+            timeout=_timeout(),
+            event_hooks={"request": [_on_request]},
+        )
+    return _http_client
+
+
+def get_http_async_client() -> httpx.AsyncClient:
+    global _http_async_client
+    if _http_async_client is None:
+        _http_async_client = httpx.AsyncClient(
+            transport=ScheduledAsyncTransport(
+                httpx.AsyncHTTPTransport(limits=_pool_limits())
+            ),
+            timeout=_timeout(),
+            event_hooks={"request": [_aon_request]},
+        )
+    return _http_async_client
+
+
+def get_chat_model(model: str = "openai-gpt-4.1", **kwargs) -> ChatOpenAI:
+    """A ``ChatOpenAI`` for the inference endpoint that uses the shared pool."""
+    kwargs.setdefault("api_key", os.getenv(API_KEY_ENV))
+    # The scheduler retries, honoring Retry-After across all calls
+    kwargs.setdefault("max_retries", 0)
+    return ChatOpenAI(
+        model=model,
+        base_url=os.getenv("INFERENCE_BASE_URL", DEFAULT_BASE_URL),
+        http_client=get_http_client(),
+        http_async_client=get_http_async_client(),
+        **kwargs,
+    )
+
+
+def pool_stats() -> Dict:
+    reused = POOL_STATS["requests"] - POOL_STATS["connections_opened"]
+    return {
+        **POOL_STATS,
+        "connections_reused": reused,
+        "reuse_rate": round(reused / POOL_STATS["requests"], 4)
+        if POOL_STATS["requests"]
+        else 0.0,
+    }
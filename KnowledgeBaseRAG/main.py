@@ -1,36 +1,55 @@
+import json
 import os
 from gradient_adk import entrypoint
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from langchain.agents import create_agent
 from pydantic import BaseModel
-from gradient import Gradient
+from gradient import AsyncGradient
+
+from kb_cache import KBResultCache
+from llm_client import get_chat_model, pool_stats
+from scheduler import scheduler
+from streaming import stream_graph
+from trace_callbacks import tracing_handler
+from tracing import tracer
+
+# GRADIENT_BASE_URL points the client at a local stand-in KB server instead
+client = AsyncGradient(access_token=os.environ.get("DIGITALOCEAN_API_TOKEN"))
+
+# Repeated lookups within KB_CACHE_TTL_SECONDS are answered from memory
+kb_cache = KBResultCache(
+    max_entries=int(os.environ.get("KB_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=float(os.environ.get("KB_CACHE_TTL_SECONDS", "300")),
+)
+
+
+async def retrieve_documents(query: str, num_results: int):
+    with tracer.span("kb_retrieve", "retriever", num_results=num_results):
+        response = await client.retrieve.documents(
+            knowledge_base_id=os.environ.get("DIGITALOCEAN_KB_ID"),
+            num_results=num_results,
+            query=query,
+        )
+    if response and response.results:
+        return [result.model_dump() for result in response.results]
+    return []
 
-client = Gradient(access_token=os.environ.get("DIGITALOCEAN_API_TOKEN"))
 
 @tool
-def query_digitalocean_kb(query: str, num_results: int) -> str:
+async def query_digitalocean_kb(query: str, num_results: int) -> str:
     """Perform a query against the DigitalOcean Gradient AI knowledge base."""
-    response = client.retrieve.documents(
-        knowledge_base_id=os.environ.get("DIGITALOCEAN_KB_ID"),
-        num_results=num_results,
-        query=query,
+    return await kb_cache.lookup(
+        os.environ.get("DIGITALOCEAN_KB_ID"), query, num_results, retrieve_documents
     )
-    if response and response.results:
-        return response.results
-    return []
 
 
-llm = ChatOpenAI(
-    base_url="https://inference.do-ai.run/v1",
-    model="openai-gpt-oss-120b",
-    api_key=os.environ.get("GRADIENT_MODEL_ACCESS_KEY"),
-)
+llm = get_chat_model("openai-gpt-oss-120b")
 
+# Every run is traced node by node, tool call by tool call (see tracing.py)
 agent = create_agent(
     llm, tools=[query_digitalocean_kb], system_prompt="You are a helpful assistant that will answer questions about DigitalOcean Gradient AI Platform."
-)
+).with_config(callbacks=[tracing_handler])
 
 
 class Message(BaseModel):
@@ -39,7 +58,34 @@ class Message(BaseModel):
 
 @entrypoint
 async def entry(data, context):
+    """Entrypoint
+
+    With ``"stream": true`` the answer is streamed as server-sent events;
+    otherwise the answer text is returned as a single JSON string, as before.
+    """
+    if data.get("action") == "stats":
+        yield {
+            "http_pool": pool_stats(),
+            "kb_cache": kb_cache.stats(),
+            "upstream": scheduler.stats(),
+            "tracing": tracer.summary(),
+        }
+        return
+
+    if scheduler.overloaded():
+        # Backpressure: the upstream queue is full, so don't start more work
+        yield {"error": "upstream overloaded, retry later"}
+        return
+
     query = data["prompt"]
     inputs = {"messages": [HumanMessage(content=query)]}
+
+    if data.get("stream", False):
+        async for event in stream_graph(
+            agent, inputs, answer_nodes={"model"}, progress=data.get("progress", True)
+        ):
+            yield event
+        return
+
     result = await agent.ainvoke(inputs)
-    return result["messages"][-1].content
+    yield json.dumps(result["messages"][-1].content)
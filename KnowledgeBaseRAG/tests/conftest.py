@@ -0,0 +1,55 @@
+import asyncio
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(TEMPLATE_DIR))
+sys.path.insert(0, str(TEMPLATE_DIR.parent / "benchmarks"))
+
+from fake_openai_server import server_stats, start_server  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def fake_server():
+    """Base URL of a local OpenAI-compatible fake (see benchmarks/)."""
+    with start_server(latency_ms=20) as base_url:
+        yield base_url
+
+
+@pytest.fixture(scope="session")
+def kb_main(fake_server):
+    """The template's ``main`` module, pointed at the fake server's KB."""
+    os.environ.update(
+        {
+            "GRADIENT_BASE_URL": fake_server.rsplit("/v1", 1)[0] + "/kb",
+            "DIGITALOCEAN_API_TOKEN": "fake",
+            "DIGITALOCEAN_KB_ID": "test-kb",
+            "OPENAI_BASE_URL": fake_server,
+            "OPENAI_API_KEY": "fake",
+            "INFERENCE_BASE_URL": fake_server,
+            "DIGITALOCEAN_INFERENCE_KEY": "fake",
+        }
+    )
+    return importlib.import_module("main")
+
+
+@pytest.fixture(scope="session")
+def run():
+    """Run a coroutine to completion.
+
+    All runs share one event loop: the template's async clients are bound to
+    the loop they were first used on.
+    """
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture
+def kb_calls(fake_server):
+    """Knowledge base retrievals the fake server has answered so far."""
+    return lambda: server_stats(fake_server).get("kb_retrieve", 0)
@@ -0,0 +1,40 @@
+import asyncio
+import uuid
+
+
+def retrieve(kb_main, query: str, num_results: int):
+    return kb_main.query_digitalocean_kb.ainvoke({"query": query, "num_results": num_results})
+
+
+def test_repeated_lookup_is_served_from_the_cache(kb_main, run, kb_calls):
+    query = f"What is {uuid.uuid4()}?"
+    before = kb_calls()
+    first = run(retrieve(kb_main, query, 3))
+    again = run(retrieve(kb_main, "  " + query.upper(), 3))
+    assert kb_calls() - before == 1
+    assert first == again
+
+
+def test_smaller_lookup_is_served_from_a_larger_one(kb_main, run, kb_calls):
+    query = f"What is {uuid.uuid4()}?"
+    before = kb_calls()
+    run(retrieve(kb_main, query, 5))
+    top_two = run(retrieve(kb_main, query, 2))
+    assert kb_calls() - before == 1
+    assert [result["metadata"]["rank"] for result in top_two] == [1, 2]
+
+    run(retrieve(kb_main, query, 8))
+    assert kb_calls() - before == 2
+
+
+def test_concurrent_lookups_share_one_call(kb_main, run, kb_calls):
+    query = f"What is {uuid.uuid4()}?"
+    before = kb_calls()
+
+    async def lookups():
+        return await asyncio.gather(
+            retrieve(kb_main, query, 4), retrieve(kb_main, query, 4), retrieve(kb_main, query, 2)
+        )
+
+    run(lookups())
+    assert kb_calls() - before == 1
@@ -0,0 +1,200 @@
+"""
+Bounded message history for tool-calling loops.
+
+A graph's ``messages`` state only grows: every tool result and rewritten
+question is re-sent to the model on each turn of the loop. A
+``HistoryCompactor`` builds the list actually sent to the model, leaving the
+graph state untouched:
+
+- tool results older than the latest tool round are cut to
+  ``tool_result_tokens``;
+- with ``drop_superseded_turns``, everything between the first and the last
+  user message (earlier rewrites of the question and the retrievals they
+  led to) is dropped;
+- while the history is over ``max_tokens``, the latest round's results are
+  cut to half of it, then the oldest tool rounds are dropped, and finally
+  the latest results are cut to whatever is left.
+
+A tool round (an assistant message with tool calls plus their results) is
+always kept or dropped whole, so every tool result still answers a tool call
+in the history. Token counts are estimates (UTF-8 bytes / 3). The tokens
+saved are added to the current graph run's tracing span as
+``history_tokens_saved``.
+"""
+
+import json
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from tracing import tracer
+
+# A truncated tool result keeps at least this many tokens
+MIN_TOOL_RESULT_TOKENS = 64
+
+
+def estimate_tokens(text: str) -> int:
+    # The same ~3 bytes per token estimate as the RAG template's embedding
+    # pipeline and context packer, so both templates budget history alike.
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return " ".join(
+            part.get("text", "") if isinstance(part, dict) else str(part) for part in content
+        )
+    return content or ""
+
+
+def message_tokens(message: BaseMessage) -> int:
+    tokens = estimate_tokens(_text(message.content))
+    for call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(call["name"] + json.dumps(call["args"]))
+    return tokens
+
+
+def truncate_tool_result(message: ToolMessage, max_tokens: int) -> ToolMessage:
+    """``message`` with its content cut to about ``max_tokens``, marked as cut."""
+    text = _text(message.content)
+    total = estimate_tokens(text)
+    if total <= max_tokens:
+        return message
+    head = text.encode("utf-8")[: max_tokens * 3].decode("utf-8", "ignore")
+    note = f" ... [truncated, {total - max_tokens} of {total} tokens omitted]"
+    return message.model_copy(update={"content": head + note})
+
+
+def _group(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Split into turns; a tool-calling message and its results are one turn."""
+    turns = []
+    for message in messages:
+        if (
+            isinstance(message, ToolMessage)
+            and turns
+            and isinstance(turns[-1][0], AIMessage)
+            and turns[-1][0].tool_calls
+        ):
+            turns[-1].append(message)
+        else:
+            turns.append([message])
+    return turns
+
+
+def _is_tool_round(turn: List[BaseMessage]) -> bool:
+    return isinstance(turn[0], AIMessage) and bool(turn[0].tool_calls)
+
+
+@dataclass
+class CompactionStats:
+    calls: int = 0
+    compacted: int = 0
+    turns_dropped: int = 0
+    tool_results_truncated: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+
+    def as_dict(self) -> Dict:
+        stats = asdict(self)
+        stats["tokens_saved"] = self.tokens_in - self.tokens_out
+        stats["tokens_saved_rate"] = (
+            round(stats["tokens_saved"] / self.tokens_in, 4) if self.tokens_in else 0.0
+        )
+        return stats
+
+
+class HistoryCompactor:
+    def __init__(
+        self,
+        max_tokens: int = 8000,
+        tool_result_tokens: int = 500,
+        drop_superseded_turns: bool = False,
+    ):
+        self.max_tokens = max_tokens
+        self.tool_result_tokens = tool_result_tokens
+        self.drop_superseded_turns = drop_superseded_turns
+        self.stats = CompactionStats()
+
+    def compact(self, messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+        """The messages to send to the model in place of ``messages``."""
+        turns = _group(messages)
+        dropped, truncated = 0, set()
+
+        if self.drop_superseded_turns:
+            questions = [i for i, turn in enumerate(turns) if isinstance(turn[0], HumanMessage)]
+            if len(questions) > 1:
+                first, last = questions[0], questions[-1]
+                dropped += last - first - 1
+                turns = turns[: first + 1] + turns[last:]
+
+        rounds = [i for i, turn in enumerate(turns) if _is_tool_round(turn)]
+        latest = rounds[-1] if rounds else None
+        for i in rounds[:-1]:
+            cut = [turns[i][0]] + [
+                truncate_tool_result(m, self.tool_result_tokens) for m in turns[i][1:]
+            ]
+            truncated.update(a.tool_call_id for a, b in zip(cut, turns[i]) if a is not b)
+            turns[i] = cut
+
+        sizes = [sum(message_tokens(m) for m in turn) for turn in turns]
+        total = sum(sizes)
+
+        def cut_latest(budget: int) -> int:
+            """Cut the latest results to share ``budget``; the tokens now used."""
+            results = turns[latest][1:]
+            share = max(MIN_TOOL_RESULT_TOKENS, budget // max(1, len(results)))
+            cut = [turns[latest][0]] + [truncate_tool_result(m, share) for m in results]
+            truncated.update(a.tool_call_id for a, b in zip(cut, turns[latest]) if a is not b)
+            turns[latest] = cut
+            return sum(message_tokens(m) for m in cut[1:])
+
+        if total > self.max_tokens and latest is not None:
+            # One huge result shouldn't push every earlier round out
+            used = sum(message_tokens(m) for m in turns[latest][1:])
+            if used > self.max_tokens // 2:
+                total += cut_latest(self.max_tokens // 2) - used
+        # Oldest first: earlier tool rounds and intermediate assistant replies
+        droppable = [
+            i
+            for i, turn in enumerate(turns)
+            if i != latest
+            and i != len(turns) - 1
+            and isinstance(turn[0], AIMessage)
+        ]
+        removed = set()
+        for i in droppable:
+            if total <= self.max_tokens:
+                break
+            removed.add(i)
+            total -= sizes[i]
+        dropped += len(removed)
+
+        if total > self.max_tokens and latest is not None:
+            used = sum(message_tokens(m) for m in turns[latest][1:])
+            cut_latest(self.max_tokens - (total - used))
+
+        compacted = [
+            message for i, turn in enumerate(turns) if i not in removed for message in turn
+        ]
+
+        tokens_in = sum(message_tokens(m) for m in messages)
+        tokens_out = sum(message_tokens(m) for m in compacted)
+        self.stats.calls += 1
+        self.stats.compacted += tokens_out < tokens_in
+        self.stats.turns_dropped += dropped
+        self.stats.tool_results_truncated += len(truncated)
+        self.stats.tokens_in += tokens_in
+        self.stats.tokens_out += tokens_out
+        if tokens_out < tokens_in:
+            _count_saved(tokens_in - tokens_out)
+        return compacted
+
+
+def _count_saved(tokens: int):
+    """Add to the graph run's span, so traces carry the savings per request."""
+    span = tracer.current()
+    while span is not None and span.parent is not None:
+        span = span.parent
+    if span is not None:
+        span.increment("history_tokens_saved", tokens)
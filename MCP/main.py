@@ -1,28 +1,42 @@
 import os
+from fastapi.encoders import jsonable_encoder
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langgraph.graph import StateGraph, MessagesState, START
 from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
-from typing import Dict, Optional
+from typing import Dict
 from gradient_adk import entrypoint
 
+from compaction import HistoryCompactor
+from graph_registry import registry
+from llm_client import get_chat_model, pool_stats
+from scheduler import scheduler
+from session_pool import SessionPool, load_pooled_tools
+from streaming import stream_graph
+from tool_metrics import tool_metrics
+from trace_callbacks import tracing_handler
+from tracing import tracer
+
 load_dotenv()
 
-AGENT_GRAPH: Optional[StateGraph] = None
+model = get_chat_model("openai-gpt-4.1")
 
-model = ChatOpenAI(
-    model="openai-gpt-4.1",
-    base_url="https://inference.do-ai.run/v1",
-    api_key=os.getenv("DIGITALOCEAN_INFERENCE_KEY")
+# Each model turn gets the history compacted: old tool results cut short and,
+# over the token cap, the oldest tool rounds dropped
+history_compactor = HistoryCompactor(
+    max_tokens=int(os.getenv("HISTORY_MAX_TOKENS", "8000")),
+    tool_result_tokens=int(os.getenv("HISTORY_TOOL_RESULT_TOKENS", "500")),
 )
 
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+SEARCH_MCP_URL = os.getenv(
+    "SEARCH_MCP_URL", f"https://mcp.tavily.com/mcp/?tavilyApiKey={TAVILY_API_KEY}"
+)
 
 client = MultiServerMCPClient(
     {
         "search": {
-            "url": f"https://mcp.tavily.com/mcp/?tavilyApiKey={TAVILY_API_KEY}",
+            "url": SEARCH_MCP_URL,
             "transport": "streamable_http",
         },
         "calculator": {
@@ -34,19 +48,49 @@ client = MultiServerMCPClient(
 )
 
 
+def server_setting(name: str, setting: str, default: str) -> str:
+    """``MCP_<SERVER>_<SETTING>``, falling back to ``MCP_<SETTING>``."""
+    return os.getenv(f"MCP_{name.upper()}_{setting}", os.getenv(f"MCP_{setting}", default))
+
+
+# Long-lived sessions per server, instead of a new session (and, for the
+# calculator, a new process) per tool call. Each server has its own limit on
+# concurrent tool calls and its own timeout, so a slow search can't hold up
+# calculator results.
+session_pools = {
+    name: SessionPool(
+        client,
+        name,
+        size=int(os.getenv("MCP_SESSION_POOL_SIZE", "1")),
+        health_check_seconds=float(os.getenv("MCP_HEALTH_CHECK_SECONDS", "30")),
+        max_concurrency=int(server_setting(name, "MAX_CONCURRENCY", "4")),
+        call_timeout_seconds=float(server_setting(name, "TIMEOUT_SECONDS", "30")),
+    )
+    for name in client.connections
+}
+
+
 async def build_graph():
 
-    # First, fetch the tools from the MCP client
+    # First, fetch the tools from each server, bound to its session pool
     # Note that this is an async operation, so it needs to be done within an async function
-    tools = await client.get_tools()
+    tools = []
+    for pool in session_pools.values():
+        tools.extend(await load_pooled_tools(pool))
 
-    # Next, define a function that calls the model with the tools
-    def call_model(state: MessagesState):
-        response = model.bind_tools(tools).invoke(state["messages"])
+    # Next, define a function that calls the model with the tools, bound once here
+    # rather than on every model turn
+    model_with_tools = model.bind_tools(tools)
+
+    async def call_model(state: MessagesState):
+        response = await model_with_tools.ainvoke(
+            history_compactor.compact(state["messages"])
+        )
         return {"messages": response}
 
     # Finally, we build the graph. This is a simple two-node loop between the model and the tools.
     # This allows the agent to call tools as needed, including multiple tools in sequence.
+    # When the model asks for several tools at once, ToolNode runs them concurrently.
     builder = StateGraph(MessagesState)
     builder.add_node("call_model", call_model)
     builder.add_node("tools", ToolNode(tools))
@@ -56,23 +100,54 @@ async def build_graph():
         tools_condition,
     )
     builder.add_edge("tools", "call_model")
-    graph = builder.compile()
+    # Every run is traced node by node, tool call by tool call (see tracing.py)
+    graph = builder.compile().with_config(callbacks=[tracing_handler])
     return graph
 
 
+registry.register("mcp_agent", build_graph)
+
+
 @entrypoint
 async def main(input: Dict, context: Dict):
-    """Entrypoint"""
+    """Entrypoint
+
+    With ``"stream": true`` the answer is streamed as server-sent events;
+    otherwise a single JSON response is returned, as before.
+    """
+    if input.get("action") == "stats":
+        yield {
+            "http_pool": pool_stats(),
+            "mcp_sessions": {name: pool.stats() for name, pool in session_pools.items()},
+            "tool_latency": tool_metrics.snapshot(),
+            "history": history_compactor.stats.as_dict(),
+            "upstream": scheduler.stats(),
+            "tracing": tracer.summary(),
+        }
+        return
+
+    if scheduler.overloaded():
+        # Backpressure: the upstream queue is full, so don't start more work
+        yield {"error": "upstream overloaded, retry later"}
+        return
 
     input_request = input.get("prompt")
 
-    # Instead of building the graph every time, we build it once and cache it.
-    # This speeds up subsequent invocations.
-    global AGENT_GRAPH
-    if AGENT_GRAPH is None:
-        AGENT_GRAPH = await build_graph()
+    # Instead of building the graph every time, the registry builds it once
+    # and caches it. This speeds up subsequent invocations.
+    agent_graph = await registry.get("mcp_agent")
+
+    if input.get("stream", False):
+        async for event in stream_graph(
+            agent_graph,
+            input_request,
+            answer_nodes={"call_model"},
+            progress=input.get("progress", True),
+        ):
+            yield event
+        return
 
     # Invoke the app
-    result = await AGENT_GRAPH.ainvoke(input_request)
+    result = await agent_graph.ainvoke(input_request)
     final_response = result
-    return {"response": final_response}
+    yield jsonable_encoder({"response": final_response})
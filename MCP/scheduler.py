@@ -0,0 +1,547 @@
+"""
+Process-wide admission control, rate limiting and retries for inference calls.
+
+Every model call in the process goes through one ``UpstreamScheduler``,
+plugged in as the HTTP transport of the model clients. Calls are grouped by
+upstream key (host plus a fingerprint of the API key), and each key has:
+
+- token buckets for requests and (estimated) prompt tokens per minute,
+  ``LLM_RATE_LIMIT_RPM`` and ``LLM_RATE_LIMIT_TPM`` (``0``, the default, is
+  unlimited);
+- a cap on calls in flight, ``LLM_MAX_CONCURRENCY``. A 429 halves the cap
+  and each success raises it again by ``1 / cap``, so even without
+  configured rates the key settles below the provider's limit instead of
+  retrying in bursts;
+- a bounded priority queue for calls waiting on either, ``LLM_QUEUE_SIZE``.
+  A call that finds the queue full, or waits longer than
+  ``LLM_QUEUE_TIMEOUT_SECONDS``, fails with ``UpstreamOverloaded``, and
+  ``overloaded()`` lets an entrypoint turn requests away before starting;
+- retries of 429s, 5xx responses and connection errors, up to
+  ``LLM_MAX_RETRIES``, with full-jitter exponential backoff. A
+  ``Retry-After`` (or ``retry-after-ms``) header is honored. A 429, or a
+  503 that carries one of those headers, pauses the whole key until the
+  retry, so queued calls don't all run into the same limit or overload.
+
+Calls queue in the order of their ``priority`` (lower first; see
+``priority()``), then arrival; a retry keeps its call's place in line.
+Waits and retries are added to the current tracing span. The scheduler works
+for both async and threaded callers.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import email.utils
+import hashlib
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import httpx
+
+from tracing import increment
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("llm_priority", default=0)
+
+
+@contextlib.contextmanager
+def priority(level: int):
+    """Run the calls made inside the block at ``level`` (default 0, lower first)."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class UpstreamOverloaded(RuntimeError):
+    """The upstream queue is full, or a call waited in it too long."""
+
+    def __init__(self, key: str, reason: str):
+        super().__init__(f"{key}: {reason}")
+        self.key = key
+
+
+class TokenBucket:
+    """``per_minute`` units, with bursts of up to ``burst_seconds`` worth."""
+
+    def __init__(self, per_minute: float, burst_seconds: float = 1.0):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` can be taken (0 when unlimited)."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float, now: float):
+        if self.rate > 0:
+            self._refill(now)
+            self.level -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "cost", "granted", "event", "future", "loop")
+
+    def __init__(self, priority: int, seq: int, cost: int, loop=None):
+        self.priority = priority
+        self.seq = seq
+        self.cost = cost
+        self.granted = False
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class KeyScheduler:
+    """Admission for the calls to one upstream key."""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_concurrency: int = 32,
+        max_queue: int = 256,
+        queue_timeout_seconds: float = 60,
+    ):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.max_queue = max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._queue = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._waits_ms = deque(maxlen=1024)
+        self.counters = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected": 0,
+            "timed_out": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "overloaded": 0,
+            "max_queue_depth": 0,
+        }
+
+    def _grant(self) -> Optional[float]:
+        """Admit queued calls while limits allow (lock held).
+
+        Returns how long until the next one could be admitted, or ``None``
+        if that depends on a call finishing.
+        """
+        while self._queue:
+            if self.in_flight >= max(1, int(self.limit)):
+                return None
+            now = time.monotonic()
+            if self.paused_until > now:
+                return self.paused_until - now
+            waiter = self._queue[0]
+            delay = max(self.requests.delay(1, now), self.tokens.delay(waiter.cost, now))
+            if delay > 0:
+                return delay
+            heapq.heappop(self._queue)
+            self.requests.take(1, now)
+            self.tokens.take(waiter.cost, now)
+            self.in_flight += 1
+            self.counters["admitted"] += 1
+            waiter.granted = True
+            waiter.wake()
+        return None
+
+    def ticket(self) -> int:
+        """A place in line, for a call to keep across its retries."""
+        return next(self._seq)
+
+    def _enqueue(self, cost: int, ticket: Optional[int], loop=None) -> _Waiter:
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self.counters["rejected"] += 1
+                raise UpstreamOverloaded(self.name, f"queue full ({self.max_queue} waiting)")
+            if ticket is None:
+                ticket = next(self._seq)
+            waiter = _Waiter(_priority.get(), ticket, cost, loop)
+            heapq.heappush(self._queue, waiter)
+            self._grant()
+            self.counters["max_queue_depth"] = max(
+                self.counters["max_queue_depth"], len(self._queue)
+            )
+            if not waiter.granted:
+                self.counters["queued"] += 1
+            return waiter
+
+    def _poll(self, waiter: _Waiter) -> Optional[float]:
+        """``None`` once ``waiter`` is admitted, else how long to wait and retry."""
+        with self._lock:
+            if not waiter.granted:
+                delay = self._grant()
+            if waiter.granted:
+                return None
+        # Admission is normally signalled by a finishing call; poll as a fallback
+        return delay if delay is not None else 1.0
+
+    def _abandon(self, waiter: _Waiter, timed_out: bool):
+        with self._lock:
+            if waiter.granted or waiter not in self._queue:
+                return
+            self._queue.remove(waiter)
+            heapq.heapify(self._queue)
+            self.counters["timed_out"] += timed_out
+        if timed_out:
+            raise UpstreamOverloaded(
+                self.name, f"waited over {self.queue_timeout_seconds}s for admission"
+            )
+
+    def _waited(self, started: float) -> float:
+        waited_ms = (time.monotonic() - started) * 1000
+        self._waits_ms.append(waited_ms)
+        increment("queue_ms", round(waited_ms, 3))
+        return waited_ms
+
+    async def acquire(self, cost: int = 1, ticket: Optional[int] = None) -> float:
+        """Wait for admission; returns the milliseconds waited."""
+        started = time.monotonic()
+        deadline = started + self.queue_timeout_seconds
+        waiter = self._enqueue(cost, ticket, asyncio.get_running_loop())
+        try:
+            while True:
+                delay = self._poll(waiter)
+                if delay is None:
+                    break
+                if time.monotonic() >= deadline:
+                    self._abandon(waiter, timed_out=True)
+                    break
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(
+                        asyncio.shield(waiter.future), min(delay, deadline - time.monotonic())
+                    )
+        except BaseException:
+            self._abandon(waiter, timed_out=False)
+            if waiter.granted:
+                self.release()
+            raise
+        return self._waited(started)
+
+    def acquire_sync(self, cost: int = 1, ticket: Optional[int] = None) -> float:
+        """``acquire`` for threaded callers."""
+        started = time.monotonic()
+        deadline = started + self.queue_timeout_seconds
+        waiter = self._enqueue(cost, ticket)
+        try:
+            while True:
+                delay = self._poll(waiter)
+                if delay is None:
+                    break
+                if time.monotonic() >= deadline:
+                    self._abandon(waiter, timed_out=True)
+                    break
+                waiter.event.wait(min(delay, deadline - time.monotonic()))
+        except BaseException:
+            self._abandon(waiter, timed_out=False)
+            if waiter.granted:
+                self.release()
+            raise
+        return self._waited(started)
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._grant()
+
+    def throttled(self, seconds: Optional[float]):
+        """After a 429: halve the concurrency cap and admit nothing for ``seconds``."""
+        with self._lock:
+            self.counters["rate_limited"] += 1
+            self.limit = max(1.0, self.limit / 2)
+            if seconds:
+                self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def paused(self, seconds: Optional[float]):
+        """After a 503 with Retry-After: admit nothing for ``seconds``, keeping the cap."""
+        with self._lock:
+            self.counters["overloaded"] += 1
+            if seconds:
+                self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def full(self) -> bool:
+        with self._lock:
+            return len(self._queue) >= self.max_queue
+
+    def succeeded(self):
+        with self._lock:
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            waits = sorted(self._waits_ms)
+            depth, in_flight = len(self._queue), self.in_flight
+            paused = max(0.0, self.paused_until - time.monotonic())
+
+        def quantile(q):
+            return round(waits[max(0, int(q * len(waits) + 0.5) - 1)], 2) if waits else 0.0
+
+        return {
+            **self.counters,
+            "queue_depth": depth,
+            "in_flight": in_flight,
+            "concurrency_limit": round(self.limit, 2),
+            "paused_seconds": round(paused, 3),
+            "wait_mean_ms": round(sum(waits) / len(waits), 2) if waits else 0.0,
+            "wait_p50_ms": quantile(0.5),
+            "wait_p95_ms": quantile(0.95),
+            "wait_max_ms": round(waits[-1], 2) if waits else 0.0,
+        }
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds from ``retry-after-ms`` or ``Retry-After`` (seconds or a date)."""
+    value = response.headers.get("retry-after-ms")
+    if value:
+        with contextlib.suppress(ValueError):
+            return float(value) / 1000
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    with contextlib.suppress(ValueError):
+        return float(value)
+    with contextlib.suppress(TypeError, ValueError):
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    return None
+
+
+def _estimate_tokens(request: httpx.Request) -> int:
+    try:
+        return len(request.content) // 4 + 1
+    except httpx.RequestNotRead:
+        return 1
+
+
+class UpstreamScheduler:
+    def __init__(self):
+        self.settings: Optional[Dict] = None
+        self._keys: Dict[str, KeyScheduler] = {}
+        self._lock = threading.Lock()
+
+    def _configure(self):
+        # Read on first use, so a .env loaded after import applies
+        self.settings = {
+            "requests_per_minute": float(os.getenv("LLM_RATE_LIMIT_RPM", "0")),
+            "tokens_per_minute": float(os.getenv("LLM_RATE_LIMIT_TPM", "0")),
+            "max_concurrency": int(os.getenv("LLM_MAX_CONCURRENCY", "32")),
+            "max_queue": int(os.getenv("LLM_QUEUE_SIZE", "256")),
+            "queue_timeout_seconds": float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "60")),
+            "max_retries": int(os.getenv("LLM_MAX_RETRIES", "3")),
+            "retry_base_seconds": float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5")),
+            "retry_max_seconds": float(os.getenv("LLM_RETRY_MAX_SECONDS", "30")),
+        }
+
+    def key_for(self, request: httpx.Request) -> KeyScheduler:
+        if self.settings is None:
+            self._configure()
+        credential = request.headers.get("authorization") or request.headers.get("api-key", "")
+        fingerprint = hashlib.sha256(credential.encode("utf-8")).hexdigest()[:8]
+        name = f"{request.url.host}#{fingerprint}"
+        with self._lock:
+            key = self._keys.get(name)
+            if key is None:
+                settings = {
+                    k: v
+                    for k, v in self.settings.items()
+                    if k not in ("max_retries", "retry_base_seconds", "retry_max_seconds")
+                }
+                key = self._keys[name] = KeyScheduler(name, **settings)
+            return key
+
+    def retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> Optional[float]:
+        """Seconds to wait before retry ``attempt`` (from 0), or ``None`` to give up."""
+        if attempt >= self.settings["max_retries"]:
+            return None
+        retry_after = _retry_after(response) if response is not None else None
+        if retry_after is not None:
+            if retry_after > self.settings["retry_max_seconds"]:
+                return None
+            # A little jitter so callers told the same time don't retry together
+            return retry_after + random.uniform(0, min(1.0, retry_after * 0.1 + 0.05))
+        backoff = self.settings["retry_base_seconds"] * 2**attempt
+        return random.uniform(0, min(self.settings["retry_max_seconds"], backoff))
+
+    def overloaded(self) -> bool:
+        """True while any key's queue is full; new requests should be turned away."""
+        with self._lock:
+            keys = list(self._keys.values())
+        return any(key.full() for key in keys)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            keys = dict(self._keys)
+        return {
+            "settings": self.settings,
+            "keys": {name: key.snapshot() for name, key in sorted(keys.items())},
+        }
+
+
+scheduler = UpstreamScheduler()
+
+
+class _ReleasingStream(httpx.AsyncByteStream, httpx.SyncByteStream):
+    """Response body that frees the call's slot once it is read or closed."""
+
+    def __init__(self, stream, key: KeyScheduler):
+        self._stream = stream
+        self._key = key
+        self._released = False
+
+    def _release(self):
+        if not self._released:
+            self._released = True
+            self._key.release()
+
+    def __iter__(self):
+        yield from self._stream
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class ScheduledAsyncTransport(httpx.AsyncBaseTransport):
+    """Wraps an async transport with the process-wide ``scheduler``."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = scheduler.key_for(request)
+        cost = _estimate_tokens(request)
+        ticket = key.ticket()
+        attempt = 0
+        while True:
+            await key.acquire(cost, ticket)
+            response = None
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                key.release()
+                delay = scheduler.retry_delay(attempt, None)
+                if delay is None or isinstance(e, httpx.TimeoutException):
+                    raise
+            except BaseException:
+                key.release()
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    key.succeeded()
+                    response.stream = _ReleasingStream(response.stream, key)
+                    return response
+                delay = scheduler.retry_delay(attempt, response)
+                if response.status_code == 429:
+                    key.throttled(delay)
+                elif response.status_code == 503 and _retry_after(response) is not None:
+                    key.paused(delay)
+                if delay is None:
+                    response.stream = _ReleasingStream(response.stream, key)
+                    return response
+                await response.aclose()
+                key.release()
+            attempt += 1
+            key.counters["retries"] += 1
+            increment("retries")
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class ScheduledTransport(httpx.BaseTransport):
+    """Wraps a sync transport with the process-wide ``scheduler``."""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key = scheduler.key_for(request)
+        cost = _estimate_tokens(request)
+        ticket = key.ticket()
+        attempt = 0
+        while True:
+            key.acquire_sync(cost, ticket)
+            response = None
+            try:
+                response = self._transport.handle_request(request)
+            except httpx.TransportError as e:
+                key.release()
+                delay = scheduler.retry_delay(attempt, None)
+                if delay is None or isinstance(e, httpx.TimeoutException):
+                    raise
+            except BaseException:
+                key.release()
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    key.succeeded()
+                    response.stream = _ReleasingStream(response.stream, key)
+                    return response
+                delay = scheduler.retry_delay(attempt, response)
+                if response.status_code == 429:
+                    key.throttled(delay)
+                elif response.status_code == 503 and _retry_after(response) is not None:
+                    key.paused(delay)
+                if delay is None:
+                    response.stream = _ReleasingStream(response.stream, key)
+                    return response
+                response.close()
+                key.release()
+            attempt += 1
+            key.counters["retries"] += 1
+            increment("retries")
+            time.sleep(delay)
+
+    def close(self):
+        self._transport.close()
@@ -0,0 +1,272 @@
+"""
+Long-lived, health-checked MCP sessions shared by every tool call.
+
+Tools from ``MultiServerMCPClient.get_tools()`` open a new session for each
+call: a stdio server (like the calculator) is spawned again for every
+arithmetic step, and an HTTP server repeats its handshake. A ``SessionPool``
+instead keeps ``size`` sessions open to one server, pings idle sessions every
+``health_check_seconds`` and reconnects, with backoff, any session that fails.
+``load_pooled_tools`` returns LangChain tools whose calls go through the pool.
+
+MCP sessions multiplex concurrent requests, so a session is shared rather
+than checked out exclusively; each call goes to the least busy healthy one.
+Each pool also caps the server's concurrent tool calls at ``max_concurrency``
+and gives up on a call after ``call_timeout_seconds``, so one slow server
+can't hold up the tool calls to another.
+"""
+
+import asyncio
+import contextlib
+import time
+from typing import Dict, List, Optional
+
+import anyio
+import httpx
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
+from mcp import ClientSession
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED, CallToolResult, TextContent
+
+from tool_metrics import tool_metrics
+from tracing import annotate
+
+
+# Errors that mean the session's connection is gone, not that a request failed
+TRANSPORT_ERRORS = (
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+    httpx.TransportError,
+    ConnectionError,
+)
+
+
+def is_transport_error(error: BaseException) -> bool:
+    if isinstance(error, McpError):
+        return error.error.code == CONNECTION_CLOSED
+    return isinstance(error, TRANSPORT_ERRORS)
+
+
+class SessionUnavailable(RuntimeError):
+    """No healthy session to the server came up within the connect timeout."""
+
+
+class _Slot:
+    def __init__(self):
+        self.session: Optional[ClientSession] = None
+        self.failed = asyncio.Event()
+        self.in_use = 0
+
+    @property
+    def healthy(self) -> bool:
+        return self.session is not None and not self.failed.is_set()
+
+
+class SessionPool:
+    def __init__(
+        self,
+        client: MultiServerMCPClient,
+        server_name: str,
+        size: int = 1,
+        health_check_seconds: float = 30,
+        connect_timeout_seconds: float = 30,
+        max_backoff_seconds: float = 30,
+        max_concurrency: int = 4,
+        call_timeout_seconds: float = 30,
+    ):
+        self.client = client
+        self.server_name = server_name
+        self.size = size
+        self.health_check_seconds = health_check_seconds
+        self.connect_timeout_seconds = connect_timeout_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.max_concurrency = max_concurrency
+        self.call_timeout_seconds = call_timeout_seconds
+        self._call_slots = asyncio.Semaphore(max_concurrency)
+        self._slots: List[_Slot] = []
+        self._keepers: List[asyncio.Task] = []
+        self._available: Optional[asyncio.Event] = None
+        self._counters = {
+            "connects": 0,
+            "connect_errors": 0,
+            "session_failures": 0,
+            "health_checks": 0,
+            "calls": 0,
+            "timeouts": 0,
+            "unavailable": 0,
+        }
+
+    def start(self):
+        """Open the sessions in the background (idempotent)."""
+        if self._keepers:
+            return
+        self._available = asyncio.Event()
+        for _ in range(self.size):
+            slot = _Slot()
+            self._slots.append(slot)
+            self._keepers.append(asyncio.create_task(self._keep(slot)))
+
+    async def close(self):
+        for task in self._keepers:
+            task.cancel()
+        await asyncio.gather(*self._keepers, return_exceptions=True)
+        self._keepers, self._slots = [], []
+
+    async def _keep(self, slot: _Slot):
+        """Own one session: open it, watch it, and reopen it when it fails.
+
+        The session is entered and exited in this task, as the MCP transports'
+        task groups require, while tool calls use it from other tasks.
+        """
+        backoff = 0.5
+        while True:
+            try:
+                async with self.client.session(self.server_name) as session:
+                    slot.session = session
+                    slot.failed.clear()
+                    self._counters["connects"] += 1
+                    self._available.set()
+                    backoff = 0.5
+                    await self._watch(slot)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._counters["connect_errors"] += 1
+                print(f"MCP session to '{self.server_name}' failed: {e!r}")
+            slot.session = None
+            # The transport's task group can swallow our cancellation on exit
+            if asyncio.current_task().cancelling():
+                raise asyncio.CancelledError()
+            if not any(s.healthy for s in self._slots):
+                self._available.clear()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff_seconds)
+
+    async def _watch(self, slot: _Slot):
+        """Return once the session has failed a call or a health check."""
+        while True:
+            try:
+                await asyncio.wait_for(slot.failed.wait(), self.health_check_seconds)
+                return
+            except asyncio.TimeoutError:
+                pass
+            if slot.in_use:
+                continue
+            self._counters["health_checks"] += 1
+            try:
+                await asyncio.wait_for(slot.session.send_ping(), self.connect_timeout_seconds)
+            except Exception:
+                self._counters["session_failures"] += 1
+                return
+
+    @contextlib.asynccontextmanager
+    async def session(self):
+        """Borrow the least busy healthy session.
+
+        Raises ``SessionUnavailable`` if none is up within the connect timeout.
+        """
+        self.start()
+        while True:
+            ready = [slot for slot in self._slots if slot.healthy]
+            if ready:
+                break
+            self._available.clear()
+            try:
+                await asyncio.wait_for(self._available.wait(), self.connect_timeout_seconds)
+            except TimeoutError:
+                raise SessionUnavailable(
+                    f"No session to MCP server '{self.server_name}' after "
+                    f"{self.connect_timeout_seconds:g}s"
+                ) from None
+
+        slot = min(ready, key=lambda s: s.in_use)
+        slot.in_use += 1
+        self._counters["calls"] += 1
+        try:
+            yield slot.session
+        except Exception as e:
+            # Only a lost connection condemns the session; error replies from
+            # the server (McpError) and timeouts leave it in use. Its keeper
+            # will reconnect it
+            if is_transport_error(e):
+                self._counters["session_failures"] += 1
+                slot.failed.set()
+            raise
+        finally:
+            slot.in_use -= 1
+
+    def _error_result(self, text: str) -> CallToolResult:
+        return CallToolResult(content=[TextContent(type="text", text=text)], isError=True)
+
+    async def call_tool(self, name: str, arguments=None, *args, **kwargs) -> CallToolResult:
+        """Call a tool within this server's concurrency limit and timeout.
+
+        A timed-out call is cancelled and reported back to the model as a
+        tool error, rather than failing the whole graph run; so is a call
+        that found no session to the server. The time spent waiting for the
+        limit is recorded on the tool call's tracing span.
+        """
+        queued = time.perf_counter()
+        async with self._call_slots:
+            start = time.perf_counter()
+            annotate(server=self.server_name, queue_ms=round((start - queued) * 1000, 3))
+            outcome = "ok"
+            try:
+                async with self.session() as session:
+                    async with asyncio.timeout(self.call_timeout_seconds):
+                        result = await session.call_tool(name, arguments, *args, **kwargs)
+                if result.isError:
+                    outcome = "error"
+                return result
+            except SessionUnavailable as e:
+                outcome = "unavailable"
+                self._counters["unavailable"] += 1
+                return self._error_result(f"Tool '{name}' could not run: {e}")
+            except TimeoutError:
+                outcome = "timeout"
+                self._counters["timeouts"] += 1
+                return self._error_result(
+                    f"Tool '{name}' on '{self.server_name}' timed out "
+                    f"after {self.call_timeout_seconds:g}s"
+                )
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                annotate(outcome=outcome)
+                tool_metrics.observe(f"{self.server_name}.{name}", time.perf_counter() - start, outcome)
+
+    def stats(self) -> Dict:
+        return {
+            **self._counters,
+            "max_concurrency": self.max_concurrency,
+            "size": self.size,
+            "healthy": sum(slot.healthy for slot in self._slots),
+            "in_use": sum(slot.in_use for slot in self._slots),
+        }
+
+
+class PooledSession:
+    """Stands in for a ``ClientSession`` in langchain-mcp-adapters' tools."""
+
+    def __init__(self, pool: SessionPool):
+        self.pool = pool
+
+    async def list_tools(self, cursor=None, **kwargs):
+        async with self.pool.session() as session:
+            return await session.list_tools(cursor, **kwargs)
+
+    async def call_tool(self, name, arguments=None, *args, **kwargs):
+        return await self.pool.call_tool(name, arguments, *args, **kwargs)
+
+
+async def load_pooled_tools(pool: SessionPool) -> List[BaseTool]:
+    """The server's tools, bound to the pool's long-lived sessions."""
+    return await load_mcp_tools(
+        PooledSession(pool),
+        callbacks=pool.client.callbacks,
+        tool_interceptors=pool.client.tool_interceptors,
+        server_name=pool.server_name,
+    )
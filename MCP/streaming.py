@@ -0,0 +1,45 @@
+"""
+Server-sent event streaming of a graph run, for the entrypoint's
+``"stream": true`` mode.
+"""
+
+import json
+from typing import Dict
+
+from langchain_core.messages import AIMessageChunk
+
+
+def sse(event: Dict) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+
+async def stream_graph(graph, graph_input, answer_nodes, progress=True, on_complete=None):
+    """Stream a graph run as server-sent events.
+
+    Yields a ``token`` event for every chunk of answer text produced by one of
+    ``answer_nodes``, a ``node`` event as each node finishes (if ``progress``)
+    and a final ``done`` event with the complete answer.
+    """
+    final_state = None
+    async for mode, chunk in graph.astream(
+        graph_input, stream_mode=["messages", "updates", "values"]
+    ):
+        if mode == "messages":
+            message, metadata = chunk
+            node = metadata.get("langgraph_node")
+            if (
+                node in answer_nodes
+                and isinstance(message, AIMessageChunk)
+                and isinstance(message.content, str)
+                and message.content
+            ):
+                yield sse({"type": "token", "node": node, "content": message.content})
+        elif mode == "updates" and progress:
+            for node in chunk:
+                yield sse({"type": "node", "node": node})
+        elif mode == "values":
+            final_state = chunk
+
+    if on_complete is not None:
+        on_complete(final_state)
+    yield sse({"type": "done", "answer": final_state["messages"][-1].content})
@@ -0,0 +1,97 @@
+import asyncio
+import sys
+
+import anyio
+import pytest
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from mcp.shared.exceptions import McpError
+
+from session_pool import SessionPool
+
+CALCULATOR = {
+    "command": sys.executable,
+    "args": ["-m", "mcp_server_calculator"],
+    "transport": "stdio",
+}
+
+
+def calculator_pool(**kwargs) -> SessionPool:
+    client = MultiServerMCPClient({"calculator": CALCULATOR})
+    return SessionPool(client, "calculator", **kwargs)
+
+
+async def calculate(pool: SessionPool, expression: str) -> str:
+    result = await pool.call_tool("calculate", {"expression": expression})
+    assert not result.isError, result
+    return result.content[0].text
+
+
+async def wait_for_connects(pool: SessionPool, connects: int):
+    while pool.stats()["connects"] < connects or not pool.stats()["healthy"]:
+        await asyncio.sleep(0.05)
+
+
+def test_calls_reuse_one_session():
+    async def run():
+        pool = calculator_pool()
+        try:
+            answers = [await calculate(pool, f"{i} * 7") for i in range(5)]
+            answers += await asyncio.gather(*(calculate(pool, "6 * 7") for _ in range(5)))
+            return answers, pool.stats()
+        finally:
+            await pool.close()
+
+    answers, stats = asyncio.run(run())
+    assert answers == ["0", "7", "14", "21", "28"] + ["42"] * 5
+    assert (stats["connects"], stats["calls"], stats["session_failures"]) == (1, 10, 0)
+
+
+def test_error_replies_keep_the_session():
+    async def run():
+        pool = calculator_pool()
+        try:
+            with pytest.raises(McpError):
+                async with pool.session() as session:
+                    await session.read_resource("missing://resource")
+            await calculate(pool, "1 + 1")
+            return pool.stats()
+        finally:
+            await pool.close()
+
+    stats = asyncio.run(run())
+    assert (stats["connects"], stats["session_failures"], stats["healthy"]) == (1, 0, 1)
+
+
+def test_lost_connection_respawns_the_session():
+    async def run():
+        pool = calculator_pool()
+        try:
+            await calculate(pool, "1 + 1")
+            with pytest.raises(anyio.ClosedResourceError):
+                async with pool.session():
+                    raise anyio.ClosedResourceError()
+            await asyncio.wait_for(wait_for_connects(pool, 2), 10)
+            return await calculate(pool, "2 + 2"), pool.stats()
+        finally:
+            await pool.close()
+
+    answer, stats = asyncio.run(run())
+    assert answer == "4"
+    assert (stats["connects"], stats["session_failures"]) == (2, 1)
+
+
+def test_unreachable_server_is_not_reported_as_a_timeout():
+    async def run():
+        client = MultiServerMCPClient(
+            {"broken": {"command": "/nonexistent/mcp-server", "args": [], "transport": "stdio"}}
+        )
+        pool = SessionPool(client, "broken", connect_timeout_seconds=0.2)
+        try:
+            return await pool.call_tool("calculate", {"expression": "1"}), pool.stats()
+        finally:
+            await pool.close()
+
+    result, stats = asyncio.run(run())
+    assert result.isError
+    assert "No session to MCP server 'broken'" in result.content[0].text
+    assert (stats["unavailable"], stats["timeouts"]) == (1, 0)
@@ -0,0 +1,67 @@
+"""
+Per-tool latency histograms for MCP tool calls.
+
+Each tool gets fixed millisecond buckets plus ok / error / timeout counts (and
+``unavailable`` when no session to the server came up), so a slow or flaky
+server shows up in the ``stats`` action without a tracing backend.
+"""
+
+from collections import defaultdict
+from typing import Dict
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self.outcomes = defaultdict(int)
+
+    def observe(self, seconds: float, outcome: str = "ok"):
+        ms = seconds * 1000
+        index = next((i for i, bound in enumerate(BUCKETS_MS) if ms <= bound), len(BUCKETS_MS))
+        self.counts[index] += 1
+        self.total += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.outcomes[outcome] += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile (or the max)."""
+        rank, seen = q * self.total, 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                bound = BUCKETS_MS[index] if index < len(BUCKETS_MS) else self.max_ms
+                return round(min(bound, self.max_ms), 2)
+        return 0.0
+
+    def snapshot(self) -> Dict:
+        labels = [f"le_{bound}ms" for bound in BUCKETS_MS] + ["gt_30000ms"]
+        return {
+            "count": self.total,
+            "mean_ms": round(self.sum_ms / self.total, 2) if self.total else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max_ms, 2),
+            "buckets": dict(zip(labels, self.counts)),
+            **self.outcomes,
+        }
+
+
+class ToolMetrics:
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+
+    def observe(self, tool: str, seconds: float, outcome: str = "ok"):
+        self._histograms[tool].observe(seconds, outcome)
+
+    def snapshot(self) -> Dict:
+        return {tool: h.snapshot() for tool, h in sorted(self._histograms.items())}
+
+
+tool_metrics = ToolMetrics()
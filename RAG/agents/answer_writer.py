@@ -1,5 +1,6 @@
-from langgraph.graph import MessagesState
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import ToolMessage
+from utils.llm_client import get_chat_model
+from agents.state import RAGState
 
 GENERATE_PROMPT = (
     "You are an assistant for question-answering tasks. "
@@ -10,18 +11,36 @@ GENERATE_PROMPT = (
     "Context: {context}"
 )
 
-answer_model = ChatOpenAI(
-    model="openai-gpt-4.1",
-    base_url="https://inference.do-ai.run/v1",
-    api_key=os.getenv("DIGITALOCEAN_INFERENCE_KEY"),
-    temperature=0
-)
+answer_model = get_chat_model("openai-gpt-4.1", temperature=0)
+
 
+def best_context(messages) -> str:
+    """Content of the retrieval with the highest similarity score so far."""
+    best, best_score = messages[-1].content, float("-inf")
+    for message in messages:
+        if isinstance(message, ToolMessage) and message.artifact:
+            score = max(doc.metadata.get("score", 0.0) for doc in message.artifact)
+            if score >= best_score:
+                best, best_score = message.content, score
+    return best
 
-def generate_answer(state: MessagesState):
-    """Generate an answer."""
+
+async def _answer(state: RAGState, context: str, best_effort: bool):
     question = state["messages"][0].content
-    context = state["messages"][-1].content
     prompt = GENERATE_PROMPT.format(question=question, context=context)
-    response = answer_model.invoke([{"role": "user", "content": prompt}])
-    return {"messages": [response]}
+    response = await answer_model.ainvoke([{"role": "user", "content": prompt}])
+    return {"messages": [response], "best_effort": best_effort}
+
+
+async def generate_answer(state: RAGState):
+    """Generate an answer from the retrieval just graded relevant."""
+    return await _answer(state, state["messages"][-1].content, best_effort=False)
+
+
+async def generate_best_effort_answer(state: RAGState):
+    """Generate an answer after the budget ran out.
+
+    The last retrieval was not necessarily graded relevant, so the answer is
+    written from the highest-scoring one so far.
+    """
+    return await _answer(state, best_context(state["messages"]), best_effort=True)
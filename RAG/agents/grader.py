@@ -1,6 +1,9 @@
-from typing import Literal
-from langgraph.graph import MessagesState
-from langchain_openai import ChatOpenAI
+import os
+from typing import Dict, Literal, Optional, Tuple
+from langchain_core.messages import ToolMessage
+from agents.state import RAGState, budget_exhausted
+from utils.llm_client import get_chat_model
+from utils.text import tokenize
 from pydantic import BaseModel, Field
 
 GRADE_PROMPT = (
@@ -20,27 +23,107 @@ class GradeDocuments(BaseModel):
     )
 
 
-grader_model = ChatOpenAI(
-    model="openai-gpt-4.1",
-    base_url="https://inference.do-ai.run/v1",
-    api_key=os.getenv("DIGITALOCEAN_INFERENCE_KEY"),
-    temperature=0
-)
+# Retrieval scores at or above this are relevant without asking the LLM...
+ACCEPT_SCORE = float(os.getenv("GRADER_ACCEPT_SCORE", "0.85"))
+# ...and below this, with no question keyword in the context, irrelevant.
+REJECT_SCORE = float(os.getenv("GRADER_REJECT_SCORE", "0.70"))
+# Fraction of question keywords found in the context that counts as relevant,
+# for retrievals that also score at least REJECT_SCORE. Hybrid retrieval
+# returns chunks containing the query terms by construction, so the overlap
+# alone says little.
+ACCEPT_KEYWORD_OVERLAP = float(os.getenv("GRADER_ACCEPT_KEYWORD_OVERLAP", "0.75"))
+
+GRADER_STATS = {
+    "local_relevant_by_score": 0,
+    "local_relevant_by_keywords": 0,
+    "local_irrelevant": 0,
+    "llm_relevant": 0,
+    "llm_irrelevant": 0,
+}
+
+grader_model = get_chat_model("openai-gpt-4.1", temperature=0)
+
+
+def _keywords(text: str):
+    return set(tokenize(text))
+
+
+def local_grade(question: str, message) -> Optional[bool]:
+    """Grade relevance locally, or return ``None`` when the LLM should decide.
+
+    Uses the cosine scores the retriever attached to the documents and the
+    fraction of question keywords that appear in the retrieved text (not in
+    the packed context's source headers). Keyword overlap only accepts a
+    retrieval that also scores at least ``REJECT_SCORE``.
+    """
+    return _local_verdict(question, message)[0]
+
 
+def _local_verdict(question: str, message) -> Tuple[Optional[bool], str]:
+    """``local_grade``'s verdict and the ``GRADER_STATS`` counter it falls under."""
+    text, scores = message.content, []
+    if isinstance(message, ToolMessage) and message.artifact:
+        text = " ".join(doc.page_content for doc in message.artifact)
+        scores = [doc.metadata.get("score", 0.0) for doc in message.artifact]
+
+    keywords = _keywords(question)
+    overlap = 0.0
+    if keywords:
+        overlap = len(keywords & _keywords(text)) / len(keywords)
+
+    best_score = max(scores, default=None)
+
+    if best_score is None:
+        return None, ""
+    if best_score >= ACCEPT_SCORE:
+        return True, "local_relevant_by_score"
+    if best_score >= REJECT_SCORE and overlap >= ACCEPT_KEYWORD_OVERLAP:
+        return True, "local_relevant_by_keywords"
+    if best_score < REJECT_SCORE and overlap == 0:
+        return False, "local_irrelevant"
+    return None, ""
+
+
+def grader_stats() -> Dict:
+    graded = sum(GRADER_STATS.values())
+    llm_calls = GRADER_STATS["llm_relevant"] + GRADER_STATS["llm_irrelevant"]
+    avoided = graded - llm_calls
+    return {
+        **GRADER_STATS,
+        "llm_calls": llm_calls,
+        "llm_calls_avoided": avoided,
+        "avoided_rate": round(avoided / graded, 4) if graded else 0.0,
+    }
+
+
+async def grade_documents(
+    state: RAGState,
+) -> Literal["generate_answer", "generate_best_effort_answer", "rewrite_question"]:
+    """Determine whether the retrieved documents are relevant to the question.
+
+    Confident cases are decided locally; only the ambiguous middle band pays
+    for an LLM call. Once the request's budget is spent there is nothing left
+    to rewrite, so the best-effort answer is generated from the best context
+    found.
+    """
+    if budget_exhausted(state):
+        return "generate_best_effort_answer"
 
-def grade_documents(
-    state: MessagesState,
-) -> Literal["generate_answer", "rewrite_question"]:
-    """Determine whether the retrieved documents are relevant to the question."""
     question = state["messages"][0].content
     context = state["messages"][-1].content
 
+    relevant, counter = _local_verdict(question, state["messages"][-1])
+    if relevant is not None:
+        GRADER_STATS[counter] += 1
+        return "generate_answer" if relevant else "rewrite_question"
+
     prompt = GRADE_PROMPT.format(question=question, context=context)
-    response = grader_model.with_structured_output(GradeDocuments).invoke(
+    response = await grader_model.with_structured_output(GradeDocuments).ainvoke(
         [{"role": "user", "content": prompt}]
     )
     score = response.binary_score
 
+    GRADER_STATS["llm_relevant" if score == "yes" else "llm_irrelevant"] += 1
     if score == "yes":
         return "generate_answer"
     else:
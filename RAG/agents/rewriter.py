@@ -1,5 +1,5 @@
-from langgraph.graph import MessagesState
-from langchain_openai import ChatOpenAI
+from agents.state import RAGState, deadline_passed
+from utils.llm_client import get_chat_model
 
 REWRITE_PROMPT = (
     "Look at the input and try to reason about the underlying semantic intent / meaning.\n"
@@ -10,18 +10,22 @@ REWRITE_PROMPT = (
     "Formulate an improved question:"
 )
 
-rewriter_model = ChatOpenAI(
-    model="openai-gpt-4.1",
-    base_url="https://inference.do-ai.run/v1",
-    api_key=os.getenv("DIGITALOCEAN_INFERENCE_KEY"),
-    temperature=0
-)
+rewriter_model = get_chat_model("openai-gpt-4.1", temperature=0)
+
 
+async def rewrite_question(state: RAGState):
+    """Rewrite the original user question.
 
-def rewrite_question(state: MessagesState):
-    """Rewrite the original user question."""
+    Skipped once the deadline has passed; the next turn then answers from
+    what was already retrieved.
+    """
+    if deadline_passed(state):
+        return {}
     messages = state["messages"]
     question = messages[0].content
     prompt = REWRITE_PROMPT.format(question=question)
-    response = rewriter_model.invoke([{"role": "user", "content": prompt}])
-    return {"messages": [{"role": "user", "content": response.content}]}
+    response = await rewriter_model.ainvoke([{"role": "user", "content": prompt}])
+    return {
+        "messages": [{"role": "user", "content": response.content}],
+        "iterations": state.get("iterations", 0) + 1,
+    }
@@ -0,0 +1,43 @@
+import time
+from typing import Annotated, Dict, NotRequired, Tuple
+from langgraph.graph import MessagesState
+
+
+def merge_retrievals(left: Dict, right: Dict) -> Dict:
+    return {**(left or {}), **(right or {})}
+
+
+class RAGState(MessagesState):
+    """Graph state with a per-request latency budget.
+
+    ``deadline`` is a ``time.monotonic()`` timestamp and ``max_iterations``
+    caps how many times the question may be rewritten. ``retrievals``
+    memoizes retriever results by normalized query for the current request.
+    ``best_effort`` is set when the answer was written from the best context
+    found after the budget ran out, rather than from one graded relevant;
+    which of the two happens is decided by the routing into the answer
+    nodes, not by the clock when the answer is written.
+    None of these fields are returned to the caller.
+    """
+
+    deadline: NotRequired[float]
+    max_iterations: NotRequired[int]
+    iterations: NotRequired[int]
+    retrievals: Annotated[Dict[str, Tuple], merge_retrievals]
+    best_effort: NotRequired[bool]
+
+
+def deadline_passed(state: RAGState) -> bool:
+    """True once the request is out of time."""
+    deadline = state.get("deadline")
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def budget_exhausted(state: RAGState) -> bool:
+    """True once the request is out of time or out of rewrite iterations."""
+    if deadline_passed(state):
+        return True
+    max_iterations = state.get("max_iterations")
+    if max_iterations is not None and state.get("iterations", 0) >= max_iterations:
+        return True
+    return False
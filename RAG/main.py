@@ -1,46 +1,126 @@
+import asyncio
+import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from agents.grader import grade_documents
+from agents.grader import grade_documents, grader_stats
 from agents.rewriter import rewrite_question
-from agents.answer_writer import generate_answer
-from tools.doc_retriever import create_retriever
-from langgraph.graph import MessagesState, StateGraph, START, END
-from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_openai import ChatOpenAI
+from agents.answer_writer import generate_answer, generate_best_effort_answer
+from agents.state import RAGState, deadline_passed
+from tools.context_packer import ContextPacker
+from tools.doc_retriever import DocumentIndex
+from utils.compaction import HistoryCompactor
+from utils.llm_client import get_chat_model, pool_stats
+from utils.scheduler import scheduler
+from utils.semantic_cache import SemanticCache
+from utils.streaming import sse, stream_graph
+from utils.trace_callbacks import tracing_handler
+from utils.tracing import tracer
+from fastapi.encoders import jsonable_encoder
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.graph import StateGraph, START, END
+from langgraph.prebuilt import tools_condition
 from gradient_adk import entrypoint
-from typing import Dict
+from typing import Dict, Optional
 
 
 PDF_FOLDER_PATH = "./pdfs"
 
-response_model = ChatOpenAI(
-    model="openai-gpt-4.1",
-    base_url="https://inference.do-ai.run/v1",
-    api_key=os.getenv("DIGITALOCEAN_INFERENCE_KEY"),
-    temperature=0.2
+# Per-request budget for the rewrite/retrieve loop; a request can override
+# these with "budget_seconds" and "max_rewrites".
+DEADLINE_SECONDS = float(os.getenv("RAG_DEADLINE_SECONDS", "30"))
+MAX_REWRITES = int(os.getenv("RAG_MAX_REWRITES", "2"))
+
+response_model = get_chat_model("openai-gpt-4.1", temperature=0.2)
+
+document_index = DocumentIndex(PDF_FOLDER_PATH)
+retriever_tool = document_index.as_tool()
+
+# Retrieved chunks overlap heavily; the grader and answer writer get them
+# merged per page, deduplicated and packed into this many (estimated) tokens
+context_packer = ContextPacker(
+    token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500")),
+    duplicate_threshold=float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.8")),
 )
 
-retriever_tool = create_retriever(PDF_FOLDER_PATH)
+# Each query-generation turn sees the original question and only the latest
+# rewrite; earlier rewrites and the retrievals graded irrelevant are dropped
+history_compactor = HistoryCompactor(
+    max_tokens=int(os.getenv("HISTORY_MAX_TOKENS", "8000")),
+    tool_result_tokens=int(os.getenv("HISTORY_TOOL_RESULT_TOKENS", "500")),
+    drop_superseded_turns=True,
+)
+
+# Near-identical questions are answered from this cache without any LLM calls
+answer_cache = SemanticCache(
+    threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+)
 
 
-def generate_query_or_respond(state: MessagesState):
+async def generate_query_or_respond(state: RAGState):
     """Call the model to generate a response based on the current state. Given
     the question, it will decide to retrieve using the retriever tool, or simply
     respond to the user.
+
+    Once the deadline has passed and something was already retrieved, the
+    model is not called again; ``route_query`` goes to the best-effort answer.
     """
-    response = response_model.bind_tools([retriever_tool]).invoke(state["messages"])
+    if deadline_passed(state) and any(
+        isinstance(message, ToolMessage) for message in state["messages"]
+    ):
+        return {}
+    response = await response_model.bind_tools([retriever_tool]).ainvoke(
+        history_compactor.compact(state["messages"])
+    )
     return {"messages": [response]}
 
 
-workflow = StateGraph(MessagesState)
+async def retrieve(state: RAGState):
+    """Run the retriever for each tool call, reusing results for queries that
+    were already retrieved earlier in this request. The tool message carries
+    the packed context; the raw chunks and their scores stay in the artifact.
+    """
+    memo = state.get("retrievals") or {}
+    messages, retrievals = [], {}
+    for tool_call in state["messages"][-1].tool_calls:
+        query = " ".join(str(tool_call["args"].get("query", "")).lower().split())
+        if query in memo or query in retrievals:
+            content, artifact = memo.get(query) or retrievals[query]
+        else:
+            result = await retriever_tool.ainvoke(tool_call)
+            artifact = result.artifact
+            content = context_packer.pack(artifact) if artifact else result.content
+            retrievals[query] = (content, artifact)
+        messages.append(
+            ToolMessage(
+                content=content,
+                artifact=artifact,
+                name=tool_call["name"],
+                tool_call_id=tool_call["id"],
+            )
+        )
+    return {"messages": messages, "retrievals": retrievals}
+
+
+def route_query(state: RAGState):
+    """Retrieve, respond, or, if the model was skipped, answer best-effort."""
+    if not isinstance(state["messages"][-1], AIMessage):
+        return "generate_best_effort_answer"
+    return tools_condition(state)
+
+
+workflow = StateGraph(RAGState)
 
 # Define the nodes we will cycle between
 workflow.add_node("generate_query_or_respond", generate_query_or_respond)
-workflow.add_node("retrieve", ToolNode([retriever_tool]))
+workflow.add_node("retrieve", retrieve)
 workflow.add_node("rewrite_question", rewrite_question)
 workflow.add_node("generate_answer", generate_answer)
+workflow.add_node("generate_best_effort_answer", generate_best_effort_answer)
 
 workflow.add_edge(START, "generate_query_or_respond")
 
@@ -48,10 +128,11 @@ workflow.add_edge(START, "generate_query_or_respond")
 workflow.add_conditional_edges(
     "generate_query_or_respond",
     # Assess LLM decision (call `retriever_tool` tool or respond to the user)
-    tools_condition,
+    route_query,
     {
         # Translate the condition outputs to nodes in our graph
         "tools": "retrieve",
+        "generate_best_effort_answer": "generate_best_effort_answer",
         END: END,
     },
 )
@@ -63,18 +144,127 @@ workflow.add_conditional_edges(
     grade_documents,
 )
 workflow.add_edge("generate_answer", END)
+workflow.add_edge("generate_best_effort_answer", END)
 workflow.add_edge("rewrite_question", "generate_query_or_respond")
 
-# Compile
-agent_graph = workflow.compile()
+# Compile; every run is traced node by node (see utils/tracing.py)
+agent_graph = workflow.compile().with_config(callbacks=[tracing_handler])
+
+
+def cache_entry(final_state) -> Optional[Dict]:
+    """What the answer cache keeps for a run: the answer text and its sources.
+
+    Best-effort answers written after the budget ran out are not cached, so
+    later paraphrases get a full run instead.
+    """
+    if final_state.get("best_effort"):
+        return None
+    sources = []
+    for message in final_state["messages"]:
+        if isinstance(message, ToolMessage) and message.artifact:
+            for doc in message.artifact:
+                source = {
+                    "source": os.path.basename(doc.metadata.get("source", "")),
+                    "page": doc.metadata.get("page"),
+                }
+                if source not in sources:
+                    sources.append(source)
+    return {"answer": final_state["messages"][-1].content, "sources": sources}
+
+
+def cached_response(question: Dict, entry: Dict) -> Dict:
+    """A response for ``question`` answered from the cache."""
+    answer = AIMessage(
+        content=entry["answer"],
+        response_metadata={"cache": "hit", "sources": entry["sources"]},
+    )
+    return {"messages": [HumanMessage(content=question["content"]), answer]}
 
 
 @entrypoint
 async def main(input: Dict, context: Dict):
-    """Entrypoint"""
+    """Entrypoint
+
+    With ``"stream": true`` the answer is streamed as server-sent events;
+    otherwise a single JSON response is returned, as before.
+    """
+    stream = input.get("stream", False)
+
+    # Re-index added, changed or deleted PDFs without restarting the agent
+    if input.get("action") == "reindex":
+        stats = await asyncio.to_thread(document_index.refresh)
+        yield {"reindex": stats}
+        return
+
+    if input.get("action") == "stats":
+        yield {
+            "answer_cache": answer_cache.stats(),
+            "grader": grader_stats(),
+            "context": context_packer.stats.as_dict(),
+            "history": history_compactor.stats.as_dict(),
+            "http_pool": pool_stats(),
+            "upstream": scheduler.stats(),
+            "tracing": tracer.summary(),
+        }
+        return
+
+    if scheduler.overloaded():
+        # Backpressure: the upstream queue is full, so don't start more work
+        yield {"error": "upstream overloaded, retry later"}
+        return
 
     input_request = input.get("prompt")
+
+    # Only single-turn questions are cacheable; earlier turns change the answer
+    messages = input_request.get("messages", [])
+    question_vector = None
+    index_version = document_index.version
+    if len(messages) == 1:
+        with tracer.span("answer_cache", "cache") as span:
+            question_vector = await document_index.embeddings.aembed_query(
+                messages[0]["content"]
+            )
+            cached = answer_cache.get(question_vector, index_version)
+            span.set(cache="miss" if cached is None else "hit")
+        if cached is not None:
+            if stream:
+                answer = cached["answer"]
+                yield sse({"type": "token", "node": "cache", "content": answer})
+                yield sse({"type": "done", "answer": answer})
+            else:
+                yield jsonable_encoder({"response": cached_response(messages[0], cached)})
+            return
+
+    def cache_answer(final_state):
+        entry = cache_entry(final_state)
+        if question_vector is not None and entry is not None:
+            answer_cache.put(question_vector, entry, index_version)
+
+    budget_seconds = float(input.get("budget_seconds", DEADLINE_SECONDS))
+    graph_input = {
+        **input_request,
+        "deadline": time.monotonic() + budget_seconds,
+        "max_iterations": int(input.get("max_rewrites", MAX_REWRITES)),
+        "iterations": 0,
+    }
+
+    if stream:
+        async for event in stream_graph(
+            agent_graph,
+            graph_input,
+            answer_nodes={
+                "generate_query_or_respond",
+                "generate_answer",
+                "generate_best_effort_answer",
+            },
+            progress=input.get("progress", True),
+            on_complete=cache_answer,
+        ):
+            yield event
+        return
+
     # Invoke the app
-    result = await agent_graph.ainvoke(input_request)
-    final_response = result
-    return {"response": final_response}
+    result = await agent_graph.ainvoke(graph_input)
+    cache_answer(result)
+    # The budget and retrieval memo are internal; respond with the messages only
+    yield jsonable_encoder({"response": {"messages": result["messages"]}})
@@ -0,0 +1,86 @@
+import asyncio
+import importlib
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+RAG_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAG_DIR))
+sys.path.insert(0, str(RAG_DIR.parent / "benchmarks"))
+
+from fake_openai_server import server_stats, start_server  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def fake_server():
+    """Base URL of a local OpenAI-compatible fake (see benchmarks/)."""
+    with start_server(latency_ms=0) as base_url:
+        yield base_url
+
+
+@pytest.fixture
+def pdf_folder(tmp_path):
+    """A folder with two of the bundled PDFs."""
+    folder = tmp_path / "pdfs"
+    folder.mkdir()
+    for name in ("hubble-fact-sheet-gyroscopes.pdf", "hst-tools-fact-sheet.pdf"):
+        shutil.copy(RAG_DIR / "pdfs" / name, folder / name)
+    return folder
+
+
+@pytest.fixture(scope="session")
+def rag_main(fake_server, tmp_path_factory):
+    """The template's ``main`` module, pointed at the fake server.
+
+    Imported from a scratch working directory, so its index starts cold.
+    """
+    workdir = tmp_path_factory.mktemp("rag")
+    os.symlink(RAG_DIR / "pdfs", workdir / "pdfs")
+    os.environ.update(
+        {
+            "OPENAI_BASE_URL": fake_server,
+            "OPENAI_API_KEY": "fake",
+            "INFERENCE_BASE_URL": fake_server,
+            "DIGITALOCEAN_INFERENCE_KEY": "fake",
+            # The fake embeddings are bags of words; let reworded questions match
+            "ANSWER_CACHE_THRESHOLD": "0.8",
+            "INGEST_WORKERS": "1",
+        }
+    )
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        yield importlib.import_module("main")
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture(scope="session")
+def run():
+    """Run a coroutine to completion.
+
+    All runs share one event loop: the template's pooled async clients are
+    bound to the loop they were first used on.
+    """
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def run_entrypoint(run):
+    """Run an entrypoint to completion, returning every chunk it yields."""
+
+    async def drain(entrypoint, request):
+        return [chunk async for chunk in entrypoint(request, {})]
+
+    return lambda entrypoint, request: run(drain(entrypoint, request))
+
+
+@pytest.fixture
+def chat_calls(fake_server):
+    """Chat completions the fake server has answered so far."""
+    return lambda: server_stats(fake_server).get("chat_completions", 0)
@@ -0,0 +1,42 @@
+import pytest
+
+
+@pytest.fixture
+def ask(rag_main, run_entrypoint):
+    def ask(question, **options):
+        request = {"prompt": {"messages": [{"role": "user", "content": question}]}, **options}
+        (chunk,) = run_entrypoint(rag_main.main, request)
+        return chunk["response"]["messages"]
+
+    return ask
+
+
+def test_reworded_question_is_answered_from_the_cache(rag_main, ask):
+    before = rag_main.answer_cache.stats()["hits"]
+    answer = ask("What does STIS detect?")[-1]["content"]
+
+    messages = ask("STIS: what does it detect?")
+
+    assert rag_main.answer_cache.stats()["hits"] == before + 1
+    # The response is built around the question that was asked
+    assert messages[0]["content"] == "STIS: what does it detect?"
+    assert messages[-1]["content"] == answer
+    assert messages[-1]["response_metadata"]["cache"] == "hit"
+
+
+def test_unrelated_question_misses(rag_main, ask):
+    ask("How many gyroscopes does Hubble carry?")
+    hits = rag_main.answer_cache.stats()["hits"]
+
+    messages = ask("Which tools do astronauts use on spacewalks?")
+
+    assert rag_main.answer_cache.stats()["hits"] == hits
+    assert messages[-1].get("response_metadata", {}).get("cache") != "hit"
+
+
+def test_best_effort_answers_are_not_cached(rag_main, ask):
+    size = rag_main.answer_cache.stats()["size"]
+
+    ask("What wavelengths does the COS instrument cover?", budget_seconds=0)
+
+    assert rag_main.answer_cache.stats()["size"] == size
@@ -0,0 +1,43 @@
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+
+def retrieved_state(deadline: float):
+    call = {"name": "retrieve_documents", "args": {"query": "stis"}, "id": "call_1"}
+    return {
+        "messages": [
+            HumanMessage(content="What does STIS detect?"),
+            AIMessage(content="", tool_calls=[call]),
+            ToolMessage(content="STIS is a spectrograph.", tool_call_id="call_1"),
+        ],
+        "deadline": deadline,
+        "iterations": 0,
+        "max_iterations": 2,
+    }
+
+
+def test_answer_graded_relevant_is_not_best_effort_after_the_deadline(rag_main, run):
+    # The grader accepted this context; the deadline passing afterwards does
+    # not turn the answer into a best-effort one
+    update = run(rag_main.generate_answer(retrieved_state(time.monotonic() - 1)))
+    assert update["best_effort"] is False
+
+
+def test_no_model_calls_start_after_the_deadline(rag_main, run, chat_calls):
+    state = retrieved_state(time.monotonic() - 1)
+    before = chat_calls()
+
+    assert run(rag_main.rewrite_question(state)) == {}
+    assert run(rag_main.generate_query_or_respond(state)) == {}
+    assert rag_main.route_query(state) == "generate_best_effort_answer"
+    assert chat_calls() == before
+
+
+def test_out_of_budget_request_answers_best_effort(rag_main, run_entrypoint):
+    request = {
+        "prompt": {"messages": [{"role": "user", "content": "What does the COS cover?"}]},
+        "budget_seconds": 0,
+    }
+    (chunk,) = run_entrypoint(rag_main.main, request)
+    assert chunk["response"]["messages"][-1]["type"] == "ai"
@@ -0,0 +1,100 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from utils.compaction import HistoryCompactor, message_tokens
+
+
+def text(tokens: int) -> str:
+    # estimate_tokens counts 3 bytes per token, plus one
+    return ("data " * tokens)[: (tokens - 1) * 3]
+
+
+def tool_round(n: int, *sizes: int):
+    calls = [
+        {"name": "search", "args": {"query": f"step {n}.{i}"}, "id": f"call_{n}_{i}"}
+        for i in range(len(sizes))
+    ]
+    return [AIMessage(content="", tool_calls=calls)] + [
+        ToolMessage(content=text(size), tool_call_id=call["id"])
+        for size, call in zip(sizes, calls)
+    ]
+
+
+def history(*rounds):
+    messages = [HumanMessage(content="What does STIS detect?")]
+    for n, sizes in enumerate(rounds):
+        messages += tool_round(n, *sizes)
+    return messages
+
+
+def assert_paired(messages):
+    """Every tool call has its result and every result its call."""
+    calls = {call["id"] for m in messages if isinstance(m, AIMessage) for call in m.tool_calls}
+    results = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+    assert calls == results
+
+
+def total_tokens(messages):
+    return sum(message_tokens(m) for m in messages)
+
+
+def test_older_tool_results_are_cut_to_tool_result_tokens():
+    compactor = HistoryCompactor(max_tokens=100000, tool_result_tokens=100)
+    messages = history([1000, 50], [1000])
+
+    compacted = compactor.compact(messages)
+
+    old_big, old_small, latest = [m for m in compacted if isinstance(m, ToolMessage)]
+    # The first 100 tokens' worth of bytes, then a note on what was cut
+    assert old_big.content.startswith(text(1000)[:300])
+    assert "[truncated, 900 of 1000 tokens omitted]" in old_big.content
+    assert old_small.content == text(50)
+    # The latest round is what the model is about to act on; it stays whole
+    assert latest.content == text(1000)
+    assert compactor.stats.tool_results_truncated == 1
+
+
+def test_oldest_tool_rounds_are_dropped_over_max_tokens():
+    compactor = HistoryCompactor(max_tokens=800, tool_result_tokens=10000)
+    messages = history([300], [300], [300], [300], [300])
+
+    compacted = compactor.compact(messages)
+
+    assert total_tokens(compacted) <= 800
+    assert compacted[0] is messages[0]
+    kept = [m.tool_call_id for m in compacted if isinstance(m, ToolMessage)]
+    assert kept == ["call_3_0", "call_4_0"]
+    assert compactor.stats.turns_dropped == 3
+
+
+def test_tool_calls_stay_paired_with_their_results():
+    compactor = HistoryCompactor(max_tokens=600, tool_result_tokens=200)
+    messages = history([400, 400, 50], [300, 300], [500, 20, 20])
+
+    compacted = compactor.compact(messages)
+
+    assert compactor.stats.turns_dropped and compactor.stats.tool_results_truncated
+    assert_paired(compacted)
+    # A round is kept or dropped whole, never split
+    for message in compacted:
+        if isinstance(message, AIMessage):
+            i = compacted.index(message)
+            results = compacted[i + 1 : i + 1 + len(message.tool_calls)]
+            assert [m.tool_call_id for m in results] == [c["id"] for c in message.tool_calls]
+
+
+def test_superseded_rewrites_and_their_retrievals_are_dropped():
+    messages = (
+        history([100])
+        + [HumanMessage(content="Which wavelengths does STIS observe?")]
+        + tool_round(1, 100)
+        + [HumanMessage(content="STIS spectrograph wavelength range")]
+    )
+
+    compacted = HistoryCompactor(drop_superseded_turns=True).compact(messages)
+    assert [m.content for m in compacted] == [
+        "What does STIS detect?",
+        "STIS spectrograph wavelength range",
+    ]
+
+    kept = HistoryCompactor(drop_superseded_turns=False).compact(messages)
+    assert len(kept) == len(messages)
@@ -0,0 +1,82 @@
+from langchain_core.documents import Document
+
+from tools.context_packer import ContextPacker, join_overlapping
+from tools.embedding_pipeline import estimate_tokens
+
+WORDS = "hubble telescope orbit mirror spectrograph camera servicing mission gyro data".split()
+
+
+def words(start: int, count: int) -> str:
+    return " ".join(f"{WORDS[i % len(WORDS)]}{i}" for i in range(start, start + count))
+
+
+def chunk(number: int, text: str, score: float, source="hubble.pdf", page=0) -> Document:
+    return Document(
+        id=f"{source}:{number}",
+        page_content=text,
+        metadata={"source": f"./pdfs/{source}", "page": page, "score": score},
+    )
+
+
+def test_overlapping_chunks_of_a_page_merge_into_one_span():
+    docs = [
+        chunk(1, words(10, 20), 0.7),
+        chunk(0, words(0, 20), 0.9),
+        chunk(5, words(50, 20), 0.6),
+        chunk(0, words(0, 20), 0.9, page=1),
+    ]
+
+    spans = ContextPacker().merge(docs)
+
+    assert [(span.page, span.chunks) for span in spans] == [(0, [0, 1]), (0, [5]), (1, [0])]
+    # The ten words the neighbours share are written once
+    assert spans[0].text == words(0, 30)
+    assert spans[0].score == 0.9
+    assert spans[0].header == "[hubble.pdf p.1]"
+
+
+def test_join_overlapping_without_shared_text():
+    assert join_overlapping("first part", "second part") == "first part second part"
+
+
+def test_near_duplicates_of_a_better_span_are_dropped():
+    boilerplate = words(100, 40)
+    docs = [
+        chunk(0, boilerplate, 0.9, source="a.pdf"),
+        chunk(0, boilerplate + " footer", 0.8, source="b.pdf"),
+        chunk(0, words(200, 40), 0.7, source="c.pdf"),
+    ]
+    packer = ContextPacker(duplicate_threshold=0.8)
+
+    context = packer.pack(docs)
+
+    assert "[a.pdf p.1]" in context and "[c.pdf p.1]" in context
+    assert "[b.pdf p.1]" not in context
+    assert packer.stats.duplicates_dropped == 1
+
+
+def test_spans_past_the_token_budget_are_dropped_best_first():
+    docs = [
+        chunk(0, words(i * 100, 60), score, source=f"{i}.pdf")
+        for i, score in enumerate([0.5, 0.9, 0.7])
+    ]
+    # Room for the two best spans with their headers, not for the third
+    budget = sum(estimate_tokens(f"[{i}.pdf p.1]\n\n" + docs[i].page_content) for i in (1, 2))
+    packer = ContextPacker(token_budget=budget)
+
+    context = packer.pack(docs)
+
+    assert estimate_tokens(context) <= budget
+    assert context.index("[1.pdf p.1]") < context.index("[2.pdf p.1]")
+    assert "[0.pdf p.1]" not in context
+    assert packer.stats.over_budget_dropped == 1
+
+
+def test_best_span_is_truncated_when_it_alone_is_over_budget():
+    packer = ContextPacker(token_budget=40)
+
+    context = packer.pack([chunk(0, words(0, 200), 0.9)])
+
+    assert context.startswith("[hubble.pdf p.1]\n") and context.endswith(" ...")
+    assert estimate_tokens(context) <= 40
+    assert packer.stats.truncated == 1
@@ -0,0 +1,83 @@
+import shutil
+from pathlib import Path
+
+from tools.doc_retriever import DocumentIndex
+from tools.embedding_pipeline import BatchedEmbeddings, EmbeddingStats
+
+RAG_DIR = Path(__file__).resolve().parent.parent
+
+
+def make_index(fake_server, pdf_folder, index_dir):
+    embeddings = BatchedEmbeddings(base_url=fake_server, api_key="fake")
+    return DocumentIndex(
+        str(pdf_folder), index_dir=str(index_dir), embeddings=embeddings, workers=1
+    )
+
+
+def test_restart_embeds_nothing(fake_server, pdf_folder, tmp_path):
+    first = make_index(fake_server, pdf_folder, tmp_path / "index")
+    assert first.embeddings.stats.unique_texts > 0
+
+    restarted = make_index(fake_server, pdf_folder, tmp_path / "index")
+    assert restarted.embeddings.stats.requests == 0
+    assert len(restarted.retriever.index) == len(first.retriever.index)
+    assert restarted.version == first.version
+
+
+def test_removed_pdf_drops_its_vectors(fake_server, pdf_folder, tmp_path):
+    index = make_index(fake_server, pdf_folder, tmp_path / "index")
+    removed = pdf_folder / "hst-tools-fact-sheet.pdf"
+    removed_keys = {chunk["key"] for chunk in index._files[removed.name]["chunks"]}
+    kept_keys = set(index.store.keys()) - removed_keys
+    removed.unlink()
+
+    stats = index.refresh()
+
+    assert stats["removed"] == [removed.name]
+    assert set(index.store.keys()) == kept_keys
+    sources = {doc.metadata["source"] for doc in index.retriever.index.documents}
+    assert str(removed) not in sources
+
+    # The removal is persisted, not just applied in memory
+    restarted = make_index(fake_server, pdf_folder, tmp_path / "index")
+    assert set(restarted.store.keys()) == kept_keys
+    assert restarted.embeddings.stats.requests == 0
+
+
+def test_added_pdf_is_the_only_one_parsed(fake_server, pdf_folder, tmp_path):
+    index = make_index(fake_server, pdf_folder, tmp_path / "index")
+    shutil.copy(RAG_DIR / "pdfs" / "hubble-fact-sheet-overview.pdf", pdf_folder)
+
+    stats = index.refresh()
+
+    assert stats["added"] == ["hubble-fact-sheet-overview.pdf"]
+    assert sorted(stats["unchanged"]) == sorted(
+        ["hubble-fact-sheet-gyroscopes.pdf", "hst-tools-fact-sheet.pdf"]
+    )
+    sources = {doc.metadata["source"] for doc in index.retriever.index.documents}
+    assert str(pdf_folder / "hubble-fact-sheet-overview.pdf") in sources
+
+
+def test_embedding_starts_before_parsing_finishes(fake_server, pdf_folder, tmp_path):
+    # A budget small enough to flush every few chunks
+    embeddings = BatchedEmbeddings(
+        base_url=fake_server, api_key="fake", batch_tokens=50, max_concurrency=1
+    )
+    index = DocumentIndex(
+        str(pdf_folder), index_dir=str(tmp_path / "index"), embeddings=embeddings, workers=1
+    )
+    documents = index.retriever.index.documents
+    index.store.remove(list(index.store.keys()))
+    embeddings.stats = EmbeddingStats()
+    embedded_before = []
+
+    def parsed():
+        for doc in documents:
+            embedded_before.append(embeddings.stats.unique_texts)
+            yield doc.metadata["source"], [doc]
+
+    index._index_splits(parsed())
+
+    # Chunks were embedded while later files were still being yielded
+    assert 0 < embedded_before[-1] < len(documents)
+    assert all(index.store.chunk_key(doc.page_content) in index.store for doc in documents)
@@ -0,0 +1,27 @@
+import asyncio
+
+from tools.embedding_pipeline import BatchedEmbeddings
+
+
+def test_queries_are_not_counted_as_ingestion(fake_server):
+    embeddings = BatchedEmbeddings(base_url=fake_server, api_key="fake")
+    embeddings.embed_documents(["first chunk", "second chunk", "first  chunk"])
+    embeddings.embed_query("a question")
+    asyncio.run(embeddings.aembed_query("another question"))
+
+    assert embeddings.stats.texts == 3
+    assert embeddings.stats.unique_texts == 2
+    assert embeddings.query_stats.texts == 2
+
+
+def test_refresh_batches_across_files(fake_server, pdf_folder, tmp_path):
+    from tools.doc_retriever import DocumentIndex
+
+    embeddings = BatchedEmbeddings(base_url=fake_server, api_key="fake")
+    DocumentIndex(
+        str(pdf_folder), index_dir=str(tmp_path / "index"), embeddings=embeddings, workers=1
+    )
+
+    # Both files' chunks fit one batch, so one request instead of one per file
+    assert embeddings.stats.batches == 1
+    assert embeddings.stats.requests == 1
@@ -0,0 +1,17 @@
+import json
+
+
+def test_response_carries_only_messages(rag_main, run_entrypoint):
+    request = {"prompt": {"messages": [{"role": "user", "content": "What is one-gyro mode?"}]}}
+    (chunk,) = run_entrypoint(rag_main.main, request)
+
+    assert list(chunk["response"]) == ["messages"]
+
+
+def test_stream_ends_with_the_answer(rag_main, run_entrypoint):
+    question = {"role": "user", "content": "How does Hubble send its data to the ground?"}
+    chunks = run_entrypoint(rag_main.main, {"prompt": {"messages": [question]}, "stream": True})
+
+    events = [json.loads(chunk[len("data: "):]) for chunk in chunks]
+    assert {"type": "node", "node": "retrieve"} in events
+    assert events[-1]["type"] == "done" and events[-1]["answer"]
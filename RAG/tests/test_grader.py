@@ -0,0 +1,19 @@
+from langchain_core.documents import Document
+from langchain_core.messages import ToolMessage
+
+
+def retrieval(text: str, score: float) -> ToolMessage:
+    doc = Document(page_content=text, metadata={"score": score})
+    return ToolMessage(content=text, tool_call_id="test", artifact=[doc])
+
+
+def test_keyword_overlap_needs_a_plausible_cosine_score(rag_main):
+    from agents.grader import local_grade
+
+    question = "When was STIS installed on Hubble?"
+    text = "STIS was installed on Hubble in 1997."
+
+    # Hybrid retrieval matches the terms; a low cosine score leaves it to the LLM
+    assert local_grade(question, retrieval(text, 0.40)) is None
+    assert local_grade(question, retrieval(text, 0.75)) is True
+    assert local_grade(question, retrieval("Gyroscopes spin fast.", 0.40)) is False
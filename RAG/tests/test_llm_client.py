@@ -0,0 +1,21 @@
+import httpx
+
+from utils.llm_client import _on_request
+from utils.scheduler import ScheduledTransport
+from utils.tracing import tracer
+
+
+def test_scheduler_retries_are_counted_on_the_span():
+    responses = [httpx.Response(503, headers={"Retry-After": "0"}), httpx.Response(200)]
+    client = httpx.Client(
+        transport=ScheduledTransport(httpx.MockTransport(lambda request: responses.pop(0))),
+        event_hooks={"request": [_on_request]},
+    )
+
+    with tracer.span("chat", "llm") as span:
+        response = client.get("http://retry.test/v1/models")
+
+    assert response.status_code == 200
+    # One request from the client, retried once inside the scheduler's transport
+    assert span.attributes["http_requests"] == 1
+    assert span.attributes["retries"] == 1
@@ -0,0 +1,193 @@
+"""
+Assembles retrieved chunks into a compact, attributed prompt context.
+
+The index splits pages into 100-token chunks that overlap by 50, so pasting
+the top-k chunks into a prompt repeats about half the text. A
+``ContextPacker`` merges chunks that are adjacent or overlapping on the same
+PDF page back into one span, drops spans that are near-duplicates of a better
+scoring one (repeated headers, footers and boilerplate across pages), and
+packs the rest, best score first, into a token budget. Spans are grouped
+under one ``[file p.N]`` header per page, so every passage keeps its source.
+"""
+
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from tools.embedding_pipeline import estimate_tokens
+
+SPAN_SEPARATOR = "\n\n"
+# Between non-adjacent passages of the same page
+GAP_SEPARATOR = "\n...\n"
+
+
+@dataclass
+class ContextSpan:
+    source: str
+    page: Optional[int]
+    page_label: Optional[str]
+    text: str
+    score: float
+    chunks: List[int] = field(default_factory=list)
+
+    @property
+    def header(self) -> str:
+        label = self.page_label or (self.page + 1 if self.page is not None else None)
+        return f"[{self.source} p.{label}]" if label is not None else f"[{self.source}]"
+
+
+@dataclass
+class PackingStats:
+    """Counters across every context packed by one ``ContextPacker``."""
+
+    contexts: int = 0
+    chunks: int = 0
+    spans: int = 0
+    duplicates_dropped: int = 0
+    over_budget_dropped: int = 0
+    truncated: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+
+    def as_dict(self) -> Dict:
+        stats = asdict(self)
+        stats["tokens_saved"] = self.tokens_in - self.tokens_out
+        stats["tokens_saved_rate"] = (
+            round(stats["tokens_saved"] / self.tokens_in, 4) if self.tokens_in else 0.0
+        )
+        return stats
+
+
+def _chunk_position(doc: Document) -> Tuple[str, Optional[int]]:
+    """(file, chunk number) from the index's ``"<file>:<n>"`` document ids."""
+    name, _, number = (doc.id or "").rpartition(":")
+    if name and number.isdigit():
+        return name, int(number)
+    return doc.metadata.get("source", doc.id or ""), None
+
+
+def join_overlapping(left: str, right: str) -> str:
+    """Concatenate two neighbouring chunks, writing their shared text once."""
+    probe = right[:32]
+    start = left.find(probe, max(0, len(left) - len(right)))
+    while start != -1:
+        if right.startswith(left[start:]):
+            return left + right[len(left) - start:]
+        start = left.find(probe, start + 1)
+    return f"{left} {right}"
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def render(spans: Sequence[ContextSpan]) -> str:
+    """Spans grouped by page, pages in the order of their best span."""
+    pages: Dict[str, List[str]] = {}
+    for span in spans:
+        pages.setdefault(span.header, []).append(span.text)
+    return SPAN_SEPARATOR.join(
+        f"{header}\n{GAP_SEPARATOR.join(texts)}" for header, texts in pages.items()
+    )
+
+
+def _truncate(text: str, token_budget: int) -> str:
+    """Cut ``text`` at a word boundary to fit ``token_budget`` (estimated)."""
+    if estimate_tokens(text) <= token_budget:
+        return text
+    cut = text.encode("utf-8")[: max(0, token_budget - 1) * 3].decode("utf-8", "ignore")
+    return cut.rsplit(" ", 1)[0] + " ..."
+
+
+class ContextPacker:
+    def __init__(self, token_budget: int = 1500, duplicate_threshold: float = 0.8):
+        self.token_budget = token_budget
+        self.duplicate_threshold = duplicate_threshold
+        self.stats = PackingStats()
+
+    def merge(self, docs: Sequence[Document]) -> List[ContextSpan]:
+        """Merge consecutive chunks of the same page into spans."""
+        pages: Dict[Tuple, List[Tuple[Optional[int], Document]]] = {}
+        for doc in docs:
+            name, number = _chunk_position(doc)
+            pages.setdefault((name, doc.metadata.get("page")), []).append((number, doc))
+
+        spans = []
+        for (name, page), chunks in pages.items():
+            chunks.sort(key=lambda chunk: (chunk[0] is None, chunk[0] or 0))
+            current = None
+            for number, doc in chunks:
+                # Hybrid retrieval ranks by the fused score, not cosine alone
+                score = doc.metadata.get("fused_score", doc.metadata.get("score", 0.0))
+                if (
+                    current is not None
+                    and number is not None
+                    and current.chunks
+                    and number - current.chunks[-1] <= 1
+                ):
+                    if number != current.chunks[-1]:
+                        current.text = join_overlapping(current.text, doc.page_content)
+                        current.chunks.append(number)
+                    current.score = max(current.score, score)
+                    continue
+                current = ContextSpan(
+                    source=os.path.basename(doc.metadata.get("source", name)),
+                    page=page,
+                    page_label=doc.metadata.get("page_label"),
+                    text=doc.page_content,
+                    score=score,
+                    chunks=[number] if number is not None else [],
+                )
+                spans.append(current)
+        return spans
+
+    def pack(self, docs: Sequence[Document]) -> str:
+        """The prompt context for ``docs``: merged, deduplicated and budgeted."""
+        spans = sorted(self.merge(docs), key=lambda span: span.score, reverse=True)
+
+        kept, kept_shingles, headers, used = [], [], set(), 0
+        duplicates = over_budget = truncated = 0
+        for span in spans:
+            shingles = _shingles(span.text)
+            if shingles and any(
+                len(shingles & other) / len(shingles) >= self.duplicate_threshold
+                for other in kept_shingles
+            ):
+                duplicates += 1
+                continue
+
+            # A page's header is only paid for once
+            overhead = GAP_SEPARATOR if span.header in headers else span.header + SPAN_SEPARATOR
+            tokens = estimate_tokens(overhead + span.text)
+            if used + tokens > self.token_budget:
+                if kept:
+                    over_budget += 1
+                    continue
+                # Always send something: the best span, cut to the budget
+                span.text = _truncate(span.text, self.token_budget - estimate_tokens(overhead))
+                tokens = estimate_tokens(overhead + span.text)
+                truncated += 1
+            kept.append(span)
+            kept_shingles.append(shingles)
+            headers.add(span.header)
+            used += tokens
+
+        context = render(kept)
+
+        self.stats.contexts += 1
+        self.stats.chunks += len(docs)
+        self.stats.spans += len(kept)
+        self.stats.duplicates_dropped += duplicates
+        self.stats.over_budget_dropped += over_budget
+        self.stats.truncated += truncated
+        self.stats.tokens_in += estimate_tokens(
+            SPAN_SEPARATOR.join(doc.page_content for doc in docs)
+        )
+        self.stats.tokens_out += estimate_tokens(context)
+        return context
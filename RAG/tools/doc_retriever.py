@@ -1,30 +1,35 @@
+import hashlib
+import json
+import os
+import threading
 from pathlib import Path
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.vectorstores import InMemoryVectorStore
-from langchain_openai import OpenAIEmbeddings
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
 from langchain_classic.tools.retriever import create_retriever_tool
+from tools.embedding_pipeline import BatchedEmbeddings, estimate_tokens
+from tools.index_store import IndexStore
+from tools.lexical_index import LexicalIndex
+from tools.pdf_ingest import (
+    create_text_splitter,
+    iter_document_splits,
+    list_pdf_files,
+    load_pdf,
+)
+from tools.vector_index import VectorIndex, VectorIndexRetriever
+
+DEFAULT_INDEX_DIR = "./.index"
 
 
 def load_pdfs_from_folder(pdf_folder_path: str):
     """Load all PDF files from a specified folder."""
-    pdf_path = Path(pdf_folder_path)
-
-    if not pdf_path.exists():
-        raise FileNotFoundError(f"Folder {pdf_folder_path} does not exist")
-
-    pdf_files = list(pdf_path.glob("*.pdf"))
-
-    if not pdf_files:
-        raise ValueError(f"No PDF files found in {pdf_folder_path}")
+    pdf_files = list_pdf_files(pdf_folder_path)
 
     print(f"Found {len(pdf_files)} PDF files")
 
     docs = []
     for pdf_file in pdf_files:
-        print(f"Loading: {pdf_file.name}")
-        loader = PyPDFLoader(str(pdf_file))
-        docs.extend(loader.load())
+        docs.extend(load_pdf(pdf_file))
 
     return docs
 
@@ -37,25 +42,270 @@ def create_document_splits(
     docs_list = load_pdfs_from_folder(folder_path)
 
     # Split documents into chunks
-    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        chunk_size=chunk_size, chunk_overlap=chunk_overlap
-    )
+    text_splitter = create_text_splitter(chunk_size, chunk_overlap)
     doc_splits = text_splitter.split_documents(docs_list)
     return doc_splits
 
 
-def create_retriever(folder_path: str, chunk_size: int = 100, chunk_overlap: int = 50):
-    doc_splits = create_document_splits(folder_path, chunk_size, chunk_overlap)
-    vectorstore = InMemoryVectorStore.from_documents(
-        documents=doc_splits, embedding=OpenAIEmbeddings()
-    )
-    retriever = vectorstore.as_retriever()
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DocumentIndex:
+    """Vector index over a PDF folder that can be refreshed incrementally.
+
+    A manifest next to the embedding store records each file's mtime, size,
+    hash and chunks. ``refresh`` only parses, splits and embeds PDFs that were
+    added or changed since the last run, and drops the chunks of deleted ones.
+
+    With ``retrieval_mode="hybrid"`` a BM25 index over the same chunks is
+    built at refresh time and saved next to the vectors, and queries fuse
+    lexical and vector results.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+
+    def __init__(
+        self,
+        folder_path: str,
+        chunk_size: int = 100,
+        chunk_overlap: int = 50,
+        index_dir: str = DEFAULT_INDEX_DIR,
+        embeddings=None,
+        workers: Optional[int] = None,
+        search_mode: Optional[str] = None,
+        retrieval_mode: Optional[str] = None,
+    ):
+        self.folder_path = folder_path
+        self.workers = workers
+        self.index_dir = Path(index_dir)
+        self.embeddings = embeddings or BatchedEmbeddings()
+        self.embedding_model = getattr(
+            self.embeddings, "model", type(self.embeddings).__name__
+        )
+        self.splitter_params = {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+
+        # Embeddings are cached on disk keyed by chunk content, so a restart
+        # with unchanged PDFs does not make a single embedding call.
+        self.store = IndexStore(
+            index_dir,
+            embedding_model=self.embedding_model,
+            splitter_params=self.splitter_params,
+        )
+        self.search_mode = search_mode or os.getenv("VECTOR_INDEX_MODE", "auto")
+        self.retrieval_mode = retrieval_mode or os.getenv("RETRIEVAL_MODE", "hybrid")
+        if self.retrieval_mode not in ("vector", "hybrid"):
+            raise ValueError(f"Unknown retrieval mode: {self.retrieval_mode}")
+        self.retriever = VectorIndexRetriever(
+            index=VectorIndex(np.empty((0, 0)), []),
+            embeddings=self.embeddings,
+            mode=self.retrieval_mode,
+        )
+        self._files: Dict[str, Dict] = self._load_manifest()
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        manifest_path = self.index_dir / self.MANIFEST_FILE
+        if not manifest_path.exists():
+            return {}
+
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        # A different model or splitter produces different chunks, so none of
+        # the recorded files can be reused.
+        if (
+            manifest.get("embedding_model") != self.embedding_model
+            or manifest.get("splitter_params") != self.splitter_params
+        ):
+            return {}
+        return manifest["files"]
+
+    def _save_manifest(self):
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        manifest_tmp = self.index_dir / (self.MANIFEST_FILE + ".tmp")
+        with open(manifest_tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "embedding_model": self.embedding_model,
+                    "splitter_params": self.splitter_params,
+                    "files": self._files,
+                },
+                f,
+            )
+        os.replace(manifest_tmp, self.index_dir / self.MANIFEST_FILE)
+
+    def _flush_tokens(self) -> int:
+        # One full round of concurrent batches: the pipeline sends it as
+        # parallel requests, and parsing carries on in the pool meanwhile
+        return getattr(self.embeddings, "batch_tokens", 8000) * getattr(
+            self.embeddings, "max_concurrency", 1
+        )
+
+    def _index_splits(
+        self, file_splits: Iterable[Tuple[str, List[Document]]]
+    ) -> Dict[str, List[Dict]]:
+        """Embed new chunks as files finish parsing; returns each file's chunk entries.
 
-    # Create retriever tool
-    retriever_tool = create_retriever_tool(
-        retriever,
-        "retrieve_documents",
-        "Search and return information from the document collection.",
-    )
+        New chunks are pooled across files and sent once they fill a round of
+        batches (and at the end), so embedding overlaps with the parsing of
+        later files and many small files don't each pay for a partly filled
+        batch.
+        """
+        entries, missing, missing_tokens = {}, {}, 0
+        flush_tokens = self._flush_tokens()
 
-    return retriever_tool
+        def flush():
+            print(f"Embedding {len(missing)} new chunks")
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            self.store.add(list(missing.keys()), list(missing.values()), vectors)
+            missing.clear()
+
+        for name, doc_splits in file_splits:
+            keys = [self.store.chunk_key(doc.page_content) for doc in doc_splits]
+            for key, doc in zip(keys, doc_splits):
+                if key not in self.store and key not in missing:
+                    missing[key] = doc.page_content
+                    missing_tokens += estimate_tokens(doc.page_content)
+            entries[name] = [
+                {"key": key, "metadata": doc.metadata}
+                for key, doc in zip(keys, doc_splits)
+            ]
+            if missing_tokens >= flush_tokens:
+                flush()
+                missing_tokens = 0
+
+        if missing:
+            flush()
+        return entries
+
+    def refresh(self) -> Dict[str, List[str]]:
+        """Bring the index in line with the PDF folder.
+
+        Returns the names of the files that were added, changed and removed.
+        Safe to call from a running agent; queries keep being served from the
+        previous snapshot until the new one is swapped in.
+        """
+        with self._lock:
+            files = {}
+            stats = {"added": [], "changed": [], "removed": [], "unchanged": []}
+            to_index = {}
+
+            for pdf_file in list_pdf_files(self.folder_path):
+                stat = pdf_file.stat()
+                entry = self._files.get(pdf_file.name)
+                if (
+                    entry is not None
+                    and entry["mtime"] == stat.st_mtime
+                    and entry["size"] == stat.st_size
+                ):
+                    files[pdf_file.name] = entry
+                    stats["unchanged"].append(pdf_file.name)
+                    continue
+
+                # mtime or size moved; only re-index if the content did too
+                sha256 = _file_sha256(pdf_file)
+                if entry is not None and entry["sha256"] == sha256:
+                    files[pdf_file.name] = dict(
+                        entry, mtime=stat.st_mtime, size=stat.st_size
+                    )
+                    stats["unchanged"].append(pdf_file.name)
+                    continue
+
+                stats["changed" if entry is not None else "added"].append(
+                    pdf_file.name
+                )
+                files[pdf_file.name] = {
+                    "mtime": stat.st_mtime,
+                    "size": stat.st_size,
+                    "sha256": sha256,
+                }
+                to_index[pdf_file] = pdf_file.name
+
+            splits = iter_document_splits(
+                list(to_index),
+                self.splitter_params["chunk_size"],
+                self.splitter_params["chunk_overlap"],
+                workers=self.workers,
+            )
+            file_splits = ((to_index[pdf_file], doc_splits) for pdf_file, doc_splits in splits)
+            for name, chunks in self._index_splits(file_splits).items():
+                files[name]["chunks"] = chunks
+
+            stats["removed"] = sorted(set(self._files) - set(files))
+            self._files = files
+
+            live_keys = {
+                chunk["key"] for entry in files.values() for chunk in entry["chunks"]
+            }
+            self.store.remove(key for key in self.store.keys() if key not in live_keys)
+            self.store.save()
+            self._save_manifest()
+            self._swap_index()
+            self.version = self._compute_version()
+
+            print(
+                f"Index refreshed: {len(stats['added'])} added, "
+                f"{len(stats['changed'])} changed, {len(stats['removed'])} removed, "
+                f"{len(stats['unchanged'])} unchanged"
+            )
+            if isinstance(self.embeddings, BatchedEmbeddings):
+                stats["embedding"] = self.embeddings.stats.as_dict()
+            return stats
+
+    def _compute_version(self) -> str:
+        """Fingerprint of the indexed content; changes whenever any PDF does."""
+        payload = json.dumps(
+            [
+                self.embedding_model,
+                self.splitter_params,
+                sorted((name, entry["sha256"]) for name, entry in self._files.items()),
+            ]
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _swap_index(self):
+        """Rebuild the search index from the manifest and swap it in at once."""
+        keys, documents = [], []
+        for name, entry in self._files.items():
+            for i, chunk in enumerate(entry["chunks"]):
+                keys.append(chunk["key"])
+                documents.append(
+                    Document(
+                        id=f"{name}:{i}",
+                        page_content=self.store.get_text(chunk["key"]),
+                        metadata=chunk["metadata"],
+                    )
+                )
+        lexical = None
+        if self.retrieval_mode == "hybrid":
+            lexical = LexicalIndex.load_or_build(
+                self.index_dir, keys, [doc.page_content for doc in documents]
+            )
+        self.retriever.index = VectorIndex(
+            self.store.get_vectors(keys), documents, mode=self.search_mode, lexical=lexical
+        )
+
+    def as_tool(self):
+        # Create retriever tool. The retrieved documents (with their scores)
+        # ride along as the tool message artifact for the grader.
+        return create_retriever_tool(
+            self.retriever,
+            "retrieve_documents",
+            "Search and return information from the document collection.",
+            response_format="content_and_artifact",
+        )
+
+
+def create_retriever(
+    folder_path: str,
+    chunk_size: int = 100,
+    chunk_overlap: int = 50,
+    index_dir: str = DEFAULT_INDEX_DIR,
+):
+    return DocumentIndex(folder_path, chunk_size, chunk_overlap, index_dir).as_tool()
@@ -0,0 +1,205 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+import openai
+from langchain_core.embeddings import Embeddings
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so layout-only differences embed (and dedupe) alike."""
+    return " ".join(text.split())
+
+
+def estimate_tokens(text: str) -> int:
+    # ~3 bytes per token is a conservative estimate for English text; exact
+    # counts are not needed to stay under a batch budget.
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+def _run_sync(coro):
+    """Run a coroutine to completion from sync code, even inside an event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+@dataclass
+class EmbeddingStats:
+    """Throughput counters for an embedding pipeline."""
+
+    texts: int = 0
+    unique_texts: int = 0
+    batches: int = 0
+    requests: int = 0
+    retries: int = 0
+    tokens: int = 0
+    seconds: float = 0.0
+
+    def as_dict(self) -> Dict:
+        stats = asdict(self)
+        stats["deduplicated"] = self.texts - self.unique_texts
+        stats["texts_per_second"] = (
+            round(self.unique_texts / self.seconds, 1) if self.seconds else 0.0
+        )
+        return stats
+
+
+class BatchedEmbeddings(Embeddings):
+    """OpenAI-compatible embeddings with deduplication and batched, bounded-concurrency requests.
+
+    Chunk texts are whitespace-normalized and deduplicated before anything is
+    sent, then packed into batches of at most ``batch_tokens`` (estimated)
+    tokens. Up to ``max_concurrency`` batches are in flight at once, and rate
+    limits, timeouts and 5xx responses are retried with jittered exponential
+    backoff. Point ``base_url`` (or ``OPENAI_BASE_URL``) at a local server to
+    run against a fake.
+
+    ``stats`` counts document (ingestion) embeddings only; query embeddings
+    are counted separately in ``query_stats``.
+    """
+
+    def __init__(
+        self,
+        model: str = "text-embedding-ada-002",
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        batch_tokens: int = 8000,
+        max_batch_size: int = 512,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+        backoff_seconds: float = 0.5,
+    ):
+        self.model = model
+        self.base_url = base_url
+        self.api_key = api_key
+        self.batch_tokens = batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.stats = EmbeddingStats()
+        self.query_stats = EmbeddingStats()
+        self._client: Optional[openai.AsyncOpenAI] = None
+
+    def _new_client(self) -> openai.AsyncOpenAI:
+        # Retries are handled here, per batch, rather than inside the client
+        return openai.AsyncOpenAI(
+            base_url=self.base_url, api_key=self.api_key, max_retries=0
+        )
+
+    @property
+    def client(self) -> openai.AsyncOpenAI:
+        if self._client is None:
+            self._client = self._new_client()
+        return self._client
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        batches, batch, batch_tokens = [], [], 0
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if batch and (
+                batch_tokens + tokens > self.batch_tokens
+                or len(batch) >= self.max_batch_size
+            ):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def _embed_batch(
+        self,
+        client: openai.AsyncOpenAI,
+        batch: List[str],
+        semaphore: asyncio.Semaphore,
+        stats: EmbeddingStats,
+    ) -> List[List[float]]:
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                stats.requests += 1
+                try:
+                    response = await client.embeddings.create(
+                        model=self.model, input=batch
+                    )
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.max_retries:
+                        raise
+                    stats.retries += 1
+                    await asyncio.sleep(self._backoff(attempt, e))
+                    continue
+
+                stats.batches += 1
+                if response.usage is not None:
+                    stats.tokens += response.usage.prompt_tokens
+                data = sorted(response.data, key=lambda item: item.index)
+                return [item.embedding for item in data]
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Honor Retry-After when the server sends one, else full-jitter backoff."""
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+            if retry_after is not None:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    pass
+        return random.uniform(0, self.backoff_seconds * 2**attempt)
+
+    async def _aembed(
+        self, client: openai.AsyncOpenAI, texts: List[str], stats: EmbeddingStats
+    ) -> List[List[float]]:
+        start = time.perf_counter()
+        normalized = [normalize_text(text) or " " for text in texts]
+        unique = list(dict.fromkeys(normalized))
+
+        batches = self._batches(unique)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(
+            *(self._embed_batch(client, batch, semaphore, stats) for batch in batches)
+        )
+
+        vectors = {}
+        for batch, batch_vectors in zip(batches, results):
+            vectors.update(zip(batch, batch_vectors))
+
+        stats.texts += len(texts)
+        stats.unique_texts += len(unique)
+        stats.seconds += time.perf_counter() - start
+        return [vectors[text] for text in normalized]
+
+    async def _aembed_fresh_client(
+        self, texts: List[str], stats: EmbeddingStats
+    ) -> List[List[float]]:
+        # Async HTTP clients are bound to the loop they were first used on, so
+        # sync calls (each on their own short-lived loop) get their own client.
+        async with self._new_client() as client:
+            return await self._aembed(client, texts, stats)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._aembed(self.client, texts, self.stats)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self._aembed(self.client, [text], self.query_stats))[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return _run_sync(self._aembed_fresh_client(texts, self.stats))
+
+    def embed_query(self, text: str) -> List[float]:
+        return _run_sync(self._aembed_fresh_client([text], self.query_stats))[0]
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+
+class IndexStore:
+    """On-disk, content-addressed store of chunk embeddings.
+
+    Every vector is keyed by a hash of (chunk text, embedding model, splitter
+    params), so a chunk is only ever embedded once per configuration. Vectors
+    live in a single ``.npy`` array that is memory-mapped on load, and a JSON
+    sidecar maps each key to its row.
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    METADATA_FILE = "metadata.json"
+
+    def __init__(self, index_dir: str, embedding_model: str, splitter_params: Dict):
+        self.index_dir = Path(index_dir)
+        self.embedding_model = embedding_model
+        self.splitter_params = dict(splitter_params)
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._texts: Dict[str, str] = {}
+        self._vectors = None
+        self.load()
+
+    def chunk_key(self, text: str) -> str:
+        """Return the content address of a chunk under this store's configuration."""
+        payload = json.dumps(
+            [text, self.embedding_model, self.splitter_params], sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def load(self):
+        """Load the sidecar and memory-map the vectors, if an index exists."""
+        metadata_path = self.index_dir / self.METADATA_FILE
+        vectors_path = self.index_dir / self.VECTORS_FILE
+        if not metadata_path.exists() or not vectors_path.exists():
+            return
+
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+
+        # Vectors from another embedding model have a different dimension and
+        # can never be hit, so start a fresh index instead of mixing them.
+        if metadata.get("embedding_model") != self.embedding_model:
+            return
+
+        self._keys = metadata["keys"]
+        self._texts = metadata.get("texts", {})
+        self._rows = {key: row for row, key in enumerate(self._keys)}
+        self._vectors = np.load(vectors_path, mmap_mode="r")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def keys(self) -> List[str]:
+        return list(self._keys)
+
+    def get_vector(self, key: str) -> np.ndarray:
+        return self._vectors[self._rows[key]]
+
+    def get_vectors(self, keys: Sequence[str]) -> np.ndarray:
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._vectors[[self._rows[key] for key in keys]]
+
+    def get_text(self, key: str) -> str:
+        return self._texts[key]
+
+    def add(self, keys: Sequence[str], texts: Sequence[str], vectors: Iterable):
+        """Append new vectors. Keys that are already stored are ignored."""
+        new_keys, new_texts, new_vectors = [], [], []
+        for key, text, vector in zip(keys, texts, vectors):
+            if key in self._rows:
+                continue
+            self._rows[key] = len(self._keys) + len(new_keys)
+            new_keys.append(key)
+            new_texts.append(text)
+            new_vectors.append(vector)
+
+        if not new_keys:
+            return
+
+        added = np.asarray(new_vectors, dtype=np.float32)
+        if self._vectors is None:
+            self._vectors = added
+        else:
+            self._vectors = np.concatenate([np.asarray(self._vectors), added])
+        self._keys.extend(new_keys)
+        self._texts.update(zip(new_keys, new_texts))
+
+    def remove(self, keys: Iterable[str]):
+        """Drop the vectors for ``keys``; unknown keys are ignored."""
+        dropped = {key for key in keys if key in self._rows}
+        if not dropped:
+            return
+
+        kept_rows = [row for row, key in enumerate(self._keys) if key not in dropped]
+        self._vectors = np.asarray(self._vectors)[kept_rows]
+        self._keys = [key for key in self._keys if key not in dropped]
+        self._rows = {key: row for row, key in enumerate(self._keys)}
+        for key in dropped:
+            self._texts.pop(key, None)
+
+    def save(self):
+        """Atomically write the vectors and sidecar to ``index_dir``."""
+        if self._vectors is None:
+            return
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+
+        vectors_tmp = self.index_dir / (self.VECTORS_FILE + ".tmp")
+        with open(vectors_tmp, "wb") as f:
+            np.save(f, np.asarray(self._vectors, dtype=np.float32))
+
+        metadata_tmp = self.index_dir / (self.METADATA_FILE + ".tmp")
+        with open(metadata_tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "embedding_model": self.embedding_model,
+                    "dim": int(self._vectors.shape[1]),
+                    "keys": self._keys,
+                    "texts": self._texts,
+                },
+                f,
+            )
+
+        os.replace(vectors_tmp, self.index_dir / self.VECTORS_FILE)
+        os.replace(metadata_tmp, self.index_dir / self.METADATA_FILE)
@@ -0,0 +1,159 @@
+import hashlib
+import os
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.text import tokenize
+
+
+def fingerprint(keys: Sequence[str]) -> str:
+    """Identifies the ordered set of chunks an index was built over."""
+    return hashlib.sha256("\n".join(keys).encode("utf-8")).hexdigest()
+
+
+class LexicalIndex:
+    """BM25 inverted index over the same chunks as the ``VectorIndex``.
+
+    Postings are stored as flat arrays: the terms sorted once, with each
+    term's rows in one contiguous slice. Every posting already holds its
+    length-normalized BM25 term-frequency weight and every term its IDF, so
+    a query is a binary search per term and a scatter-add of
+    ``idf * weight`` into a score per row. Rows line up with the documents
+    of the ``VectorIndex`` built from the same chunks.
+    """
+
+    FILE = "lexical.npz"
+
+    def __init__(
+        self,
+        terms: np.ndarray,
+        idf: np.ndarray,
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        weights: np.ndarray,
+        size: int,
+        fingerprint: str = "",
+    ):
+        self.terms = terms
+        self.idf = idf
+        self.offsets = offsets
+        self.rows = rows
+        self.weights = weights
+        self.size = size
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(
+        cls, texts: Sequence[str], k1: float = 1.2, b: float = 0.75, fingerprint: str = ""
+    ) -> "LexicalIndex":
+        counts = [Counter(tokenize(text)) for text in texts]
+        lengths = np.array([sum(c.values()) for c in counts], dtype=np.float32)
+        average = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+
+        postings = {}
+        for row, terms in enumerate(counts):
+            norm = k1 * (1 - b + b * lengths[row] / average)
+            for term, tf in terms.items():
+                postings.setdefault(term, []).append((row, tf * (k1 + 1) / (tf + norm)))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        flat = [posting for term in terms for posting in postings[term]]
+        df = np.diff(offsets).astype(np.float32)
+        return cls(
+            terms=np.array(terms, dtype=str),
+            idf=np.log1p((len(texts) - df + 0.5) / (df + 0.5)).astype(np.float32),
+            offsets=offsets,
+            rows=np.array([row for row, _ in flat], dtype=np.int32),
+            weights=np.array([weight for _, weight in flat], dtype=np.float32),
+            size=len(texts),
+            fingerprint=fingerprint,
+        )
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _term_id(self, term: str) -> Optional[int]:
+        i = int(np.searchsorted(self.terms, term))
+        if i < len(self.terms) and self.terms[i] == term:
+            return i
+        return None
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[int, float]]:
+        """Return ``(row, BM25 score)`` for the ``k`` best matching documents."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            i = self._term_id(term)
+            if i is None:
+                continue
+            start, end = self.offsets[i], self.offsets[i + 1]
+            scores[self.rows[start:end]] += self.idf[i] * self.weights[start:end]
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        best = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(row), float(scores[row])) for row in best]
+
+    def save(self, index_dir: str):
+        """Atomically write the index next to the vectors."""
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        tmp = index_dir / (self.FILE + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(
+                f,
+                terms=self.terms,
+                idf=self.idf,
+                offsets=self.offsets,
+                rows=self.rows,
+                weights=self.weights,
+                size=np.array(self.size),
+                fingerprint=np.array(self.fingerprint),
+            )
+        os.replace(tmp, index_dir / self.FILE)
+
+    @classmethod
+    def load(cls, index_dir: str, expected_fingerprint: str) -> Optional["LexicalIndex"]:
+        """The saved index, or ``None`` if it was built over other chunks."""
+        path = Path(index_dir) / cls.FILE
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            if str(data["fingerprint"]) != expected_fingerprint:
+                return None
+            return cls(
+                terms=data["terms"],
+                idf=data["idf"],
+                offsets=data["offsets"],
+                rows=data["rows"],
+                weights=data["weights"],
+                size=int(data["size"]),
+                fingerprint=expected_fingerprint,
+            )
+
+    @classmethod
+    def load_or_build(
+        cls, index_dir: str, keys: Sequence[str], texts: Sequence[str]
+    ) -> "LexicalIndex":
+        """Reuse the saved index when the chunks are unchanged, else rebuild it."""
+        expected = fingerprint(keys)
+        index = cls.load(index_dir, expected)
+        if index is None:
+            index = cls.build(texts, fingerprint=expected)
+            if len(index):
+                index.save(index_dir)
+        return index
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse ranked row lists: each row scores ``sum(1 / (k + rank))``, best first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
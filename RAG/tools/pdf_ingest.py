@@ -0,0 +1,150 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+# This module is imported by every ingestion worker process, so it only
+# depends on the PDF parser and the text splitter.
+
+# Files longer than this are parsed in page ranges of this size
+PAGES_PER_TASK = 16
+# Below this many parse tasks, process start-up costs more than it saves
+PARALLEL_MIN_TASKS = 16
+
+
+def list_pdf_files(pdf_folder_path: str) -> List[Path]:
+    """List the PDF files in a folder, in a stable order."""
+    pdf_path = Path(pdf_folder_path)
+
+    if not pdf_path.exists():
+        raise FileNotFoundError(f"Folder {pdf_folder_path} does not exist")
+
+    pdf_files = sorted(pdf_path.glob("*.pdf"))
+
+    if not pdf_files:
+        raise ValueError(f"No PDF files found in {pdf_folder_path}")
+
+    return pdf_files
+
+
+def load_pdf(pdf_file: Path) -> List[Document]:
+    """Load a single PDF file, one document per page."""
+    print(f"Loading: {pdf_file.name}")
+    loader = PyPDFLoader(str(pdf_file))
+    return loader.load()
+
+
+def create_text_splitter(chunk_size: int = 100, chunk_overlap: int = 50):
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+
+
+def load_pdf_pages(pdf_file: Path, start: int, stop: int) -> List[Document]:
+    """Load pages ``[start, stop)`` of a PDF, one document per page.
+
+    Only the requested pages are extracted, so a large file can be parsed by
+    several workers at once. Metadata carries the source, page, page label and
+    page count, but not the document-info fields ``PyPDFLoader`` adds.
+    """
+    reader = PdfReader(str(pdf_file))
+    total_pages = len(reader.pages)
+    docs = []
+    for page in range(start, min(stop, total_pages)):
+        docs.append(
+            Document(
+                page_content=reader.pages[page].extract_text(),
+                metadata={
+                    "source": str(pdf_file),
+                    "total_pages": total_pages,
+                    "page": page,
+                    "page_label": reader.page_labels[page],
+                },
+            )
+        )
+    return docs
+
+
+_WORKER_SPLITTERS = {}
+
+
+def _load_and_split(
+    pdf_file: Path, pages: Optional[Tuple[int, int]], chunk_size: int, chunk_overlap: int
+) -> List[Document]:
+    """Parse-and-split task run in the ingestion worker processes."""
+    splitter = _WORKER_SPLITTERS.get((chunk_size, chunk_overlap))
+    if splitter is None:
+        splitter = create_text_splitter(chunk_size, chunk_overlap)
+        _WORKER_SPLITTERS[(chunk_size, chunk_overlap)] = splitter
+
+    if pages is None:
+        docs = load_pdf(pdf_file)
+    else:
+        docs = load_pdf_pages(pdf_file, *pages)
+    return splitter.split_documents(docs)
+
+
+def _plan_tasks(pdf_files: Sequence[Path]) -> List[Tuple[Path, Optional[Tuple[int, int]]]]:
+    """Break files into parse tasks, splitting long files into page ranges."""
+    tasks = []
+    for pdf_file in pdf_files:
+        total_pages = len(PdfReader(str(pdf_file)).pages)
+        if total_pages <= PAGES_PER_TASK:
+            tasks.append((pdf_file, None))
+            continue
+        for start in range(0, total_pages, PAGES_PER_TASK):
+            tasks.append((pdf_file, (start, start + PAGES_PER_TASK)))
+    return tasks
+
+
+def iter_document_splits(
+    pdf_files: Sequence[Path],
+    chunk_size: int = 100,
+    chunk_overlap: int = 50,
+    workers: Optional[int] = None,
+) -> Iterator[Tuple[Path, List[Document]]]:
+    """Yield ``(pdf_file, splits)`` for each file, in the order given.
+
+    With more than one worker, files (and page ranges of long files) are
+    parsed and split in a process pool. Results are streamed back in input
+    order as soon as each file is complete, so the caller can embed early
+    files while later ones are still being parsed.
+    """
+    if workers is None:
+        workers = int(os.getenv("INGEST_WORKERS", os.cpu_count() or 1))
+
+    tasks = _plan_tasks(pdf_files) if workers > 1 else []
+    if workers <= 1 or len(tasks) < PARALLEL_MIN_TASKS:
+        splitter = create_text_splitter(chunk_size, chunk_overlap)
+        for pdf_file in pdf_files:
+            yield pdf_file, splitter.split_documents(load_pdf(pdf_file))
+        return
+
+    print(f"Parsing {len(tasks)} tasks with {workers} workers")
+    # spawn rather than fork: re-indexing can run in a thread of a live server
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        results = executor.map(
+            _load_and_split,
+            [pdf_file for pdf_file, _ in tasks],
+            [pages for _, pages in tasks],
+            [chunk_size] * len(tasks),
+            [chunk_overlap] * len(tasks),
+        )
+
+        # map() yields in submission order; regroup page ranges per file
+        current, splits = None, []
+        for (pdf_file, _), task_splits in zip(tasks, results):
+            if current is not None and pdf_file != current:
+                yield current, splits
+                splits = []
+            current = pdf_file
+            splits.extend(task_splits)
+        if current is not None:
+            yield current, splits
@@ -0,0 +1,191 @@
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from tools.lexical_index import LexicalIndex, reciprocal_rank_fusion
+
+# "auto" switches to the approximate IVF search once the corpus is this large
+IVF_MIN_VECTORS = 50_000
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest scores, best first."""
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class VectorIndex:
+    """Cosine-similarity top-k search over a contiguous float32 matrix.
+
+    Embeddings are normalized once at build time so that a query is a single
+    matrix-vector product followed by ``argpartition``. In ``"ivf"`` mode the
+    rows are additionally clustered with spherical k-means, and a query only
+    scores the rows of the ``nprobe`` closest clusters.
+
+    ``lexical`` optionally carries a BM25 index over the same documents, so
+    the two are always swapped in together.
+    """
+
+    def __init__(
+        self,
+        vectors,
+        documents: Sequence[Document],
+        mode: str = "exact",
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        lexical: Optional[LexicalIndex] = None,
+    ):
+        self.documents = list(documents)
+        self.lexical = lexical
+        self.matrix = np.ascontiguousarray(
+            _normalize(np.asarray(vectors, dtype=np.float32))
+        )
+        if len(self.matrix) != len(self.documents):
+            raise ValueError("vectors and documents must have the same length")
+
+        if mode == "auto":
+            mode = "ivf" if len(self.documents) >= IVF_MIN_VECTORS else "exact"
+        if mode not in ("exact", "ivf"):
+            raise ValueError(f"Unknown vector index mode: {mode}")
+        self.mode = mode
+        self.nprobe = nprobe
+
+        if mode == "ivf":
+            self._build_ivf(nlist or max(1, int(np.sqrt(len(self.matrix)))))
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _assign(self, centroids: np.ndarray, block: int = 65536) -> np.ndarray:
+        assignments = np.empty(len(self.matrix), dtype=np.int64)
+        for start in range(0, len(self.matrix), block):
+            scores = self.matrix[start : start + block] @ centroids.T
+            assignments[start : start + block] = scores.argmax(axis=1)
+        return assignments
+
+    def _build_ivf(self, nlist: int, iterations: int = 10):
+        nlist = min(nlist, len(self.matrix))
+        rng = np.random.default_rng(0)
+        centroids = self.matrix[rng.choice(len(self.matrix), nlist, replace=False)]
+
+        for _ in range(iterations):
+            assignments = self._assign(centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, self.matrix)
+            # keep the previous centroid for clusters that ended up empty
+            empty = np.bincount(assignments, minlength=nlist) == 0
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+
+        assignments = self._assign(centroids)
+        self.centroids = centroids
+        # rows sorted by cluster, so every inverted list is one contiguous slice
+        self.list_rows = np.argsort(assignments, kind="stable")
+        self.list_offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(assignments, minlength=nlist))]
+        )
+
+    def search(self, query_vector, k: int = 4) -> List[Tuple[int, float]]:
+        """Return ``(row, cosine similarity)`` for the ``k`` nearest documents."""
+        if not self.documents:
+            return []
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+
+        if self.mode == "exact":
+            scores = self.matrix @ query
+            rows = _top_k(scores, k)
+            return [(int(row), float(scores[row])) for row in rows]
+
+        probes = _top_k(self.centroids @ query, self.nprobe)
+        candidates = np.concatenate(
+            [
+                self.list_rows[self.list_offsets[p] : self.list_offsets[p + 1]]
+                for p in probes
+            ]
+        )
+        scores = self.matrix[candidates] @ query
+        best = _top_k(scores, k)
+        return [(int(candidates[i]), float(scores[i])) for i in best]
+
+    def similarity(self, query_vector, rows: Sequence[int]) -> np.ndarray:
+        """Cosine similarity of the query to each of ``rows``."""
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+        return self.matrix[list(rows)] @ query
+
+
+class VectorIndexRetriever(BaseRetriever):
+    """LangChain retriever backed by a ``VectorIndex``.
+
+    Returned documents carry their cosine similarity in ``metadata["score"]``.
+    ``index`` can be reassigned to serve a freshly built index.
+
+    In ``"hybrid"`` mode (when the index has a lexical index) the top
+    ``fetch_k`` vector and BM25 results are fused with reciprocal rank
+    fusion, so a chunk that matches an exact identifier such as "WFC3" is
+    found even when its embedding is not among the nearest. Documents are
+    returned in fused order with the fused score in
+    ``metadata["fused_score"]``; ``score`` stays the cosine similarity.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: VectorIndex
+    embeddings: Embeddings
+    k: int = 4
+    mode: str = "vector"
+    fetch_k: int = 20
+    rrf_k: int = 60
+
+    def _to_documents(self, query: str, query_vector) -> List[Document]:
+        index = self.index
+        if self.mode == "hybrid" and index.lexical is not None and index.documents:
+            fetch_k = max(self.k, self.fetch_k)
+            vector_rows = [row for row, _ in index.search(query_vector, fetch_k)]
+            lexical_rows = [row for row, _ in index.lexical.search(query, fetch_k)]
+            fused = reciprocal_rank_fusion([vector_rows, lexical_rows], self.rrf_k)[: self.k]
+            rows = [row for row, _ in fused]
+            hits = zip(rows, index.similarity(query_vector, rows).tolist())
+            extra = [{"fused_score": round(score, 6)} for _, score in fused]
+        else:
+            hits = index.search(query_vector, self.k)
+            extra = None
+
+        docs = []
+        for i, (row, score) in enumerate(hits):
+            doc = index.documents[row]
+            docs.append(
+                Document(
+                    id=doc.id,
+                    page_content=doc.page_content,
+                    metadata={**doc.metadata, "score": score, **(extra[i] if extra else {})},
+                )
+            )
+        return docs
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self._to_documents(query, self.embeddings.embed_query(query))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self._to_documents(query, await self.embeddings.aembed_query(query))
+
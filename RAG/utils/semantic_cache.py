@@ -0,0 +1,109 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """Answer cache keyed on the question embedding.
+
+    A lookup hits when a cached question's embedding has a cosine similarity of
+    at least ``threshold`` with the new one, so paraphrases of a question that
+    was already answered are served without running the graph. Entries expire
+    after ``ttl_seconds``, the least recently used entry is evicted beyond
+    ``max_entries``, and everything is dropped when ``version`` (the document
+    index version) changes.
+    """
+
+    def __init__(
+        self, threshold: float = 0.95, max_entries: int = 1024, ttl_seconds: float = 3600
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version: Optional[str] = None
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._next_id = 0
+        self._matrix = None
+        self._ids = []
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def _check_version(self, version: str):
+        if version != self.version:
+            if self._entries:
+                self._counters["invalidations"] += 1
+            self._entries.clear()
+            self._matrix = None
+            self.version = version
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [
+            entry_id
+            for entry_id, entry in self._entries.items()
+            if now - entry["created"] > self.ttl_seconds
+        ]
+        for entry_id in expired:
+            del self._entries[entry_id]
+        if expired:
+            self._counters["expirations"] += len(expired)
+            self._matrix = None
+
+    def get(self, vector, version: str) -> Optional[Any]:
+        """Return the cached answer for the closest question, if close enough."""
+        self._check_version(version)
+        self._expire()
+
+        if self._entries:
+            if self._matrix is None:
+                self._ids = list(self._entries)
+                self._matrix = np.stack([self._entries[i]["vector"] for i in self._ids])
+            query = np.array(vector, dtype=np.float32)
+            query /= np.linalg.norm(query) or 1.0
+            scores = self._matrix @ query
+            best = int(scores.argmax())
+            if scores[best] >= self.threshold:
+                entry_id = self._ids[best]
+                self._entries.move_to_end(entry_id)
+                self._counters["hits"] += 1
+                return self._entries[entry_id]["value"]
+
+        self._counters["misses"] += 1
+        return None
+
+    def put(self, vector, value: Any, version: str):
+        """Cache an answer computed against index ``version``.
+
+        Answers computed against an index that changed in the meantime are
+        dropped rather than stored.
+        """
+        if version != self.version:
+            return
+
+        vector = np.array(vector, dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        self._entries[self._next_id] = {
+            "vector": vector,
+            "value": value,
+            "created": time.monotonic(),
+        }
+        self._next_id += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+        self._matrix = None
+
+    def stats(self) -> Dict:
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "size": len(self._entries),
+            "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,24 @@
+"""
+Keyword tokenizer shared by the BM25 index and the relevance grader.
+
+Both decide relevance from the same terms, so a question's keywords in the
+grader are exactly what the lexical index matched them on.
+"""
+
+import re
+from typing import List
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can did do does for from has have how i in is "
+    "it its me of on or s that the their there these this to was what when "
+    "where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric terms, so "WFC3", "STIS" and "4" stay whole."""
+    return [
+        token
+        for token in re.findall(r"[a-z0-9]+", text.lower())
+        if token not in STOPWORDS
+    ]
@@ -0,0 +1,45 @@
+"""
+Process-wide registry of compiled LangGraph graphs.
+
+Building and compiling a graph is pure per-call overhead when done inside an
+entrypoint, so each graph is built once, on first use, and the compiled
+instance is reused by every request. Anything that varies per request (model,
+flags, ...) should be passed in the graph input or in ``config["configurable"]``
+instead of being baked into the graph.
+"""
+
+import asyncio
+import inspect
+from typing import Any, Awaitable, Callable, Dict, Union
+
+GraphBuilder = Callable[[], Union[Any, Awaitable[Any]]]
+
+
+class GraphRegistry:
+    def __init__(self):
+        self._builders: Dict[str, GraphBuilder] = {}
+        self._graphs: Dict[str, Any] = {}
+        self._lock = asyncio.Lock()
+
+    def register(self, name: str, builder: GraphBuilder):
+        """Register a (sync or async) function that builds and compiles a graph."""
+        self._builders[name] = builder
+        self._graphs.pop(name, None)
+
+    async def get(self, name: str):
+        """Return the compiled graph, building it on first use."""
+        graph = self._graphs.get(name)
+        if graph is not None:
+            return graph
+
+        # Concurrent first requests must not each build the graph
+        async with self._lock:
+            if name not in self._graphs:
+                graph = self._builders[name]()
+                if inspect.isawaitable(graph):
+                    graph = await graph
+                self._graphs[name] = graph
+        return self._graphs[name]
+
+
+registry = GraphRegistry()
@@ -0,0 +1,92 @@
+"""
+Single-flight deduplication and LRU/TTL memoization for inference calls.
+
+Concurrent requests for the same (model, prompt, params) share one upstream
+call, and completed results are kept in a bounded cache for ``ttl_seconds``.
+Only deterministic (temperature 0) calls should be shared; callers that
+sample bypass both.
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+def make_key(model: str, prompt: str, **params) -> Hashable:
+    return (model, prompt, json.dumps(params, sort_keys=True, default=str))
+
+
+class InferenceCache:
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._results: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "bypassed": 0,
+            "evictions": 0,
+        }
+
+    def _get(self, key: Hashable):
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        created, value = entry
+        if time.monotonic() - created > self.ttl_seconds:
+            del self._results[key]
+            return None
+        self._results.move_to_end(key)
+        return entry
+
+    def _put(self, key: Hashable, value: Any):
+        self._results[key] = (time.monotonic(), value)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    async def run(
+        self, key: Hashable, call: Callable[[], Awaitable[Any]], cacheable: bool = True
+    ) -> Any:
+        """Return ``call()``'s result, shared with identical concurrent calls."""
+        if not cacheable:
+            self._counters["bypassed"] += 1
+            return await call()
+
+        entry = self._get(key)
+        if entry is not None:
+            self._counters["hits"] += 1
+            return entry[1]
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._counters["coalesced"] += 1
+        else:
+            self._counters["misses"] += 1
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+
+            def _done(task: asyncio.Task, key=key):
+                self._in_flight.pop(key, None)
+                if not task.cancelled() and task.exception() is None:
+                    self._put(key, task.result())
+
+            task.add_done_callback(_done)
+
+        # Shielded, so one cancelled caller does not cancel the shared call
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict:
+        served = self._counters["hits"] + self._counters["coalesced"]
+        lookups = served + self._counters["misses"]
+        return {
+            **self._counters,
+            "size": len(self._results),
+            "in_flight": len(self._in_flight),
+            "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+        }
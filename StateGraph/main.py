@@ -1,11 +1,21 @@
+import asyncio
+import json
 import os
 from enum import Enum
 from typing import NotRequired, Optional, TypedDict
 
+import httpx
 from gradient import AsyncGradient
 from gradient_adk import entrypoint
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, START, StateGraph
 
+from graph_registry import registry
+from inference_cache import InferenceCache, make_key
+from scheduler import ScheduledAsyncTransport, priority, scheduler
+from trace_callbacks import tracing_handler
+from tracing import tracer
+
 
 class State(TypedDict):
     topic: str
@@ -28,31 +38,96 @@ class SpicyStatus(str, Enum):
 
 DEFAULT_MODEL = "openai-gpt-oss-120b"
 
+# Batch requests: default number of jokes in flight, and the largest batch
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "4"))
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "100"))
+
 
+# Calls are rate limited, queued and retried by the shared scheduler
 inference_client = AsyncGradient(
     model_access_key=os.environ.get("GRADIENT_MODEL_ACCESS_KEY"),
+    max_retries=0,
+    http_client=httpx.AsyncClient(
+        transport=ScheduledAsyncTransport(httpx.AsyncHTTPTransport()),
+    ),
 )
 
 
-async def run_inference(prompt: str, model: str = DEFAULT_MODEL) -> str:
-    inference_response = await inference_client.chat.completions.create(
-        messages=[
-            {
-                "role": "user",
-                "content": prompt,
-            }
-        ],
-        model=model,
-    )
-    return inference_response.choices[0].message.content
+# Identical in-flight calls are merged and completed results reused
+inference_cache = InferenceCache(
+    max_entries=int(os.environ.get("INFERENCE_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.environ.get("INFERENCE_CACHE_TTL_SECONDS", "600")),
+)
+
+
+async def run_inference(
+    prompt: str,
+    model: str = DEFAULT_MODEL,
+    temperature: Optional[float] = None,
+    cache: bool = True,
+) -> str:
+    """Run a chat completion, shared with identical concurrent and recent calls.
+
+    Only deterministic calls (an explicit ``temperature=0``) are shared, since
+    reusing a sampled completion would hand every caller the same sample. Pass
+    ``cache=False`` to always call the model anyway. The call is traced as an ``llm`` span, marked as a cache hit when it was
+    answered without calling the model.
+    """
+    params = {}
+    if temperature is not None:
+        params["temperature"] = temperature
+
+    async def call():
+        span.set(cache="miss")
+        inference_response = await inference_client.chat.completions.create(
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+            model=model,
+            **params,
+        )
+        usage = inference_response.usage
+        if usage is not None:
+            span.set(
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.completion_tokens,
+            )
+        return inference_response.choices[0].message.content
+
+    cacheable = cache and temperature == 0
+    node = getattr(tracer.current(), "name", None)
+    with tracer.span(model, "llm", node=node, cache="hit") as span:
+        return await inference_cache.run(
+            make_key(model, prompt, **params), call, cacheable=cacheable
+        )
+
+
+def get_model(config: RunnableConfig) -> str:
+    """Model for this request, from ``config["configurable"]["model"]``."""
+    return config.get("configurable", {}).get("model") or DEFAULT_MODEL
+
+
+def get_temperature(config: RunnableConfig) -> Optional[float]:
+    """Sampling temperature for this request.
+
+    Requests that opt into the inference cache run at temperature 0, so the
+    results they share are the ones the model would have returned anyway;
+    the rest keep the model's default sampling.
+    """
+    return 0 if config.get("configurable", {}).get("cache", False) else None
 
 
 # N O D E S
-async def generate_joke(state: State):
+async def generate_joke(state: State, config: RunnableConfig):
     """First LLM call to generate initial joke"""
 
     joke = await run_inference(
-        f"Write a short joke about {state['topic']} in two sentences or less"
+        f"Write a short joke about {state['topic']} in two sentences or less",
+        model=get_model(config),
+        temperature=get_temperature(config),
     )
     return {"joke": joke}
 
@@ -64,20 +139,24 @@ def add_spicy_note(state: State):
     return {"spicy_instruction": instruction}
 
 
-async def improve_joke(state: State):
+async def improve_joke(state: State, config: RunnableConfig):
     """Second LLM call to improve the joke"""
 
     improved_joke = await run_inference(
-        f"Make the joke funnier and quirky: {state['joke']}"
+        f"Make the joke funnier and quirky: {state['joke']}",
+        model=get_model(config),
+        temperature=get_temperature(config),
     )
     return {"improved_joke": improved_joke}
 
 
-async def polish_joke(state: State):
+async def polish_joke(state: State, config: RunnableConfig):
     """Third LLM call for final polish"""
 
     final_joke = await run_inference(
-        f"Remove any explanation of the joke or punchline: {state['improved_joke']}"
+        f"Remove any explanation of the joke or punchline: {state['improved_joke']}",
+        model=get_model(config),
+        temperature=get_temperature(config),
     )
     return {"final_joke": final_joke}
 
@@ -105,8 +184,7 @@ def route_to_spice_check(state: State):
     return {}
 
 
-@entrypoint
-async def main(input):
+def build_graph():
     # Setup the graph
     workflow = StateGraph(State)
 
@@ -136,15 +214,105 @@ async def main(input):
     workflow.add_edge("improve_joke", "polish_joke")
     workflow.add_edge("polish_joke", END)
 
-    # Compile and run
-    app = workflow.compile()
+    # Compile once; per-request settings come in through the state and config.
+    # Every run is traced node by node (see tracing.py)
+    return workflow.compile().with_config(callbacks=[tracing_handler])
+
+
+registry.register("joke", build_graph)
+
 
-    topic = input.get("topic", "write the best joke ever")
-    spicy_override = input.get("spicy")
+async def tell_joke(app, request: dict) -> str:
+    """Run one joke request (``topic``, ``spicy``, ``model``, ``cache``)."""
+    topic = request.get("topic", "write the best joke ever")
+    spicy_override = request.get("spicy")
 
     initial_state = {"topic": topic}
     if spicy_override is not None:
         initial_state["spicy_override"] = spicy_override
 
-    result = await app.ainvoke(initial_state)
+    config = {
+        "configurable": {
+            "model": request.get("model", DEFAULT_MODEL),
+            "cache": request.get("cache", False),
+        }
+    }
+    result = await app.ainvoke(initial_state, config=config)
     return result.get("final_joke", "")
+
+
+async def tell_jokes(app, requests: list, concurrency: int):
+    """Run a batch of joke requests with at most ``concurrency`` in flight.
+
+    Yields ``(index, joke, error)`` in completion order. A failing item only
+    reports its own error; the rest of the batch carries on. Batch items queue
+    behind single requests for the upstream model.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_item(index: int, request: dict):
+        async with semaphore:
+            try:
+                with priority(1):
+                    return index, await tell_joke(app, request), None
+            except Exception as e:
+                return index, None, f"{type(e).__name__}: {e}"
+
+    tasks = [
+        asyncio.create_task(run_item(index, request))
+        for index, request in enumerate(requests)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The client went away mid-stream; don't keep spending on the rest
+        for task in tasks:
+            task.cancel()
+
+
+def sse(event: dict) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+
+@entrypoint
+async def main(input):
+    """Entrypoint
+
+    A ``"batch"`` list of joke requests is run concurrently and each result is
+    streamed back as a server-sent event with its index, in completion order.
+    A single request returns the joke as a JSON string, as before.
+    """
+    if input.get("action") == "stats":
+        yield {
+            "inference_cache": inference_cache.stats(),
+            "upstream": scheduler.stats(),
+            "tracing": tracer.summary(),
+        }
+        return
+
+    if scheduler.overloaded():
+        # Backpressure: the upstream queue is full, so don't start more work
+        yield {"error": "upstream overloaded, retry later"}
+        return
+
+    app = await registry.get("joke")
+
+    batch = input.get("batch")
+    if batch is None:
+        yield json.dumps(await tell_joke(app, input))
+        return
+
+    if len(batch) > MAX_BATCH_SIZE:
+        yield sse({"type": "error", "error": f"batch exceeds {MAX_BATCH_SIZE} items"})
+        return
+
+    concurrency = max(1, int(input.get("concurrency", BATCH_CONCURRENCY)))
+    failed = 0
+    async for index, joke, error in tell_jokes(app, batch, concurrency):
+        if error is None:
+            yield sse({"type": "result", "index": index, "result": joke})
+        else:
+            failed += 1
+            yield sse({"type": "result", "index": index, "error": error})
+    yield sse({"type": "done", "completed": len(batch) - failed, "failed": failed})
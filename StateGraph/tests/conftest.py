@@ -0,0 +1,50 @@
+import asyncio
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(TEMPLATE_DIR))
+sys.path.insert(0, str(TEMPLATE_DIR.parent / "benchmarks"))
+
+from fake_openai_server import server_stats, start_server  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def fake_server():
+    """Base URL of a local OpenAI-compatible fake (see benchmarks/)."""
+    with start_server(latency_ms=0) as base_url:
+        yield base_url
+
+
+@pytest.fixture(scope="session")
+def joke_main(fake_server):
+    """The template's ``main`` module, pointed at the fake server."""
+    os.environ.update(
+        {
+            "GRADIENT_INFERENCE_ENDPOINT": fake_server.rsplit("/v1", 1)[0],
+            "GRADIENT_MODEL_ACCESS_KEY": "fake",
+        }
+    )
+    return importlib.import_module("main")
+
+
+@pytest.fixture(scope="session")
+def run():
+    """Run a coroutine to completion.
+
+    All runs share one event loop: the template's async client is bound to
+    the loop it was first used on.
+    """
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture
+def upstream_calls(fake_server):
+    """Chat completions the fake server has answered so far."""
+    return lambda: server_stats(fake_server).get("chat_completions", 0)
@@ -0,0 +1,45 @@
+import uuid
+
+
+def test_sampled_calls_are_not_shared(joke_main, run, upstream_calls):
+    prompt = f"Write a joke about {uuid.uuid4()}"
+    before = upstream_calls()
+    run(joke_main.run_inference(prompt))
+    run(joke_main.run_inference(prompt))
+    assert upstream_calls() - before == 2
+
+
+def test_deterministic_calls_are_shared(joke_main, run, upstream_calls):
+    prompt = f"Write a joke about {uuid.uuid4()}"
+    before = upstream_calls()
+    first = run(joke_main.run_inference(prompt, temperature=0))
+    second = run(joke_main.run_inference(prompt, temperature=0))
+    assert first == second
+    assert upstream_calls() - before == 1
+
+
+def test_cache_opt_out_at_temperature_zero(joke_main, run, upstream_calls):
+    prompt = f"Write a joke about {uuid.uuid4()}"
+    before = upstream_calls()
+    run(joke_main.run_inference(prompt, temperature=0, cache=False))
+    run(joke_main.run_inference(prompt, temperature=0, cache=False))
+    assert upstream_calls() - before == 2
+
+
+def test_requests_sample_fresh_unless_they_ask_for_the_cache(
+    joke_main, run, upstream_calls
+):
+    app = run(joke_main.registry.get("joke"))
+    request = {"topic": str(uuid.uuid4()), "spicy": False}
+
+    before = upstream_calls()
+    run(joke_main.tell_joke(app, request))
+    run(joke_main.tell_joke(app, request))
+    sampled = upstream_calls() - before
+
+    before = upstream_calls()
+    run(joke_main.tell_joke(app, {**request, "cache": True}))
+    first = upstream_calls() - before
+    run(joke_main.tell_joke(app, {**request, "cache": True}))
+    assert upstream_calls() - before == first
+    assert sampled == 2 * first
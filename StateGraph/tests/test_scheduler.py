@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+import httpx
+
+from scheduler import ScheduledAsyncTransport, scheduler
+
+
+def test_503_with_retry_after_pauses_the_key():
+    responses = [httpx.Response(503, headers={"Retry-After": "0.2"}), httpx.Response(200)]
+    handler = httpx.MockTransport(lambda request: responses.pop(0))
+
+    async def run():
+        async with httpx.AsyncClient(transport=ScheduledAsyncTransport(handler)) as client:
+            started = time.monotonic()
+            response = await client.get("http://overloaded.test/v1/models")
+            return response.status_code, time.monotonic() - started
+
+    status, elapsed = asyncio.run(run())
+    key = scheduler.key_for(httpx.Request("GET", "http://overloaded.test/")).snapshot()
+    assert status == 200
+    assert elapsed >= 0.2
+    assert (key["overloaded"], key["rate_limited"], key["retries"]) == (1, 0, 1)
+    # Unlike a 429, an overload pause leaves the concurrency cap alone
+    assert key["concurrency_limit"] == scheduler.settings["max_concurrency"]
+
+
+def test_overloaded_once_any_key_queue_is_full():
+    key = scheduler.key_for(httpx.Request("GET", "http://full.test/"))
+    assert not scheduler.overloaded()
+    key._queue.extend([None] * key.max_queue)
+    try:
+        assert key.full() and scheduler.overloaded()
+    finally:
+        key._queue.clear()
@@ -0,0 +1,133 @@
+"""
+LangChain callbacks that record graph runs as tracing spans.
+
+Bind ``tracing_handler`` to a compiled graph with
+``graph.with_config(callbacks=[tracing_handler])`` and every run of it is
+traced: the graph run, each node, each chat model call (with its prompt and
+completion tokens) and each tool or retriever call. Runnables called directly
+by a node, such as a conditional edge's routing function, are recorded as
+steps; deeper ones (prompts, parsers) are not, and the spans under them attach
+to the nearest recorded one. Model and tool spans are labelled with the node
+or step they ran in.
+
+The handler runs inline, in the context of the code it traces, so the span it
+starts is current inside the node, model or tool, and code there can add to
+it with ``tracing.annotate``.
+"""
+
+from typing import Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from tracing import Span, tracer
+
+
+def _token_usage(response) -> Dict:
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+    if not prompt and not completion:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt = usage.get("prompt_tokens", 0)
+        completion = usage.get("completion_tokens", 0)
+    return {"prompt_tokens": prompt, "completion_tokens": completion}
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    run_inline = True
+
+    def __init__(self):
+        self._spans: Dict[UUID, Span] = {}
+        # Untraced runs -> the recorded span their children attach to
+        self._parents: Dict[UUID, Optional[Span]] = {}
+
+    def _parent(self, parent_run_id: Optional[UUID]) -> Optional[Span]:
+        if parent_run_id is None:
+            return None
+        return self._spans.get(parent_run_id) or self._parents.get(parent_run_id)
+
+    def _start(self, run_id: UUID, parent_run_id, name: str, kind: str, **attributes):
+        span = tracer.start(name, kind, self._parent(parent_run_id), **attributes)
+        if isinstance(span, Span):
+            self._spans[run_id] = span
+
+    def _start_call(self, run_id: UUID, parent_run_id, name: str, kind: str, metadata):
+        parent = self._parent(parent_run_id)
+        if parent is not None and parent.kind in ("node", "step"):
+            node = parent.name
+        else:
+            node = (metadata or {}).get("langgraph_node")
+        self._start(run_id, parent_run_id, name, kind, node=node)
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None, **attributes):
+        self._parents.pop(run_id, None)
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            tracer.end(span, error, **attributes)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "chain"
+        node = (metadata or {}).get("langgraph_node")
+        parent = self._parent(parent_run_id)
+        if parent_run_id is None:
+            self._start(run_id, parent_run_id, name, "graph")
+        elif node == name:
+            self._start(run_id, parent_run_id, name, "node")
+        elif parent is not None and parent.kind == "node":
+            self._start(run_id, parent_run_id, name, "step")
+        else:
+            self._parents[run_id] = parent
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        name = (metadata or {}).get("ls_model_name") or kwargs.get("name") or "model"
+        self._start_call(run_id, parent_run_id, name, "llm", metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        self.on_chat_model_start(
+            serialized, prompts, run_id=run_id, parent_run_id=parent_run_id, metadata=metadata, **kwargs
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id, **_token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._start_call(run_id, parent_run_id, name, "tool", metadata)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "retriever"
+        self._start_call(run_id, parent_run_id, name, "retriever", metadata)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_retry(self, retry_state, *, run_id, **kwargs):
+        span = self._spans.get(run_id)
+        if span is not None:
+            span.increment("retries")
+
+
+tracing_handler = TracingCallbackHandler()
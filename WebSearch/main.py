@@ -1,32 +1,56 @@
+import json
 import os
 from gradient_adk import entrypoint
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from langchain.agents import create_agent
 from pydantic import BaseModel
 
 from langchain_community.tools import DuckDuckGoSearchRun
 
-search = DuckDuckGoSearchRun()
+from llm_client import get_chat_model, pool_stats
+from scheduler import scheduler
+from streaming import stream_graph
+from trace_callbacks import tracing_handler
+from tracing import tracer
+from search_cache import CachedSearch, SearchCache, http_backend
+
+# SEARCH_BACKEND_URL points the tool at a local stub search server instead of
+# DuckDuckGo, for offline testing
+SEARCH_BACKEND_URL = os.environ.get("SEARCH_BACKEND_URL")
+if SEARCH_BACKEND_URL:
+    backend, backend_name = http_backend(SEARCH_BACKEND_URL), "stub"
+else:
+    backend, backend_name = DuckDuckGoSearchRun().run, "duckduckgo"
+
+# Repeated queries are served from disk; when the model asks for several
+# searches in one turn they run concurrently, at most SEARCH_MAX_CONCURRENCY
+# at a time
+search = CachedSearch(
+    backend,
+    SearchCache(
+        cache_dir=os.environ.get("SEARCH_CACHE_DIR", "./.search_cache"),
+        ttl_seconds=float(os.environ.get("SEARCH_CACHE_TTL_SECONDS", "3600")),
+        max_entries=int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "10000")),
+    ),
+    max_concurrency=int(os.environ.get("SEARCH_MAX_CONCURRENCY", "4")),
+    name=backend_name,
+)
 
 
 @tool
-def web_search(query: str) -> str:
+async def web_search(query: str) -> str:
     """Perform a web search using DuckDuckGo."""
-    results = search.run(query)
+    results = await search.arun(query)
     return results
 
 
-llm = ChatOpenAI(
-    base_url="https://inference.do-ai.run/v1",
-    model="openai-gpt-oss-120b",
-    api_key=os.environ.get("GRADIENT_MODEL_ACCESS_KEY"),
-)
+llm = get_chat_model("openai-gpt-oss-120b")
 
+# Every run is traced node by node, tool call by tool call (see tracing.py)
 agent = create_agent(
     llm, tools=[web_search], system_prompt="You are a helpful assistant."
-)
+).with_config(callbacks=[tracing_handler])
 
 
 class Message(BaseModel):
@@ -35,7 +59,34 @@ class Message(BaseModel):
 
 @entrypoint
 async def entry(data, context):
+    """Entrypoint
+
+    With ``"stream": true`` the answer is streamed as server-sent events;
+    otherwise the answer text is returned as a single JSON string, as before.
+    """
+    if data.get("action") == "stats":
+        yield {
+            "http_pool": pool_stats(),
+            "search": search.stats(),
+            "upstream": scheduler.stats(),
+            "tracing": tracer.summary(),
+        }
+        return
+
+    if scheduler.overloaded():
+        # Backpressure: the upstream queue is full, so don't start more work
+        yield {"error": "upstream overloaded, retry later"}
+        return
+
     query = data["prompt"]
     inputs = {"messages": [HumanMessage(content=query)]}
+
+    if data.get("stream", False):
+        async for event in stream_graph(
+            agent, inputs, answer_nodes={"model"}, progress=data.get("progress", True)
+        ):
+            yield event
+        return
+
     result = await agent.ainvoke(inputs)
-    return result["messages"][-1].content
+    yield json.dumps(result["messages"][-1].content)
@@ -0,0 +1,44 @@
+import asyncio
+import os
+import time
+
+from search_cache import CachedSearch, SearchCache
+
+
+def test_expired_and_excess_entries_are_swept(tmp_path):
+    cache = SearchCache(str(tmp_path), ttl_seconds=60, max_entries=3, sweep_every=1000)
+    for i in range(5):
+        cache.put(f"query {i}", i)
+    old = time.time() - 120
+    os.utime(cache._path("query 0"), (old, old))
+
+    cache.sweep()
+
+    assert cache.get("query 0") is None
+    assert cache.get("query 1") is None  # the oldest live entry, over the cap
+    assert [cache.get(f"query {i}")["value"] for i in (2, 3, 4)] == [2, 3, 4]
+    assert cache.evictions == 2
+
+
+def test_writes_trigger_a_sweep(tmp_path):
+    cache = SearchCache(str(tmp_path), max_entries=2, sweep_every=2)
+    for i in range(4):
+        cache.put(f"query {i}", i)
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_concurrent_searches_share_one_backend_call(tmp_path):
+    def backend(query):
+        time.sleep(0.05)
+        return f"results for {query}"
+
+    search = CachedSearch(backend, SearchCache(str(tmp_path)))
+
+    async def run():
+        first = await asyncio.gather(*(search.arun("Python release?") for _ in range(3)))
+        return first, await search.arun("python  release")
+
+    first, repeat = asyncio.run(run())
+    assert set(first) == {repeat} == {"results for Python release?"}
+    stats = search.stats()
+    assert (stats["backend_calls"], stats["coalesced"], stats["hits"]) == (1, 2, 1)
@@ -0,0 +1,382 @@
+"""
+End-to-end offline benchmark for every template's `@entrypoint`.
+
+Starts `fake_openai_server.py` (chat, embeddings, stub web search and a stub
+knowledge base) and, for the MCP template, `stub_mcp_server.py` in place of
+Tavily; the calculator server runs locally as usual. Each template then runs
+in its own worker process, with its endpoints pointed at the stubs, and
+replays its request corpus from `benchmarks/corpus/<template>.jsonl` through
+the entrypoint at a fixed concurrency.
+
+For each template it reports p50/p95/p99 latency, throughput, errors, the
+upstream calls made during the timed run, peak RSS and the template's own
+`stats` action, as JSON. `--output` saves the results and `--compare` prints
+the change from an earlier results file, so two branches or two settings can
+be compared.
+
+    python benchmarks/e2e.py --requests 64 --concurrency 8 --latency-ms 50 \\
+        --tokens-per-second 200 --output after.json --compare before.json
+
+`--env KEY=VALUE` passes a setting to every template (for example
+`--env LLM_POOL_MAX_KEEPALIVE=1`). Templates whose requirements are not
+installed are reported with their import error and skipped.
+`--rate-limit-rps` makes the fake server answer 429s above that rate, to
+exercise each template's upstream scheduler.
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import math
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fake_openai_server import _free_port, server_stats, start_server
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+CORPUS_DIR = BENCH_DIR / "corpus"
+
+# Template folder -> name of its @entrypoint function
+ENTRYPOINTS = {
+    "RAG": "main",
+    "MCP": "main",
+    "KnowledgeBaseRAG": "entry",
+    "WebSearch": "entry",
+    "StateGraph": "main",
+    "Crew": "main",
+}
+
+# Metrics compared by --compare, and whether a larger value is better
+COMPARED = {
+    "throughput_rps": True,
+    "latency_ms.p50": False,
+    "latency_ms.p95": False,
+    "latency_ms.p99": False,
+    "errors": False,
+    "upstream_calls.total": False,
+    "peak_rss_mb": False,
+}
+
+
+def template_env(template: str, base_url: str, search_mcp_url: str) -> dict:
+    """Environment pointing ``template`` at the local stubs."""
+    root = base_url.rsplit("/v1", 1)[0]
+    env = {
+        "OPENAI_BASE_URL": base_url,
+        "OPENAI_API_KEY": "fake",
+        "INFERENCE_BASE_URL": base_url,
+        "DIGITALOCEAN_INFERENCE_KEY": "fake",
+        "GRADIENT_MODEL_ACCESS_KEY": "fake",
+        "SEARCH_BACKEND_URL": f"{root}/search",
+        "SERPER_API_KEY": "fake",
+        # The calculator MCP server is started as `python`
+        "PATH": os.pathsep.join([str(Path(sys.executable).parent), os.environ.get("PATH", "")]),
+    }
+    if template == "MCP":
+        env.update({"SEARCH_MCP_URL": search_mcp_url, "TAVILY_API_KEY": "fake"})
+    if template == "KnowledgeBaseRAG":
+        env.update(
+            {
+                "GRADIENT_BASE_URL": f"{root}/kb",
+                "DIGITALOCEAN_API_TOKEN": "fake",
+                "DIGITALOCEAN_KB_ID": "bench-kb",
+            }
+        )
+    if template == "StateGraph":
+        env["GRADIENT_INFERENCE_ENDPOINT"] = root
+    return env
+
+
+def percentile(sorted_values, q: float) -> float:
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def summarize(latencies, elapsed: float, errors: int) -> dict:
+    latencies = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 2)  # noqa: E731
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": ms(statistics.mean(latencies)),
+            "p50": ms(percentile(latencies, 0.50)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "max": ms(latencies[-1]),
+        }
+        if latencies
+        else {},
+    }
+
+
+def count_delta(before: dict, after: dict) -> dict:
+    delta = {key: after.get(key, 0) - before.get(key, 0) for key in after}
+    delta = {key: value for key, value in sorted(delta.items()) if value}
+    return {**delta, "total": sum(delta.values())}
+
+
+# W O R K E R
+
+
+async def call(entry, request: dict):
+    """Run one request through an entrypoint, draining streamed output."""
+    args = (request, {}) if len(inspect.signature(entry).parameters) > 1 else (request,)
+    result = entry(*args)
+    if inspect.isasyncgen(result):
+        return [item async for item in result]
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+async def replay(entry, corpus, requests: int, concurrency: int, base_url: str, warmup: int):
+    for request in corpus[:warmup]:
+        await call(entry, request)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], []
+
+    async def one(index: int):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await call(entry, corpus[index % len(corpus)])
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    before = await asyncio.to_thread(server_stats, base_url)
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    after = await asyncio.to_thread(server_stats, base_url)
+
+    try:
+        template_stats = await call(entry, {"action": "stats"})
+        if isinstance(template_stats, list):
+            template_stats = template_stats[0] if template_stats else None
+    except Exception as e:
+        template_stats = {"error": f"{type(e).__name__}: {e}"}
+
+    return {
+        **summarize(latencies, elapsed, len(errors)),
+        "error_samples": sorted(set(errors))[:3],
+        "upstream_calls": count_delta(before, after),
+        "template_stats": template_stats,
+    }
+
+
+def run_worker(args):
+    template_dir = REPO_DIR / args.worker
+    corpus = [
+        json.loads(line)
+        for line in (CORPUS_DIR / f"{args.worker}.jsonl").read_text().splitlines()
+        if line.strip()
+    ]
+
+    # A scratch working directory, so indexes and caches start cold
+    workdir = tempfile.mkdtemp(prefix=f"bench-{args.worker.lower()}-")
+    if (template_dir / "pdfs").is_dir():
+        os.symlink(template_dir / "pdfs", Path(workdir) / "pdfs")
+    os.chdir(workdir)
+    sys.path.insert(0, str(template_dir))
+
+    result = {"concurrency": args.concurrency}
+    start = time.perf_counter()
+    try:
+        import main as template
+
+        result["startup_seconds"] = round(time.perf_counter() - start, 3)
+        entry = getattr(template, ENTRYPOINTS[args.worker])
+        result.update(
+            asyncio.run(
+                replay(entry, corpus, args.requests, args.concurrency, args.base_url, args.warmup)
+            )
+        )
+    except ImportError as e:
+        result["skipped"] = f"{type(e).__name__}: {e}"
+    # ru_maxrss is in kilobytes on Linux
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+    Path(args.result_file).write_text(json.dumps(result, default=str))
+
+
+# H A R N E S S
+
+
+def start_stub_mcp(latency_ms: float):
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, str(BENCH_DIR / "stub_mcp_server.py"),
+         "--port", str(port), "--latency-ms", str(latency_ms)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(200):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    else:
+        process.terminate()
+        raise RuntimeError("stub MCP server did not start")
+    return process, f"http://127.0.0.1:{port}/mcp"
+
+
+def run_template(template: str, args, base_url: str, search_mcp_url: str) -> dict:
+    env = {**os.environ, **template_env(template, base_url, search_mcp_url), **dict(args.env)}
+    with tempfile.NamedTemporaryFile(suffix=".json") as result_file:
+        command = [
+            sys.executable, str(Path(__file__).resolve()),
+            "--worker", template,
+            "--base-url", base_url,
+            "--requests", str(args.requests),
+            "--concurrency", str(args.concurrency),
+            "--warmup", str(args.warmup),
+            "--result-file", result_file.name,
+        ]
+        try:
+            completed = subprocess.run(
+                command, env=env, capture_output=True, text=True, timeout=args.timeout
+            )
+        except subprocess.TimeoutExpired:
+            return {"skipped": f"timed out after {args.timeout}s"}
+        output = Path(result_file.name).read_text()
+    if not output:
+        tail = (completed.stderr or completed.stdout).strip().splitlines()[-5:]
+        return {"skipped": f"worker exited with {completed.returncode}", "log": tail}
+    return json.loads(output)
+
+
+def lookup(result: dict, path: str):
+    for key in path.split("."):
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(baseline: dict, current: dict) -> dict:
+    """Per-template ``{metric: {before, after, change_pct, better}}``."""
+    comparison = {}
+    for template, result in current["templates"].items():
+        previous = baseline.get("templates", {}).get(template)
+        if not previous or "skipped" in result or "skipped" in previous:
+            continue
+        rows = {}
+        for metric, higher_is_better in COMPARED.items():
+            before, after = lookup(previous, metric), lookup(result, metric)
+            if before is None or after is None:
+                continue
+            change = round((after - before) / before * 100, 1) if before else None
+            rows[metric] = {
+                "before": before,
+                "after": after,
+                "change_pct": change,
+                "better": after == before or (after > before) == higher_is_better,
+            }
+        comparison[template] = rows
+    return comparison
+
+
+def print_comparison(comparison: dict):
+    for template, rows in comparison.items():
+        print(f"\n{template}", file=sys.stderr)
+        for metric, row in rows.items():
+            change = "n/a" if row["change_pct"] is None else f"{row['change_pct']:+.1f}%"
+            mark = "" if row["better"] else "  <-- worse"
+            print(
+                f"  {metric:<22} {row['before']:>10} -> {row['after']:>10}  {change}{mark}",
+                file=sys.stderr,
+            )
+
+
+def run(args) -> dict:
+    results = {
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "latency_ms": args.latency_ms,
+            "tokens_per_second": args.tokens_per_second,
+            "rate_limit_rps": args.rate_limit_rps,
+            "env": dict(args.env),
+        },
+        "templates": {},
+    }
+    stub_mcp, search_mcp_url = None, ""
+    if "MCP" in args.templates:
+        stub_mcp, search_mcp_url = start_stub_mcp(args.latency_ms)
+    try:
+        with start_server(
+            args.latency_ms,
+            tokens_per_second=args.tokens_per_second,
+            rate_limit_rps=args.rate_limit_rps,
+        ) as base_url:
+            for template in args.templates:
+                print(f"Running {template}...", file=sys.stderr)
+                results["templates"][template] = run_template(
+                    template, args, base_url, search_mcp_url
+                )
+    finally:
+        if stub_mcp is not None:
+            stub_mcp.terminate()
+            stub_mcp.wait()
+    return results
+
+
+def env_pair(value: str):
+    key, _, setting = value.partition("=")
+    return key, setting
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--templates", nargs="+", choices=list(ENTRYPOINTS), default=list(ENTRYPOINTS))
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed requests before the run")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--tokens-per-second", type=float, default=0)
+    parser.add_argument(
+        "--rate-limit-rps", type=float, default=0, help="fake server answers 429 above this"
+    )
+    parser.add_argument("--timeout", type=float, default=600, help="seconds per template")
+    parser.add_argument("--env", type=env_pair, action="append", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="results JSON from an earlier run")
+    # Internal: run one template in this process
+    parser.add_argument("--worker", choices=list(ENTRYPOINTS), help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    results = run(args)
+    if args.compare:
+        with open(args.compare) as f:
+            results["comparison"] = compare(json.load(f), results)
+        print_comparison(results["comparison"])
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
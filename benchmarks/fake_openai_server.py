@@ -0,0 +1,369 @@
+"""
+A local stand-in for an OpenAI-compatible inference endpoint.
+
+Serves ``/v1/chat/completions`` (plain, streamed, tool-calling and structured
+output) and ``/v1/embeddings`` with a fixed artificial latency, plus an
+optional generation rate in tokens per second, so the templates can be load
+tested offline without paying for real calls. Chat
+models call the first offered tool until a tool result comes back, then
+answer; embeddings are deterministic bag-of-words hashes, so texts that share
+words get similar vectors.
+
+    python benchmarks/fake_openai_server.py --port 8099 --latency-ms 100 --tokens-per-second 50
+
+With ``--rate-limit-rps``, chat completions beyond that many per second are
+answered with a 429 and ``Retry-After`` / ``retry-after-ms`` headers, like a
+rate-limited provider, for testing the templates' retry and admission control.
+
+``GET /stats`` returns per-endpoint call counts and ``POST /reset`` clears
+them. ``GET /search?q=...`` is a stub web search backend for the WebSearch
+and Crew templates, and ``POST /kb/{kb_id}/retrieve`` a stand-in knowledge base
+for KnowledgeBaseRAG. Benchmarks start it in a subprocess with ``start_server``.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import math
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+from collections import Counter
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+app = FastAPI()
+app.state.latency = 0.1
+app.state.dim = 256
+app.state.tokens_per_second = 0
+app.state.rate_limit = None
+CALLS = Counter()
+
+
+class RateLimit:
+    """Token bucket of ``rps`` requests per second, bursting to one second's worth."""
+
+    def __init__(self, rps: float):
+        self.rps = rps
+        self.level = rps
+        self.updated = time.monotonic()
+
+    def retry_after(self) -> float:
+        """0 if a request may go through now, else seconds until one may."""
+        now = time.monotonic()
+        self.level = min(self.rps, self.level + (now - self.updated) * self.rps)
+        self.updated = now
+        if self.level >= 1:
+            self.level -= 1
+            return 0.0
+        return (1 - self.level) / self.rps
+
+
+def _rate_limited(retry_after: float) -> JSONResponse:
+    CALLS["rate_limited"] += 1
+    return JSONResponse(
+        {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+        status_code=429,
+        headers={
+            "retry-after": str(math.ceil(retry_after)),
+            "retry-after-ms": str(round(retry_after * 1000)),
+        },
+    )
+
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _embed(text: str, dim: int):
+    vector = [0.0] * dim
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dim
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _fill_schema(schema: dict):
+    """A minimal instance of a JSON schema (strings answer "yes")."""
+    kind = schema.get("type")
+    if "enum" in schema:
+        return schema["enum"][0]
+    if kind == "object":
+        return {
+            name: _fill_schema(prop)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return []
+    if kind in ("number", "integer"):
+        return 1
+    if kind == "boolean":
+        return True
+    return "yes"
+
+
+def _reply(body: dict) -> dict:
+    """The assistant message the fake model sends back for ``body``."""
+    messages = body.get("messages", [])
+    question = next(
+        (_text(m.get("content")) for m in reversed(messages) if m.get("role") == "user"),
+        "",
+    )
+    tools = body.get("tools") or []
+    called_tool = any(m.get("role") == "tool" for m in messages)
+
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format["json_schema"].get("schema", {})
+        return {"role": "assistant", "content": json.dumps(_fill_schema(schema))}
+
+    if tools and not called_tool:
+        function = tools[0]["function"]
+        params = function.get("parameters", {})
+        properties = params.get("properties", {})
+        # Strings get the user's question, anything else a minimal value
+        arguments = {
+            name: question if properties.get(name, {}).get("type", "string") == "string"
+            else _fill_schema(properties[name])
+            for name in params.get("required") or list(properties)[:1] or ["query"]
+        }
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {
+                        "name": function["name"],
+                        "arguments": json.dumps(arguments),
+                    },
+                }
+            ],
+        }
+
+    return {"role": "assistant", "content": f"This is a fake answer to: {question[:200]}!"}
+
+
+def _usage(body: dict, reply: dict) -> dict:
+    prompt = sum(len(_text(m.get("content"))) for m in body.get("messages", [])) // 4
+    completion = len(reply.get("content") or "") // 4
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+    }
+
+
+def _generation_seconds(tokens: int) -> float:
+    rate = app.state.tokens_per_second
+    return tokens / rate if rate else 0.0
+
+
+async def _stream(body: dict, reply: dict, completion_id: str):
+    base = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+    }
+
+    def chunk(delta, finish_reason=None):
+        event = {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+        return f"data: {json.dumps(event)}\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    if reply.get("tool_calls"):
+        calls = [{"index": i, **call} for i, call in enumerate(reply["tool_calls"])]
+        yield chunk({"tool_calls": calls})
+        yield chunk({}, "tool_calls")
+    else:
+        for word in reply["content"].split(" "):
+            # One word a token, close enough for pacing the stream
+            await asyncio.sleep(_generation_seconds(1))
+            yield chunk({"content": word + " "})
+        yield chunk({}, "stop")
+    if (body.get("stream_options") or {}).get("include_usage"):
+        yield f"data: {json.dumps({**base, 'choices': [], 'usage': _usage(body, reply)})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if app.state.rate_limit is not None:
+        retry_after = app.state.rate_limit.retry_after()
+        if retry_after:
+            return _rate_limited(retry_after)
+    CALLS["chat_completions"] += 1
+    await asyncio.sleep(app.state.latency)
+
+    reply = _reply(body)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    if body.get("stream"):
+        return StreamingResponse(
+            _stream(body, reply, completion_id), media_type="text/event-stream"
+        )
+    usage = _usage(body, reply)
+    await asyncio.sleep(_generation_seconds(usage["completion_tokens"]))
+    finish_reason = "tool_calls" if reply.get("tool_calls") else "stop"
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": reply, "finish_reason": finish_reason}],
+        "usage": usage,
+    }
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    CALLS["embeddings"] += 1
+    await asyncio.sleep(app.state.latency)
+
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    data = [
+        {"object": "embedding", "index": i, "embedding": _embed(str(text), app.state.dim)}
+        for i, text in enumerate(inputs)
+    ]
+    tokens = sum(len(str(text)) for text in inputs) // 4
+    return {
+        "object": "list",
+        "data": data,
+        "model": body.get("model", "fake"),
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+@app.get("/search")
+async def search(q: str = ""):
+    """Stub web search: a few canned results that mention the query."""
+    CALLS["search"] += 1
+    await asyncio.sleep(app.state.latency)
+    return PlainTextResponse(
+        "\n".join(
+            f"Result {i}: {q} - stub article {i} about {q}, published by Example News."
+            for i in range(1, 4)
+        )
+    )
+
+
+@app.post("/kb/{kb_id}/retrieve")
+async def kb_retrieve(kb_id: str, request: Request):
+    """Stand-in Gradient knowledge base: ``num_results`` ranked chunks.
+
+    Use it with ``GRADIENT_BASE_URL=http://<host>:<port>/kb``.
+    """
+    body = await request.json()
+    CALLS["kb_retrieve"] += 1
+    await asyncio.sleep(app.state.latency)
+    query = body.get("query", "")
+    results = [
+        {
+            "text_content": f"Chunk {i} of the {kb_id} knowledge base about {query}.",
+            "metadata": {"source": f"doc-{i}.md", "rank": i},
+        }
+        for i in range(1, int(body.get("num_results", 5)) + 1)
+    ]
+    return {"results": results, "total_results": len(results)}
+
+
+@app.get("/stats")
+async def stats():
+    return dict(CALLS)
+
+
+@app.post("/reset")
+async def reset():
+    CALLS.clear()
+    return JSONResponse({})
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def start_server(
+    latency_ms: float = 100, dim: int = 256, tokens_per_second: float = 0, rate_limit_rps: float = 0
+):
+    """Run the fake server in a subprocess; yields its ``/v1`` base URL."""
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--port", str(port),
+            "--latency-ms", str(latency_ms),
+            "--dim", str(dim),
+            "--tokens-per-second", str(tokens_per_second),
+            "--rate-limit-rps", str(rate_limit_rps),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    root = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(200):
+            try:
+                urllib.request.urlopen(f"{root}/stats", timeout=1)
+                break
+            except OSError:
+                time.sleep(0.05)
+        else:
+            raise RuntimeError("fake inference server did not start")
+        yield f"{root}/v1"
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def server_stats(base_url: str) -> dict:
+    root = base_url.rsplit("/v1", 1)[0]
+    with urllib.request.urlopen(f"{root}/stats") as response:
+        return json.load(response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument(
+        "--tokens-per-second", type=float, default=0,
+        help="generation rate for chat completions (0 = instant)",
+    )
+    parser.add_argument(
+        "--rate-limit-rps", type=float, default=0,
+        help="answer chat completions over this rate with 429s (0 = no limit)",
+    )
+    args = parser.parse_args()
+
+    app.state.latency = args.latency_ms / 1000
+    app.state.dim = args.dim
+    app.state.tokens_per_second = args.tokens_per_second
+    if args.rate_limit_rps > 0:
+        app.state.rate_limit = RateLimit(args.rate_limit_rps)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
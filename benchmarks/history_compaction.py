@@ -0,0 +1,136 @@
+"""
+Prompt-size benchmark for message-history compaction.
+
+Replays synthetic tool-calling loops through the MCP and RAG templates'
+`HistoryCompactor` and compares what each model turn would be sent with and
+without compaction:
+
+- MCP: a `call_model <-> tools` loop of `--depth` rounds, each calling
+  search (a Tavily-sized result of `--result-tokens`) and the calculator;
+- RAG: the rewrite loop with up to `--rewrites` rewrites, each retrieval
+  returning a packed context of `--context-tokens`.
+
+Reports prompt tokens per request (summed over every model turn), the last
+turn's prompt, the share saved and the compaction time per call.
+
+    python benchmarks/history_compaction.py --depth 2 4 8 --rewrites 2
+"""
+
+import argparse
+import importlib.util
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+ROOT = Path(__file__).resolve().parent.parent
+WORDS = "hubble telescope orbit mirror spectrograph camera servicing mission gyro data".split()
+
+
+def load_compaction(template: str, module: str):
+    """A template's compaction module, importing its own tracing module."""
+    sys.path.insert(0, str(ROOT / template))
+    path = ROOT / template / (module.replace(".", "/") + ".py")
+    spec = importlib.util.spec_from_file_location(f"{template.lower()}_compaction", path)
+    compaction = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(compaction)
+    sys.path.pop(0)
+    return compaction
+
+
+def text(tokens: int, seed: int) -> str:
+    words, size = [], 0
+    while size < tokens * 3:
+        word = WORDS[(seed + len(words)) * 7 % len(WORDS)]
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)
+
+
+def tool_round(i: int, results):
+    calls = [
+        {"name": name, "args": {"query": f"step {i}"}, "id": f"call_{i}_{n}"}
+        for n, (name, _) in enumerate(results)
+    ]
+    return [AIMessage(content="", tool_calls=calls)] + [
+        ToolMessage(content=content, name=name, tool_call_id=call["id"])
+        for (name, content), call in zip(results, calls)
+    ]
+
+
+def mcp_turns(depth: int, result_tokens: int):
+    """The history each model turn of a ``depth``-round tool loop starts from."""
+    history = [SystemMessage("You are a helpful assistant."), HumanMessage("Research and compute.")]
+    turns = [list(history)]
+    for i in range(depth):
+        history += tool_round(i, [("search", text(result_tokens, i)), ("add", str(i))])
+        turns.append(list(history))
+    return turns
+
+
+def rag_turns(rewrites: int, context_tokens: int):
+    """The history each query-generation turn of the rewrite loop starts from."""
+    history = [HumanMessage("What did Servicing Mission 4 install on Hubble?")]
+    turns = [list(history)]
+    for i in range(rewrites):
+        history += tool_round(i, [("retrieve_documents", text(context_tokens, i))])
+        history.append(HumanMessage(f"Rewritten question {i + 1}: which instruments were added in 2009?"))
+        turns.append(list(history))
+    return turns
+
+
+def measure(compaction, turns, **policy):
+    compactor = compaction.HistoryCompactor(**policy)
+    raw = [sum(compaction.message_tokens(m) for m in turn) for turn in turns]
+    compacted, seconds = [], []
+    for turn in turns:
+        start = time.perf_counter()
+        sent = compactor.compact(turn)
+        seconds.append(time.perf_counter() - start)
+        compacted.append(sum(compaction.message_tokens(m) for m in sent))
+    return {
+        "model_turns": len(turns),
+        "prompt_tokens_per_request": sum(raw),
+        "compacted_tokens_per_request": sum(compacted),
+        "tokens_saved_per_request": sum(raw) - sum(compacted),
+        "tokens_saved_rate": round(1 - sum(compacted) / sum(raw), 4),
+        "last_turn_tokens": raw[-1],
+        "last_turn_compacted_tokens": compacted[-1],
+        "compact_mean_us": round(statistics.mean(seconds) * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--depth", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--rewrites", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--result-tokens", type=int, default=2000)
+    parser.add_argument("--context-tokens", type=int, default=1500)
+    parser.add_argument("--max-tokens", type=int, default=8000)
+    parser.add_argument("--tool-result-tokens", type=int, default=500)
+    args = parser.parse_args()
+
+    policy = {"max_tokens": args.max_tokens, "tool_result_tokens": args.tool_result_tokens}
+    mcp = load_compaction("MCP", "compaction")
+    rag = load_compaction("RAG", "utils.compaction")
+    results = {
+        "policy": policy,
+        "mcp": {
+            f"depth={depth}": measure(mcp, mcp_turns(depth, args.result_tokens), **policy)
+            for depth in args.depth
+        },
+        "rag": {
+            f"rewrites={n}": measure(
+                rag, rag_turns(n, args.context_tokens), drop_superseded_turns=True, **policy
+            )
+            for n in args.rewrites
+        },
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
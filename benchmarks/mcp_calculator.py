@@ -0,0 +1,84 @@
+"""
+Tool-call latency benchmark for the MCP template's calculator server.
+
+Calls the local `mcp_server_calculator` stdio server `--calls` times through
+the tools from `MultiServerMCPClient.get_tools()` (a new session, and so a
+new server process, per call) and through tools bound to the template's
+`SessionPool`, and reports the latency distribution of each. Needs the MCP
+template's requirements installed; no API keys or network access.
+
+    python benchmarks/mcp_calculator.py --calls 50 --pool-size 2
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import sys
+import time
+from pathlib import Path
+
+MCP_DIR = Path(__file__).resolve().parent.parent / "MCP"
+sys.path.insert(0, str(MCP_DIR))
+
+from langchain_mcp_adapters.client import MultiServerMCPClient  # noqa: E402
+from session_pool import SessionPool, load_pooled_tools  # noqa: E402
+
+CONNECTIONS = {
+    "calculator": {
+        "command": sys.executable,
+        "args": ["-m", "mcp_server_calculator"],
+        "transport": "stdio",
+    }
+}
+
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    return {
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[math.ceil(0.95 * len(latencies)) - 1] * 1000, 2),
+    }
+
+
+async def time_calls(tool, calls: int):
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        await tool.ainvoke({"expression": f"{i} * 7 + 3"})
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def run(calls: int, pool_size: int):
+    client = MultiServerMCPClient(CONNECTIONS)
+
+    (per_call_tool,) = await client.get_tools()
+    per_call = await time_calls(per_call_tool, calls)
+
+    pool = SessionPool(client, "calculator", size=pool_size)
+    (pooled_tool,) = await load_pooled_tools(pool)
+    pooled = await time_calls(pooled_tool, calls)
+    stats = pool.stats()
+    await pool.close()
+
+    return {
+        "calls": calls,
+        "session_per_call": summarize(per_call),
+        "pooled_sessions": summarize(pooled),
+        "pool": stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.calls, args.pool_size)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Concurrent-request throughput benchmark for the RAG template.
+
+Starts `fake_openai_server.py` with a fixed per-call latency, points the
+template's chat models and embeddings at it, and drives the `main` entrypoint
+with an increasing number of simultaneous questions in one process. With
+async graph nodes, throughput should grow with concurrency until the fake
+server's latency, not the event loop, is the limit. `--compare-blocking`
+repeats the run with chat model calls forced back onto the event loop
+thread (the previous synchronous nodes) for comparison.
+
+    python benchmarks/rag_concurrency.py --latency-ms 100 --levels 1 4 16 32
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fake_openai_server import server_stats, start_server
+
+RAG_DIR = Path(__file__).resolve().parent.parent / "RAG"
+
+
+def load_template(base_url: str, workdir: str):
+    os.environ.update(
+        {
+            "OPENAI_BASE_URL": base_url,
+            "OPENAI_API_KEY": "fake",
+            "INFERENCE_BASE_URL": base_url,
+            "DIGITALOCEAN_INFERENCE_KEY": "fake",
+            # Every question must run the full graph
+            "ANSWER_CACHE_THRESHOLD": "2",
+        }
+    )
+    # Index the bundled PDFs into a scratch folder, not the template's .index
+    os.symlink(RAG_DIR / "pdfs", Path(workdir) / "pdfs")
+    os.chdir(workdir)
+    sys.path.insert(0, str(RAG_DIR))
+    import main as template
+
+    return template
+
+
+def block_chat_models():
+    """Make ``ainvoke`` on chat models run synchronously on the event loop."""
+    from langchain_core.language_models.chat_models import BaseChatModel
+
+    async def blocking_ainvoke(self, input, config=None, **kwargs):
+        return self.invoke(input, config, **kwargs)
+
+    BaseChatModel.ainvoke = blocking_ainvoke
+
+
+async def ask(template, question: str) -> float:
+    start = time.perf_counter()
+    request = {"prompt": {"messages": [{"role": "user", "content": question}]}}
+    async for _ in template.main(request, {}):
+        pass
+    return time.perf_counter() - start
+
+
+async def run_level(template, concurrency: int, rounds: int, offset: int):
+    questions = [
+        f"Question {offset + i}: what do the fact sheets say about item {offset + i}?"
+        for i in range(concurrency * rounds)
+    ]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(question):
+        async with semaphore:
+            return await ask(template, question)
+
+    start = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(limited(q) for q in questions)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": len(questions),
+        "throughput_rps": round(len(questions) / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[math.ceil(0.95 * len(latencies)) - 1] * 1000, 1),
+    }
+
+
+async def run_levels(template, levels, rounds: int, offset: int):
+    results = []
+    for concurrency in levels:
+        results.append(await run_level(template, concurrency, rounds, offset))
+        offset += concurrency * rounds
+    return results
+
+
+async def run(template, levels, rounds: int, compare_blocking: bool):
+    # One event loop for everything: the template's HTTP clients are bound to it
+    report = {"async": await run_levels(template, levels, rounds, offset=0)}
+    if compare_blocking:
+        block_chat_models()
+        report["blocking"] = await run_levels(template, levels, rounds, offset=10**6)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--compare-blocking", action="store_true")
+    args = parser.parse_args()
+
+    with start_server(latency_ms=args.latency_ms) as base_url, \
+            tempfile.TemporaryDirectory() as workdir:
+        template = load_template(base_url, workdir)
+        report = {
+            "latency_ms": args.latency_ms,
+            **asyncio.run(
+                run(template, args.levels, args.rounds, args.compare_blocking)
+            ),
+            "upstream_calls": server_stats(base_url),
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Prompt-context size benchmark for the RAG template's context packer.
+
+Indexes the bundled PDFs against `fake_openai_server.py` embeddings, runs the
+questions in `benchmarks/corpus/RAG.jsonl` through the retriever at each `k`,
+and compares the context the grader and answer writer used to receive (the
+chunks joined as-is) with `ContextPacker` output: estimated tokens, how many
+chunks were merged into spans or dropped as duplicates, and the share of
+retrieved pages still attributed in the packed context.
+
+    python benchmarks/rag_context.py --k 4 8 16 --budget 1500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+from fake_openai_server import start_server
+
+RAG_DIR = Path(__file__).resolve().parent.parent / "RAG"
+CORPUS = Path(__file__).resolve().parent / "corpus" / "RAG.jsonl"
+
+
+def questions():
+    rows = [json.loads(line) for line in CORPUS.read_text().splitlines() if line.strip()]
+    return sorted({row["prompt"]["messages"][-1]["content"] for row in rows})
+
+
+def run(levels, budget: int):
+    sys.path.insert(0, str(RAG_DIR))
+    from tools.context_packer import ContextPacker
+    from tools.doc_retriever import DocumentIndex
+    from tools.embedding_pipeline import estimate_tokens
+
+    index = DocumentIndex(str(RAG_DIR / "pdfs"), index_dir=tempfile.mkdtemp())
+    results = {}
+    for k in levels:
+        index.retriever.k = k
+        packer = ContextPacker(token_budget=budget)
+        raw_tokens, packed_tokens, attributed = [], [], []
+        for question in questions():
+            docs = index.retriever.invoke(question)
+            raw_tokens.append(estimate_tokens("\n\n".join(d.page_content for d in docs)))
+            context = packer.pack(docs)
+            packed_tokens.append(estimate_tokens(context))
+            pages = {(os.path.basename(d.metadata["source"]), d.metadata["page"]) for d in docs}
+            kept = {(name, page) for name, page in pages if f"[{name} p." in context}
+            attributed.append(len(kept) / len(pages))
+        stats = packer.stats.as_dict()
+        results[f"k={k}"] = {
+            "raw_tokens_mean": round(statistics.mean(raw_tokens), 1),
+            "packed_tokens_mean": round(statistics.mean(packed_tokens), 1),
+            "tokens_saved_rate": stats["tokens_saved_rate"],
+            "chunks": stats["chunks"],
+            "spans": stats["spans"],
+            "duplicates_dropped": stats["duplicates_dropped"],
+            "over_budget_dropped": stats["over_budget_dropped"],
+            "pages_attributed": round(statistics.mean(attributed), 4),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--budget", type=int, default=1500)
+    args = parser.parse_args()
+
+    with start_server(latency_ms=0) as base_url:
+        os.environ.update({"OPENAI_BASE_URL": base_url, "OPENAI_API_KEY": "fake"})
+        results = run(args.k, args.budget)
+    print(json.dumps({"budget": args.budget, "levels": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Vector vs hybrid (BM25 + vector) retrieval benchmark for the RAG template.
+
+Indexes the bundled PDFs against `fake_openai_server.py` embeddings and runs
+a set of labelled Hubble questions, many of them built around exact
+identifiers ("WFC3", "STIS", "SM1", "TDRSS"), through the retriever in each
+mode. A chunk is relevant when it contains all of a question's expected
+terms. For every mode it reports hit rate and MRR at `k`, how often the
+first retrieval would send the graph into `rewrite_question` (the local
+grader's verdict, with relevance standing in for the LLM grader when the
+local grader abstains), and query latency: the search alone and the full
+retriever call including the query embedding.
+
+    python benchmarks/rag_hybrid.py --k 4 --repeat 20
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fake_openai_server import start_server
+
+RAG_DIR = Path(__file__).resolve().parent.parent / "RAG"
+
+# (question, terms a relevant chunk must contain)
+QUESTIONS = [
+    ("What does WFC3 use to detect near-infrared light?", ["wfc3", "hgcdte"]),
+    ("How many pixels does the UVIS CCD have?", ["uvis", "megapixel"]),
+    ("What is the field of view of WFC3?", ["160x160"]),
+    ("When was STIS installed?", ["stis", "1997"]),
+    ("Why did STIS stop working in 2004?", ["stis", "power", "supply"]),
+    ("What detectors does STIS have?", ["mama", "ccd"]),
+    ("What wavelengths does the COS FUV channel cover?", ["fuv", "215"]),
+    ("What is the NUV range of COS?", ["nuv", "320"]),
+    ("What are the COS detectors built around?", ["micro", "channel", "plates"]),
+    ("What is the VEST used for?", ["vest"]),
+    ("What does the STOCC consist of?", ["stocc"]),
+    ("What is the MOR?", ["mission", "operations", "room"]),
+    ("How does Hubble transmit its data through TDRSS?", ["tdrss"]),
+    ("What happened on Servicing Mission 3B?", ["3b"]),
+    ("What was installed in SM1 in 1993?", ["1993"]),
+    ("What is COSTAR?", ["costar"]),
+    ("What did WFPC2 replace?", ["wfpc2"]),
+    ("What is the Pistol Grip Tool?", ["pistol", "grip"]),
+    ("What is the Portable Foot Restraint?", ["portable", "foot", "restraint"]),
+    ("How fast do the gyro wheels spin in rpm?", ["19", "200", "rpm"]),
+    ("What are Rate Sensor Units?", ["rate", "sensor", "units"]),
+    ("What is one-gyro mode?", ["one", "gyro", "mode"]),
+    ("How big is Hubble's primary mirror?", ["94", "inches"]),
+    ("What angular resolution can Hubble reach in arcseconds?", ["0", "05", "arcsecond"]),
+    ("Which instruments had electrical shorts repaired in SM4?", ["acs", "stis"]),
+    ("How many orbits per day does Hubble complete?", ["15", "orbits"]),
+    ("What is the ACS High Resolution Channel?", ["acs", "high", "resolution", "channel"]),
+    ("How many reaction wheels does Hubble have?", ["reaction", "wheels"]),
+]
+
+
+def relevant(doc, terms) -> bool:
+    return set(terms) <= set(re.findall(r"[a-z0-9]+", doc.page_content.lower()))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[max(0, int(q * len(values) + 0.5) - 1)]
+
+
+def bench_mode(index, mode: str, k: int, repeat: int):
+    from langchain_core.messages import ToolMessage
+
+    from agents.grader import local_grade
+
+    retriever = index.retriever
+    retriever.mode, retriever.k = mode, k
+
+    hits, reciprocal_ranks, rewrites, decided_locally = 0, [], [], 0
+    search_ms, call_ms = [], []
+    for question, terms in QUESTIONS:
+        start = time.perf_counter()
+        docs = retriever.invoke(question)
+        call_ms.append((time.perf_counter() - start) * 1000)
+
+        ranks = [i for i, doc in enumerate(docs, start=1) if relevant(doc, terms)]
+        hits += bool(ranks)
+        reciprocal_ranks.append(1 / ranks[0] if ranks else 0.0)
+
+        verdict = local_grade(question, ToolMessage(content="", tool_call_id="bench", artifact=docs))
+        decided_locally += verdict is not None
+        rewrites.append(not (verdict if verdict is not None else bool(ranks)))
+
+        query_vector = index.embeddings.embed_query(question)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            retriever._to_documents(question, query_vector)
+            search_ms.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "hit_rate": round(hits / len(QUESTIONS), 4),
+        "mrr": round(statistics.mean(reciprocal_ranks), 4),
+        "first_pass_rewrite_rate": round(sum(rewrites) / len(QUESTIONS), 4),
+        "graded_locally": decided_locally,
+        "search_mean_ms": round(statistics.mean(search_ms), 3),
+        "search_p95_ms": round(percentile(search_ms, 0.95), 3),
+        "retriever_call_mean_ms": round(statistics.mean(call_ms), 3),
+        "retriever_call_p95_ms": round(percentile(call_ms, 0.95), 3),
+    }, rewrites
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20, help="Timed searches per question")
+    args = parser.parse_args()
+
+    with start_server(latency_ms=0) as base_url:
+        os.environ.update(
+            {
+                "OPENAI_BASE_URL": base_url,
+                "OPENAI_API_KEY": "fake",
+                "INFERENCE_BASE_URL": base_url,
+                "DIGITALOCEAN_INFERENCE_KEY": "fake",
+            }
+        )
+        sys.path.insert(0, str(RAG_DIR))
+        from tools.doc_retriever import DocumentIndex
+
+        index_dir = tempfile.mkdtemp()
+        start = time.perf_counter()
+        index = DocumentIndex(str(RAG_DIR / "pdfs"), index_dir=index_dir, retrieval_mode="hybrid")
+        build_seconds = time.perf_counter() - start
+        lexical_bytes = os.path.getsize(Path(index_dir) / "lexical.npz")
+
+        vector, vector_rewrites = bench_mode(index, "vector", args.k, args.repeat)
+        hybrid, hybrid_rewrites = bench_mode(index, "hybrid", args.k, args.repeat)
+
+    pairs = list(zip(vector_rewrites, hybrid_rewrites))
+    print(
+        json.dumps(
+            {
+                "questions": len(QUESTIONS),
+                "k": args.k,
+                "chunks": len(index.retriever.index),
+                "index_build_seconds": round(build_seconds, 3),
+                "lexical_index_bytes": lexical_bytes,
+                "vector": vector,
+                "hybrid": hybrid,
+                "rewrites_avoided": sum(v and not h for v, h in pairs),
+                "rewrites_added": sum(h and not v for v, h in pairs),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
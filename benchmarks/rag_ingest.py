@@ -0,0 +1,71 @@
+"""
+Serial vs. parallel PDF ingestion benchmark for the RAG template.
+
+Copies the bundled `RAG/pdfs` fact sheets into a temporary folder until it
+holds a few hundred files, then times parsing and splitting them with one
+worker and with a process pool. No embedding calls are made.
+
+    python benchmarks/rag_ingest.py --copies 40 --workers 8
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAG_DIR = Path(__file__).resolve().parent.parent / "RAG"
+sys.path.insert(0, str(RAG_DIR))
+
+from tools.pdf_ingest import iter_document_splits, list_pdf_files  # noqa: E402
+
+
+def build_corpus(target: Path, copies: int):
+    for pdf_file in sorted((RAG_DIR / "pdfs").glob("*.pdf")):
+        for i in range(copies):
+            shutil.copy(pdf_file, target / f"{pdf_file.stem}-{i:03d}.pdf")
+
+
+def run(pdf_files, workers: int):
+    start = time.perf_counter()
+    splits = [
+        (pdf_file.name, [doc.page_content for doc in docs])
+        for pdf_file, docs in iter_document_splits(pdf_files, workers=workers)
+    ]
+    return time.perf_counter() - start, splits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--copies", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_corpus(Path(tmp), args.copies)
+        pdf_files = list_pdf_files(tmp)
+
+        serial_seconds, serial_splits = run(pdf_files, workers=1)
+        parallel_seconds, parallel_splits = run(pdf_files, workers=args.workers)
+
+    print(
+        json.dumps(
+            {
+                "files": len(pdf_files),
+                "chunks": sum(len(texts) for _, texts in serial_splits),
+                "workers": args.workers,
+                "serial_seconds": round(serial_seconds, 3),
+                "parallel_seconds": round(parallel_seconds, 3),
+                "speedup": round(serial_seconds / parallel_seconds, 2),
+                "identical_output": serial_splits == parallel_splits,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Top-k retrieval benchmark for the RAG template.
+
+Compares `InMemoryVectorStore` (the previous retriever backend) with the
+`VectorIndex` engine in exact and IVF mode on synthetic clustered embeddings.
+Reports mean and p95 query latency and recall@k against exact search.
+
+    python benchmarks/rag_retrieval.py --sizes 1000 10000 50000 --dim 384
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+RAG_DIR = Path(__file__).resolve().parent.parent / "RAG"
+sys.path.insert(0, str(RAG_DIR))
+
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.embeddings import DeterministicFakeEmbedding  # noqa: E402
+from langchain_core.vectorstores import InMemoryVectorStore  # noqa: E402
+from tools.vector_index import VectorIndex  # noqa: E402
+
+
+def synthetic_corpus(size: int, dim: int, queries: int, rng):
+    """Clustered vectors, so approximate search has structure to exploit."""
+    centers = rng.standard_normal((max(1, size // 100), dim)).astype(np.float32)
+    vectors = centers[rng.integers(len(centers), size=size)]
+    vectors += 0.5 * rng.standard_normal((size, dim)).astype(np.float32)
+    query_vectors = vectors[rng.integers(size, size=queries)]
+    query_vectors += 0.5 * rng.standard_normal((queries, dim)).astype(np.float32)
+    return vectors, query_vectors
+
+
+def timed(search, query_vectors):
+    latencies, results = [], []
+    for query in query_vectors:
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies.append(time.perf_counter() - start)
+    latencies_ms = np.array(latencies) * 1000
+    return results, {
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+    }
+
+
+def recall(results, truth):
+    hits = sum(len(set(r) & set(t)) for r, t in zip(results, truth))
+    return round(hits / sum(len(t) for t in truth), 4)
+
+
+def bench_size(size: int, dim: int, k: int, queries: int, nprobe: int, rng):
+    vectors, query_vectors = synthetic_corpus(size, dim, queries, rng)
+    documents = [Document(id=str(i), page_content=f"chunk {i}") for i in range(size)]
+
+    exact = VectorIndex(vectors, documents, mode="exact")
+    start = time.perf_counter()
+    ivf = VectorIndex(vectors, documents, mode="ivf", nprobe=nprobe)
+    ivf_build_seconds = time.perf_counter() - start
+
+    store = InMemoryVectorStore(embedding=DeterministicFakeEmbedding(size=dim))
+    for i, vector in enumerate(vectors):
+        store.store[str(i)] = {
+            "id": str(i),
+            "vector": vector.tolist(),
+            "text": documents[i].page_content,
+            "metadata": {},
+        }
+
+    truth, exact_stats = timed(
+        lambda q: [row for row, _ in exact.search(q, k)], query_vectors
+    )
+    ivf_results, ivf_stats = timed(
+        lambda q: [row for row, _ in ivf.search(q, k)], query_vectors
+    )
+    store_results, store_stats = timed(
+        lambda q: [
+            int(doc.id) for doc in store.similarity_search_by_vector(q.tolist(), k=k)
+        ],
+        query_vectors,
+    )
+
+    return {
+        "size": size,
+        "in_memory_vector_store": {**store_stats, "recall": recall(store_results, truth)},
+        "vector_index_exact": {**exact_stats, "recall": 1.0},
+        "vector_index_ivf": {
+            **ivf_stats,
+            "recall": recall(ivf_results, truth),
+            "build_seconds": round(ivf_build_seconds, 3),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = [
+        bench_size(size, args.dim, args.k, args.queries, args.nprobe, rng)
+        for size in args.sizes
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Per-invocation graph overhead benchmark for the StateGraph template.
+
+Replaces `run_inference` with an instant fake, so the numbers are pure
+LangGraph overhead, and compares building and compiling the joke graph on
+every call (the previous entrypoint) with reusing the registry's compiled
+graph.
+
+    python benchmarks/stategraph_overhead.py --iterations 200
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "StateGraph"
+sys.path.insert(0, str(TEMPLATE_DIR))
+
+import main as template  # noqa: E402
+from graph_registry import registry  # noqa: E402
+
+
+async def fake_inference(prompt: str, model: str = template.DEFAULT_MODEL, **params):
+    return "Why did the telescope blush? It saw the Milky Way!"
+
+
+async def per_call_graph(iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        app = template.build_graph()
+        await app.ainvoke({"topic": "telescopes", "spicy_override": False})
+    return (time.perf_counter() - start) / iterations
+
+
+async def registry_graph(iterations: int) -> float:
+    app = await registry.get("joke")
+    start = time.perf_counter()
+    for _ in range(iterations):
+        app = await registry.get("joke")
+        await app.ainvoke({"topic": "telescopes", "spicy_override": False})
+    return (time.perf_counter() - start) / iterations
+
+
+async def run(iterations: int):
+    template.run_inference = fake_inference
+    before = await per_call_graph(iterations)
+    after = await registry_graph(iterations)
+    print(
+        json.dumps(
+            {
+                "iterations": iterations,
+                "build_per_call_ms": round(before * 1000, 3),
+                "compiled_once_ms": round(after * 1000, 3),
+                "saved_per_call_ms": round((before - after) * 1000, 3),
+            },
+            indent=2,
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+A local stand-in for the MCP template's Tavily search server.
+
+Serves one `search` tool over streamable HTTP at ``/mcp`` that waits a fixed
+latency and returns canned results mentioning the query, so the MCP template
+can be load tested offline. Point the template at it with
+``SEARCH_MCP_URL=http://127.0.0.1:<port>/mcp``.
+
+    python benchmarks/stub_mcp_server.py --port 8098 --latency-ms 100
+"""
+
+import argparse
+import asyncio
+
+from mcp.server.fastmcp import FastMCP
+
+
+def build_server(host: str, port: int, latency_ms: float) -> FastMCP:
+    server = FastMCP("stub-search", host=host, port=port, log_level="WARNING")
+
+    @server.tool()
+    async def search(query: str) -> str:
+        """Search the web for up-to-date information about a query."""
+        await asyncio.sleep(latency_ms / 1000)
+        return "\n".join(
+            f"Result {i}: {query} - stub article {i} about {query}, published by Example News."
+            for i in range(1, 4)
+        )
+
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    args = parser.parse_args()
+    build_server(args.host, args.port, args.latency_ms).run(transport="streamable-http")
+
+
+if __name__ == "__main__":
+    main()
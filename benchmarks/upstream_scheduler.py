@@ -0,0 +1,138 @@
+"""
+Rate-limit benchmark for the shared upstream scheduler.
+
+Starts `fake_openai_server.py` with `--rate-limit-rps`, so chat completions
+above that rate get a 429 with `Retry-After`, and fires `--calls` concurrent
+chat calls at it in each mode:
+
+- `sdk`: a plain `ChatOpenAI` with the OpenAI client's own retries
+  (`--sdk-retries`), each call backing off on its own;
+- `scheduler`: the MCP template's `get_chat_model`, with calls queued and
+  retried by `scheduler.py` and no configured rate;
+- `scheduler_rpm`: the same with `LLM_RATE_LIMIT_RPM` set just under the
+  server's limit, so calls wait in the queue instead of being rejected.
+
+For each mode it reports failed calls, the 429s the server sent, call
+latency, total time and the scheduler's queue metrics.
+
+    python benchmarks/upstream_scheduler.py --rate-limit-rps 10 --calls 40
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from fake_openai_server import server_stats, start_server
+
+MCP_DIR = Path(__file__).resolve().parent.parent / "MCP"
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[max(0, int(q * len(values) + 0.5) - 1)]
+
+
+async def fire(model, calls: int):
+    latencies, failures = [], []
+
+    async def one(i: int):
+        start = time.perf_counter()
+        try:
+            await model.ainvoke(f"Question {i}: what is 2 + {i}?")
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            failures.append(type(e).__name__)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return latencies, failures, time.perf_counter() - start
+
+
+def run_mode(mode: str, args) -> dict:
+    from langchain_openai import ChatOpenAI
+
+    from scheduler import scheduler
+
+    with start_server(latency_ms=args.latency_ms, rate_limit_rps=args.rate_limit_rps) as base_url:
+        os.environ["INFERENCE_BASE_URL"] = base_url
+        os.environ["DIGITALOCEAN_INFERENCE_KEY"] = "fake"
+        os.environ["LLM_RATE_LIMIT_RPM"] = (
+            str(args.rate_limit_rps * 60 * 0.95) if mode == "scheduler_rpm" else "0"
+        )
+        # Settings are read on first use; start each mode from scratch
+        scheduler.settings = None
+        scheduler._keys.clear()
+
+        if mode == "sdk":
+            model = ChatOpenAI(
+                model="fake",
+                base_url=base_url,
+                api_key="fake",
+                max_retries=args.sdk_retries,
+                http_async_client=httpx.AsyncClient(timeout=60),
+            )
+        else:
+            import llm_client
+
+            llm_client._http_async_client = None
+            model = llm_client.get_chat_model("fake")
+
+        latencies, failures, seconds = asyncio.run(fire(model, args.calls))
+        calls = server_stats(base_url)
+
+    result = {
+        "completed": len(latencies),
+        "failed": len(failures),
+        "failures": sorted(set(failures)),
+        "server_429s": calls.get("rate_limited", 0),
+        "seconds": round(seconds, 3),
+        "latency_p50_ms": round(percentile(latencies, 0.5), 1) if latencies else None,
+        "latency_p95_ms": round(percentile(latencies, 0.95), 1) if latencies else None,
+        "latency_mean_ms": round(statistics.mean(latencies), 1) if latencies else None,
+    }
+    if mode != "sdk":
+        (key,) = scheduler.stats()["keys"].values()
+        result["scheduler"] = {
+            name: key[name]
+            for name in (
+                "retries",
+                "rate_limited",
+                "max_queue_depth",
+                "concurrency_limit",
+                "wait_p50_ms",
+                "wait_p95_ms",
+            )
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=40)
+    parser.add_argument("--rate-limit-rps", type=float, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--sdk-retries", type=int, default=2)
+    parser.add_argument(
+        "--modes", nargs="+", default=["sdk", "scheduler", "scheduler_rpm"],
+        choices=["sdk", "scheduler", "scheduler_rpm"],
+    )
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(MCP_DIR))
+    results = {
+        "calls": args.calls,
+        "rate_limit_rps": args.rate_limit_rps,
+        "modes": {mode: run_mode(mode, args) for mode in args.modes},
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()